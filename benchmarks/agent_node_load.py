@@ -0,0 +1,88 @@
+"""
+Load test for the agent graph nodes: N concurrent sessions against a stubbed
+LLM with a fixed latency, comparing the blocking `__call__` (run by LangGraph
+in the default thread pool) with the async `acall`.
+
+Run from the repository root:
+    python -m benchmarks.agent_node_load --sessions 128 --latency 0.25 --workers 8
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langgraph.graph import StateGraph, START, END
+from src.ai.ai_schemas.graph_states import InsightAgentState
+from src.ai.agents.intent_detector import IntentDetector
+
+
+STUB_RESPONSE = json.dumps({
+    "reject_query": False,
+    "response_to_user": "Hello! How can I help you with your finance questions today?",
+})
+
+
+class StubChatModel(BaseChatModel):
+    """Chat model that answers with a fixed payload after `latency` seconds."""
+
+    latency: float = 0.25
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=STUB_RESPONSE))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=STUB_RESPONSE))])
+
+
+def build_graph(node):
+    graph = StateGraph(InsightAgentState)
+    graph.add_node("Query Intent Detector", node, destinations=(END,))
+    graph.add_edge(START, "Query Intent Detector")
+    return graph.compile()
+
+
+async def run_sessions(graph, sessions: int) -> float:
+    state = {
+        "user_query": "hi",
+        "user_metadata": "",
+        "realtime_info": False,
+        "reasoning": False,
+    }
+    start = time.perf_counter()
+    await asyncio.gather(*(graph.ainvoke(dict(state)) for _ in range(sessions)))
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=128)
+    parser.add_argument("--latency", type=float, default=0.25)
+    parser.add_argument("--workers", type=int, default=8, help="size of the default thread pool")
+    args = parser.parse_args()
+
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=args.workers))
+
+    detector = IntentDetector()
+    detector.model = StubChatModel(latency=args.latency)
+    detector.model_alt = StubChatModel(latency=args.latency)
+
+    sync_elapsed = await run_sessions(build_graph(detector.__call__), args.sessions)
+    async_elapsed = await run_sessions(build_graph(detector.acall), args.sessions)
+
+    print(f"{args.sessions} sessions, {args.latency:.2f}s stub latency, {args.workers} pool workers")
+    print(f"sync  __call__ : {sync_elapsed:6.2f}s  ({args.sessions / sync_elapsed:7.1f} sessions/s)")
+    print(f"async acall    : {async_elapsed:6.2f}s  ({args.sessions / async_elapsed:7.1f} sessions/s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
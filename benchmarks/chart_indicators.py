@@ -0,0 +1,145 @@
+"""
+Chart-bot indicator cost over 20 years of daily bars: the previous pure-Python loops over
+lists of dicts (the EOD fallbacks of the SMA/RSI/volatility tools and their signal helpers)
+versus the NumPy engine in `src.ai.chart_bot.indicators`. Network time is not included; the
+previous tools also paid one FMP round-trip per period before computing anything.
+
+Run from the repository root:
+    python -m benchmarks.chart_indicators --iterations 50
+"""
+import argparse
+import statistics
+import time
+from datetime import date, timedelta
+from statistics import fmean, pstdev
+import numpy as np
+from src.ai.chart_bot import indicators as ind
+
+SMA_PERIODS = [10, 50, 200]
+STD_PERIODS = [10, 20, 60]
+RSI_PERIOD = 14
+THRESHOLDS = [30.0, 70.0]
+
+
+def _time_calls(fn, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _report(label: str, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<36} mean={statistics.mean(samples):8.3f} ms  p50={statistics.median(samples):8.3f} ms  p95={p95:8.3f} ms")
+
+
+def _bars(years: int):
+    rng = np.random.default_rng(0)
+    days, day = [], date.today() - timedelta(days=365 * years)
+    while day <= date.today():
+        if day.weekday() < 5:
+            days.append(day.isoformat())
+        day += timedelta(days=1)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(days))))
+    return [{"date": d, "close": float(c)} for d, c in zip(days, closes)]
+
+
+# ---------- Previous implementation ----------
+
+def _loop_streak(rows, key, threshold):
+    best, cur, start, best_range = 0, 0, None, (None, None)
+    for row in rows:
+        if row[key] > threshold:
+            cur += 1
+            start = row["date"] if start is None else start
+            if cur > best:
+                best, best_range = cur, (start, row["date"])
+        else:
+            cur, start = 0, None
+    return best, best_range
+
+
+def _loop_crossings(rows, key, level):
+    up, down, prev = [], [], None
+    for row in rows:
+        v = row[key]
+        if prev is not None:
+            if prev <= level < v:
+                up.append(row["date"])
+            if prev >= level > v:
+                down.append(row["date"])
+        prev = v
+    return up, down
+
+
+def before(bars):
+    asc = sorted(bars, key=lambda x: x["date"])
+    closes = [x["close"] for x in asc]
+    dates = [x["date"] for x in asc]
+
+    smas = {}
+    for p in SMA_PERIODS:
+        smas[p] = [{"date": dates[i], "sma": fmean(closes[i - p + 1:i + 1])} for i in range(p - 1, len(closes))]
+    short = {r["date"]: r["sma"] for r in smas[SMA_PERIODS[1]]}
+    long = {r["date"]: r["sma"] for r in smas[SMA_PERIODS[2]]}
+    diffs = [{"date": d, "diff": short[d] - long[d]} for d in sorted(set(short) & set(long))]
+    _loop_crossings(diffs, "diff", 0.0)
+
+    deltas = [closes[i] - closes[i - 1] for i in range(1, len(closes))]
+    gains = [max(d, 0.0) for d in deltas]
+    losses = [max(-d, 0.0) for d in deltas]
+    avg_gain, avg_loss = fmean(gains[:RSI_PERIOD]), fmean(losses[:RSI_PERIOD])
+    rsi = []
+    for i in range(RSI_PERIOD + 1, len(closes)):
+        avg_gain = (avg_gain * (RSI_PERIOD - 1) + gains[i - 1]) / RSI_PERIOD
+        avg_loss = (avg_loss * (RSI_PERIOD - 1) + losses[i - 1]) / RSI_PERIOD
+        rsi.append({"date": dates[i], "rsi": 100.0 if avg_loss == 0 else 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)})
+    for t in THRESHOLDS:
+        _loop_crossings(rsi, "rsi", t)
+        _loop_streak(rsi, "rsi", t)
+
+    for p in STD_PERIODS:
+        vol = [{"date": dates[i], "vol": pstdev(closes[i - p + 1:i + 1]) / closes[i] * 100} for i in range(p - 1, len(closes))]
+        _loop_streak(vol, "vol", 3.0)
+
+
+# ---------- Engine ----------
+
+def after(dates, closes):
+    smas = ind.sma_many(closes, SMA_PERIODS)
+    ind.crossovers(smas[SMA_PERIODS[1]], smas[SMA_PERIODS[2]])
+
+    rsi = ind.wilder_rsi(closes, RSI_PERIOD)
+    for t in THRESHOLDS:
+        ind.threshold_crossings(rsi, t)
+        ind.longest_streak(ind.compare(rsi, "gt", t))
+
+    for p in STD_PERIODS:
+        vol = ind.rolling_std(closes, p) / closes * 100
+        ind.longest_streak(ind.compare(vol, "gt", 3.0))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--years", type=int, default=20)
+    args = parser.parse_args()
+
+    bars = _bars(args.years)
+    dates = np.array([b["date"] for b in bars], dtype="datetime64[D]")
+    closes = np.array([b["close"] for b in bars])
+    print(f"{len(bars)} daily bars, SMA {SMA_PERIODS}, RSI {RSI_PERIOD}, sigma {STD_PERIODS}")
+
+    loops = _time_calls(lambda: before(bars), args.iterations)
+    engine = _time_calls(lambda: after(dates, closes), args.iterations)
+
+    _report("before (Python loops)", loops)
+    _report("after (NumPy engine)", engine)
+    print(f"speedup: {statistics.mean(loops) / max(statistics.mean(engine), 1e-9):.0f}x")
+
+
+if __name__ == "__main__":
+    main()
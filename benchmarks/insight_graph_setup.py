@@ -0,0 +1,45 @@
+"""
+Per-request graph setup cost: rebuilding + compiling the InsightAgentGraph
+(the previous behaviour of `get_graph()`) versus reusing the compiled graph.
+
+Run from the repository root:
+    python -m benchmarks.insight_graph_setup --iterations 200
+"""
+import argparse
+import statistics
+import time
+from src.ai.insight_graph import InsightAgentGraph
+
+
+def _time_calls(fn, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _report(label: str, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<28} mean={statistics.mean(samples):8.3f} ms  p50={statistics.median(samples):8.3f} ms  p95={p95:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    graph = InsightAgentGraph()
+
+    before = _time_calls(graph._create_graph, args.iterations)
+    after = _time_calls(graph.get_graph, args.iterations)
+
+    _report("before (compile per request)", before)
+    _report("after (shared compiled graph)", after)
+    print(f"speedup: {statistics.mean(before) / max(statistics.mean(after), 1e-9):.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Per-task ReAct agent setup cost: `create_react_agent` on every call (the previous behaviour of
+`BaseAgent.invoke_react_agent` and the fast agent) versus the prebuilt agent of
+`BaseAgent.get_react_agent`.
+
+Run from the repository root:
+    python -m benchmarks.react_agent_build --iterations 200
+"""
+import argparse
+import statistics
+import time
+from langchain_core.messages import SystemMessage
+from langgraph.prebuilt import create_react_agent
+from src.ai.agents.finance_data_agent import FinanceDataAgent
+from src.ai.agents.map_agent import MapAgent
+from src.ai.agents.web_search_agent import WebSearchAgent
+
+
+def _time_calls(fn, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _report(label: str, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<44} mean={statistics.mean(samples):8.3f} ms  p50={statistics.median(samples):8.3f} ms  p95={p95:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    prompt = SystemMessage(content="You are a research agent.")
+    for agent in (WebSearchAgent(), FinanceDataAgent(), MapAgent()):
+        name = type(agent).__name__
+        agent.prewarm()
+
+        before = _time_calls(lambda: create_react_agent(model=agent.model, tools=agent.tools, prompt=prompt, **agent.react_agent_options), args.iterations)
+        after = _time_calls(lambda: agent.get_react_agent(agent.model), args.iterations)
+
+        _report(f"{name} before (build per task)", before)
+        _report(f"{name} after (prebuilt)", after)
+        print(f"{name} speedup: {statistics.mean(before) / max(statistics.mean(after), 1e-9):.0f}x")
+
+
+if __name__ == "__main__":
+    main()
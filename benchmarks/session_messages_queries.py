@@ -0,0 +1,135 @@
+"""
+Regression benchmark for `mongodb.get_messages_by_session`: seeds a long session with
+feedback and attachments into a local mongod, counts the `find` commands the function
+issues and checks its output against the previous one-query-per-row implementation.
+
+Needs a running mongod (MONGO_URI, defaults to mongodb://localhost:27017). Run from the
+repository root:
+    python -m benchmarks.session_messages_queries --turns 50 --docs 2
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from src.backend.db import mongodb
+from src.backend.models.model import MessageLog, MessageFeedback, UploadResponse
+
+BENCHMARK_DB = "insight_agent_benchmark"
+MAX_QUERIES = 3  # MessageLog, MessageFeedback, UploadResponse
+
+
+class FindCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        if event.command_name in ("find", "aggregate"):
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def reference_messages_by_session(session_id: str) -> dict:
+    """The original N+1 implementation, kept here to check the output is unchanged."""
+    logs = await MessageLog.find({"session_id": session_id}, sort=[("created_at", 1)]).to_list()
+    session_messages = {"session_id": session_id, 'message_list': []}
+    for log in logs:
+        research_data = log.research if log.research else None
+        if (research_data and isinstance(research_data, list) and len(research_data) > 0 and 'created_at' in research_data[0]):
+            research_data = sorted(research_data, key=lambda x: x['created_at'])
+        feedback = await MessageFeedback.find_one({"message_id": log.message_id})
+        feedback_data = {
+            "liked": "yes" if feedback and feedback.liked is True else "no" if feedback and feedback.liked is False else None,
+            "feedback_tag": feedback.feedback_tag if feedback else [],
+            "human_feedback": feedback.human_feedback if feedback else []
+        }
+        doc_info_list = []
+        if log.human_input and isinstance(log.human_input, dict):
+            for file_id in log.human_input.get("doc_ids", []) or []:
+                doc = await UploadResponse.find_one({"file_id": file_id})
+                if doc:
+                    file_name = doc.original_filename
+                    file_type = file_name.split(".")[-1] if file_name and "." in file_name else "unknown"
+                    doc_info_list.append({"file_id": file_id, "file_name": file_name or "unknown", "file_type": file_type})
+        session_messages["message_list"].append({
+            "message_id": log.message_id,
+            "human_input": log.human_input,
+            "doc_info": doc_info_list,
+            "research": research_data,
+            "response": log.response,
+            "stock_chart": log.stock_chart if log.stock_chart else [],
+            "map_layers": log.map_layers,
+            "sources": log.sources if log.sources else [],
+            "created_at": log.created_at.isoformat(),
+            "feedback": feedback_data,
+            "time_taken": mongodb.convert_seconds(log.time_taken) if log.time_taken else "0 sec"
+        })
+    return session_messages
+
+
+async def seed_session(turns: int, docs: int) -> str:
+    session_id = str(uuid.uuid4())
+    for turn in range(turns):
+        message_id = str(uuid.uuid4())
+        doc_ids = []
+        for index in range(docs):
+            file_id = str(uuid.uuid4())
+            doc_ids.append(file_id)
+            await UploadResponse(user_id="benchmark", file_id=file_id, original_filename=f"report_{turn}_{index}.pdf", blob="x" * 1024).insert()
+        await MessageLog(
+            session_id=session_id,
+            message_id=message_id,
+            human_input={"user_query": f"question {turn}", "doc_ids": doc_ids},
+            response={"content": f"answer {turn}"},
+            time_taken=turn,
+        ).insert()
+        if turn % 2 == 0:
+            await MessageFeedback(message_id=message_id, response_id=str(uuid.uuid4()), liked=turn % 4 == 0).insert()
+    return session_id
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--docs", type=int, default=2, help="attachments per turn")
+    args = parser.parse_args()
+
+    counter = FindCounter()
+    client = AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"), event_listeners=[counter])
+    await client.drop_database(BENCHMARK_DB)
+    await init_beanie(database=client[BENCHMARK_DB], document_models=[MessageLog, MessageFeedback, UploadResponse])
+
+    try:
+        session_id = await seed_session(args.turns, args.docs)
+
+        counter.count = 0
+        start = time.perf_counter()
+        expected = await reference_messages_by_session(session_id)
+        reference_elapsed, reference_queries = time.perf_counter() - start, counter.count
+
+        counter.count = 0
+        start = time.perf_counter()
+        result = await mongodb.get_messages_by_session(session_id)
+        elapsed, queries = time.perf_counter() - start, counter.count
+
+        print(f"{args.turns} turns, {args.docs} attachments per turn")
+        print(f"per-row lookups: {reference_queries:4d} queries  {reference_elapsed * 1000:8.1f} ms")
+        print(f"bulk lookups   : {queries:4d} queries  {elapsed * 1000:8.1f} ms")
+
+        assert result == expected, "get_messages_by_session output differs from the per-row implementation"
+        assert queries <= MAX_QUERIES, f"get_messages_by_session issued {queries} queries, expected at most {MAX_QUERIES}"
+    finally:
+        await client.drop_database(BENCHMARK_DB)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""
+Microbenchmark of the SSE token batching in `query_and_stream`: pushes a synthetic token
+stream through the previous 15-token batching and through `StreamCoalescer`, and reports
+chunk events per second on one worker together with the frames and bytes written.
+
+Run from the repository root:
+    python -m benchmarks.stream_coalescer --tokens 200000 --agents 4
+"""
+import argparse
+import json
+import time
+from src.backend.utils.stream_coalescer import StreamCoalescer, MAX_BYTES, MAX_LATENCY, MAX_TOKENS
+
+MESSAGE_ID = "benchmark-message"
+
+
+def synthetic_chunks(tokens: int, agents: int) -> list:
+    words = ["The", " company", "'s", " revenue", " grew", " 12", "%", " year", "-over", "-year", ".", "\n"]
+    per_agent = max(1, tokens // agents)
+    return [
+        {"type": "response-chunk", "agent_name": f"Agent {i // per_agent}", "id": f"response-{i // per_agent}", "content": words[i % len(words)]}
+        for i in range(tokens)
+    ]
+
+
+def legacy_batching(chunks: list) -> list:
+    """The batching `event_generator` used before the coalescer; the trailing batch went out with the next non-chunk event."""
+    frames = []
+    token_buffer = []
+
+    def flush():
+        batched_event = {
+            "type": token_buffer[0].get('type', 'unknown_chunk_type'),
+            "agent_name": token_buffer[0].get('agent_name', ''),
+            "message_id": MESSAGE_ID,
+            "id": token_buffer[0].get('id', '')
+        }
+        if any('content' in t for t in token_buffer):
+            batched_event["content"] = "".join([t.get('content', '') for t in token_buffer if 'content' in t])
+        if any('title' in t for t in token_buffer):
+            batched_event["title"] = "".join([t.get('title', '') for t in token_buffer if 'title' in t])
+        frames.append(f"data: {json.dumps(batched_event)}\n\n".encode('utf-8'))
+
+    for data_to_send in chunks:
+        if token_buffer and (len(token_buffer) >= 15 or data_to_send.get('agent_name') != token_buffer[0].get('agent_name')):
+            flush()
+            token_buffer = []
+        token_buffer.append(data_to_send)
+    if token_buffer:
+        flush()
+    return frames
+
+
+def coalesced(chunks: list, **limits) -> list:
+    coalescer = StreamCoalescer(MESSAGE_ID, **limits)
+    frames = []
+    for chunk in chunks:
+        frames.extend(coalescer.add(chunk))
+    frame = coalescer.flush()
+    if frame:
+        frames.append(frame)
+    return frames
+
+
+def content_of(frames: list) -> str:
+    return "".join(json.loads(frame.decode("utf-8").split("data: ", 1)[1]).get("content", "") for frame in frames)
+
+
+def measure(label: str, fn, chunks: list, repeat: int) -> list:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        frames = fn(chunks)
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<34} {len(chunks) / best:>12,.0f} events/s  {len(frames):>8,} frames  {sum(map(len, frames)):>12,} bytes")
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=200000)
+    parser.add_argument("--agents", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args.tokens, args.agents)
+    print(f"{args.tokens:,} chunk events from {args.agents} agents, best of {args.repeat}")
+
+    legacy = measure("15-token batches (json)", legacy_batching, chunks, args.repeat)
+    # A burst arrives faster than any latency limit, so only the size limits decide here
+    current = measure(f"coalescer ({MAX_TOKENS} tokens / {MAX_BYTES} B)", lambda c: coalesced(c, max_latency=float("inf")), chunks, args.repeat)
+    measure("coalescer (15 tokens)", lambda c: coalesced(c, max_latency=float("inf"), max_tokens=15), chunks, args.repeat)
+    print(f"max latency per frame in a slow stream: {MAX_LATENCY * 1000:.0f} ms")
+
+    assert content_of(current) == content_of(legacy), "coalesced frames carry different content"
+
+
+if __name__ == "__main__":
+    main()
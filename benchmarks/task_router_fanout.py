@@ -0,0 +1,92 @@
+"""
+Wall-clock comparison of the Task Router on a plan of independent data-gathering tasks
+against the same plan chained through `required_context`, with every agent replaced by a
+node that sleeps for `latency` seconds.
+
+Run from the repository root:
+    python -m benchmarks.task_router_fanout --tasks 4 --latency 0.5
+"""
+import argparse
+import asyncio
+import time
+from langchain_core.messages import AIMessage
+from langgraph.graph import StateGraph, START, END
+from langgraph.types import Command
+from src.ai.ai_schemas.graph_states import InsightAgentState
+from src.ai.agents.utils import task_router_node
+
+
+AGENTS = ["Web Search Agent", "Finance Data Agent", "Social Media Scrape Agent", "Coding Agent"]
+
+
+def stub_agent(latency: float):
+    async def node(state):
+        await asyncio.sleep(latency)
+        task = state['current_task'].copy()
+        task['task_messages'] = [AIMessage(content=f"result of {task['task_name']}")]
+        return Command(goto="Task Router", update={"current_task": task, "completed_tasks": [task]})
+
+    return node
+
+
+def stub_response_generator(latency: float):
+    async def node(state):
+        await asyncio.sleep(latency)
+        return {"final_response": "done"}
+
+    return node
+
+
+def build_graph(latency: float):
+    graph = StateGraph(InsightAgentState)
+    graph.add_node("Task Router", task_router_node, destinations=tuple(AGENTS) + ("Response Generator Agent", END))
+    for agent_name in AGENTS:
+        graph.add_node(agent_name, stub_agent(latency), destinations=("Task Router",))
+    graph.add_node("Response Generator Agent", stub_response_generator(latency))
+    graph.add_edge(START, "Task Router")
+    graph.add_edge("Response Generator Agent", END)
+    return graph.compile()
+
+
+def build_plan(tasks: int, chained: bool):
+    task_list = []
+    for index in range(tasks):
+        task_list.append({
+            'task_name': f'task_{index + 1}',
+            'agent_name': AGENTS[index % len(AGENTS)],
+            'agent_task': '', 'instructions': '', 'expected_output': '',
+            'required_context': [f'task_{index}'] if chained and index else [],
+        })
+    task_list.append({
+        'task_name': f'task_{tasks + 1}',
+        'agent_name': 'Response Generator Agent',
+        'agent_task': '', 'instructions': '', 'expected_output': '',
+        'required_context': [task['task_name'] for task in task_list],
+    })
+    return task_list
+
+
+async def run_plan(graph, task_list) -> tuple:
+    state = {"task_list": task_list, "reasoning": False, "progress_bar": 20.0, "user_metadata": ""}
+    start = time.perf_counter()
+    result = await graph.ainvoke(state)
+    return time.perf_counter() - start, result
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=4, help="number of data-gathering tasks in the plan")
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    graph = build_graph(args.latency)
+    chained_elapsed, chained = await run_plan(graph, build_plan(args.tasks, chained=True))
+    parallel_elapsed, parallel = await run_plan(graph, build_plan(args.tasks, chained=False))
+
+    print(f"{args.tasks} tasks + response generator, {args.latency:.2f}s stub latency")
+    print(f"chained    : {chained_elapsed:6.2f}s  progress {chained['progress_bar']:.1f}")
+    print(f"independent: {parallel_elapsed:6.2f}s  progress {parallel['progress_bar']:.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,302 @@
+"""
+Assembly of system prompts from a stable core plus conditional sections.
+
+Each registered prompt is split into sections at its headings. Sections without a rule form the
+core and are always sent; a section with a rule is only sent when the rule holds for the request
+(conversation history, uploaded documents, the query_intent assigned by the Intent Detector,
+...). Optional sections are then added by priority while the prompt stays within the
+agent's token budget. Sections keep their original order, so every combination of sections
+always yields the same text.
+
+Run `python -m src.ai.agent_prompts.assembly` for a report of the token counts per assembled
+prompt.
+"""
+import json
+import logging
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import litellm
+from src.ai.llm.config import PromptBudgetConfig
+from src.ai.agent_prompts.executor_agent import SYSTEM_PROMPT as EXECUTOR_PROMPT
+from src.ai.agent_prompts.fast_agent import SYSTEM_PROMPT as FAST_AGENT_PROMPT
+from src.ai.agent_prompts.intent_detector import SYSTEM_PROMPT as INTENT_DETECTOR_PROMPT
+from src.ai.agent_prompts.preference_aware_prompts import get_preference_aware_prompt
+
+logger = logging.getLogger("uvicorn")
+
+pbc = PromptBudgetConfig()
+
+TOKEN_COUNT_MODEL = "gemini/gemini-2.5-flash"
+SHORT_QUERY_WORDS = 3
+LANGUAGE_WORDS = ("translate", "translation", "language", "hindi", "english", "spanish", "french", "german", "arabic", "chinese", "japanese", "in tamil", "in marathi", "in bengali")
+DOWNLOAD_WORDS = ("download", "pdf", "docx", "word file", "export")
+
+
+def count_tokens(text: str) -> int:
+    return litellm.token_counter(model=TOKEN_COUNT_MODEL, text=text)
+
+
+@dataclass
+class PromptContext:
+    user_query: str = ""
+    query_intent: List[str] = field(default_factory=list)
+    has_history: bool = False
+    has_documents: bool = False
+    plan: str = ""
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "PromptContext":
+        plan = state.get('research_plan')
+        return cls(
+            user_query=state.get('formatted_user_query') or state.get('user_query') or "",
+            query_intent=state.get('query_intent') or [],
+            has_history=bool(state.get('previous_messages')),
+            has_documents=bool(state.get('doc_ids') or state.get('prev_doc_ids')),
+            plan=json.dumps(plan, default=str) if plan else "",
+        )
+
+    @property
+    def short_query(self) -> bool:
+        return len(self.user_query.split()) <= SHORT_QUERY_WORDS
+
+    def mentions(self, words: Tuple[str, ...]) -> bool:
+        query = self.user_query.lower()
+        return any(word in query for word in words)
+
+
+Condition = Callable[[PromptContext], bool]
+
+
+def always(context: PromptContext) -> bool:
+    return True
+
+
+@dataclass(frozen=True)
+class SectionRule:
+    when: Condition = always
+    priority: int = 0  # higher priorities are kept first when the budget is tight
+
+
+@dataclass(frozen=True)
+class PromptSection:
+    title: str
+    text: str
+    tokens: int
+    rule: Optional[SectionRule] = None
+
+
+@dataclass(frozen=True)
+class AssembledPrompt:
+    agent: str
+    text: str
+    tokens: int
+    full_tokens: int
+    included: Tuple[str, ...]
+    dropped: Tuple[str, ...]
+
+
+def _normalize_title(line: str) -> str:
+    return re.sub(r"[#*`]", "", line).strip()
+
+
+def split_sections(prompt: str, heading: str) -> List[Tuple[str, str]]:
+    """(title, text) pairs of `prompt`, split before every line matching `heading`."""
+    starts = [match.start() for match in re.finditer(heading, prompt, flags=re.MULTILINE)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    bounds = starts + [len(prompt)]
+    sections = []
+    for start, end in zip(bounds, bounds[1:]):
+        text = prompt[start:end]
+        sections.append((_normalize_title(text.split("\n", 1)[0]), text))
+    return sections
+
+
+class PromptSpec:
+    def __init__(self, agent: str, prompt: str, heading: str, budget: int, rules: Optional[Dict[str, SectionRule]] = None):
+        """
+        `rules` maps the start of a section title (without markdown emphasis) to its rule; every
+        key must match exactly one section.
+        """
+        self.agent = agent
+        self.budget = budget
+        rules = rules or {}
+        matched = {key: 0 for key in rules}
+        sections = []
+        for title, text in split_sections(prompt, heading):
+            rule = None
+            for key, candidate in rules.items():
+                if title.startswith(key):
+                    rule = candidate
+                    matched[key] += 1
+            sections.append(PromptSection(title, text, count_tokens(text), rule))
+        unmatched = [key for key, count in matched.items() if count != 1]
+        if unmatched:
+            raise ValueError(f"Prompt rules of {agent} do not match exactly one section: {unmatched}")
+        self.sections: Tuple[PromptSection, ...] = tuple(sections)
+        self.full_tokens = sum(section.tokens for section in sections)
+
+    def select(self, context: PromptContext) -> Tuple[int, ...]:
+        """Indexes of the sections to send for `context`, in prompt order."""
+        chosen = [index for index, section in enumerate(self.sections) if section.rule is None]
+        used = sum(self.sections[index].tokens for index in chosen)
+        candidates = [
+            index for index, section in enumerate(self.sections)
+            if section.rule is not None and section.rule.when(context)
+        ]
+        candidates.sort(key=lambda index: -self.sections[index].rule.priority)
+        for index in candidates:
+            if used + self.sections[index].tokens <= self.budget:
+                chosen.append(index)
+                used += self.sections[index].tokens
+        if used > self.budget:
+            logger.warning(f"Core prompt of {self.agent} ({used} tokens) exceeds its budget of {self.budget}")
+        return tuple(sorted(chosen))
+
+    @lru_cache(maxsize=64)
+    def _build(self, indexes: Tuple[int, ...]) -> AssembledPrompt:
+        included = set(indexes)
+        return AssembledPrompt(
+            agent=self.agent,
+            text="".join(self.sections[index].text for index in indexes),
+            tokens=sum(self.sections[index].tokens for index in indexes),
+            full_tokens=self.full_tokens,
+            included=tuple(self.sections[index].title for index in indexes if self.sections[index].rule is not None),
+            dropped=tuple(section.title for index, section in enumerate(self.sections) if index not in included),
+        )
+
+    def assemble(self, context: PromptContext) -> AssembledPrompt:
+        return self._build(self.select(context))
+
+
+def _follow_up(context: PromptContext) -> bool:
+    return context.has_history
+
+
+def _language(context: PromptContext) -> bool:
+    return context.has_history or context.mentions(LANGUAGE_WORDS)
+
+
+def _download(context: PromptContext) -> bool:
+    return context.mentions(DOWNLOAD_WORDS)
+
+
+def _short_reply(context: PromptContext) -> bool:
+    return context.short_query
+
+
+def _short_follow_up(context: PromptContext) -> bool:
+    return context.has_history and context.short_query
+
+
+def _documents(context: PromptContext) -> bool:
+    return context.has_documents
+
+
+def _db_search(context: PromptContext) -> bool:
+    # Historical and factual questions are the ones the Intent Detector routes to the DB Search Agent
+    return context.has_documents or "DB Search Agent" in context.plan or bool({"historical", "factual"} & set(context.query_intent))
+
+
+EXAMPLES = SectionRule(always, priority=-1)  # illustrations that go first when the budget is tight
+
+_NUMBERED = r"^\d{1,2}\. "
+_TAGGED = r"^<[A-Z]"
+
+_SPECS: Dict[str, Callable[[], PromptSpec]] = {
+    "intent_detector": lambda: PromptSpec(
+        "intent_detector", INTENT_DETECTOR_PROMPT, rf"{_NUMBERED}|{_TAGGED}|^\*\*Example \d|^Always prioritize", pbc.INTENT_DETECTOR,
+        {
+            "1. Duplicate or Repeated Query Handling": SectionRule(_follow_up),
+            "2. Detect translation requests": SectionRule(_language),
+            "8. If in the query there is any document": SectionRule(_documents),
+            "15. Handling Single-Word": SectionRule(_short_reply),
+            "16. If there was any previous conversation": SectionRule(_short_follow_up),
+            "18. Response Download Instruction": SectionRule(_download),
+            "22. If user asks to have the conversation in a different language": SectionRule(_language),
+            "23. If the user asks for translation": SectionRule(_language),
+            "25. If the user query is a duplicate query": SectionRule(_follow_up),
+            "Example 1 (Positive": EXAMPLES,
+            "Example 2 (Light": EXAMPLES,
+            "Example 3 (Neutral": EXAMPLES,
+            "Example 4 (Serious": EXAMPLES,
+            "Example 5 (Tragic": EXAMPLES,
+            "Example 6 (Humanitarian": EXAMPLES,
+        },
+    ),
+    "fast_agent": lambda: PromptSpec(
+        "fast_agent", FAST_AGENT_PROMPT, rf"^ ?#{{2,4}} |{_NUMBERED}|{_TAGGED}|^\*\*(Example Scenarios|Important)", pbc.FAST_AGENT,
+        {
+            "6. Affirmative One-Word Responses": SectionRule(_short_reply),
+            "7. Negative One-Word Responses": SectionRule(_short_reply),
+            "12. Queries Involving Translation": SectionRule(_language),
+            "Example Scenarios": EXAMPLES,
+            "Duplicate or Semantically Similar Queries": SectionRule(_follow_up),
+            "Response Download Instruction": SectionRule(_download),
+        },
+    ),
+    "executor_agent": lambda: PromptSpec(
+        "executor_agent", EXECUTOR_PROMPT, r"^### ", pbc.EXECUTOR,
+        {
+            "CRITICAL DB SEARCH AGENT RULE": SectionRule(_db_search),
+            "TASK CREATION EXAMPLES": SectionRule(_db_search, priority=-1),
+        },
+    ),
+}
+for _preference in ("visual", "text", "mixed", None):
+    # Already specialised by response preference; assembled for the budget check and the report
+    _SPECS[f"response_generator:{_preference or 'default'}"] = (
+        lambda preference=_preference: PromptSpec(f"response_generator:{preference or 'default'}", get_preference_aware_prompt(preference), _TAGGED, pbc.RESPONSE_GENERATOR)
+    )
+
+
+@lru_cache(maxsize=None)
+def get_prompt_spec(agent: str) -> PromptSpec:
+    return _SPECS[agent]()
+
+
+def assemble_prompt(agent: str, context: PromptContext) -> str:
+    assembled = get_prompt_spec(agent).assemble(context)
+    logger.debug(f"Prompt of {agent}: {assembled.tokens}/{assembled.full_tokens} tokens, optional sections {list(assembled.included)}")
+    return assembled.text
+
+
+REPORT_CONTEXTS = {
+    "first question": PromptContext(user_query="What is the outlook for Tesla after its latest earnings?", query_intent=["analytical"]),
+    "short reply": PromptContext(user_query="yes"),
+    "follow-up": PromptContext(user_query="How does that compare with BYD?", has_history=True),
+    "short follow-up": PromptContext(user_query="continue", has_history=True),
+    "translation": PromptContext(user_query="Translate the previous answer to Hindi", has_history=True),
+    "documents": PromptContext(user_query="Summarise the attached annual report", has_documents=True, plan="DB Search Agent"),
+}
+
+
+def prompt_report() -> List[Dict[str, Any]]:
+    rows = []
+    for agent in _SPECS:
+        spec = get_prompt_spec(agent)
+        for name, context in REPORT_CONTEXTS.items():
+            assembled = spec.assemble(context)
+            rows.append({
+                "agent": agent,
+                "context": name,
+                "tokens": assembled.tokens,
+                "full_tokens": assembled.full_tokens,
+                "budget": spec.budget,
+                "optional_sections": len(assembled.included),
+                "dropped_sections": len(assembled.dropped),
+            })
+    return rows
+
+
+def main():
+    print(f"{'agent':<30} {'context':<16} {'tokens':>7} {'full':>7} {'budget':>7} {'saved':>6}  optional/dropped")
+    for row in prompt_report():
+        saved = 1 - row['tokens'] / row['full_tokens']
+        print(f"{row['agent']:<30} {row['context']:<16} {row['tokens']:>7,} {row['full_tokens']:>7,} {row['budget']:>7,} {saved:>6.0%}  {row['optional_sections']}/{row['dropped_sections']}")
+
+
+if __name__ == "__main__":
+    main()
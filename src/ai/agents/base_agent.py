@@ -1,7 +1,39 @@
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langgraph.graph.graph import CompiledGraph
 from langgraph.prebuilt import create_react_agent
-from typing import List, Optional, Dict, Any
+from langgraph.prebuilt.chat_agent_executor import AgentState, AgentStateWithStructuredResponse
+from typing import List, Optional, Dict, Any, Tuple
 from src.ai.llm.model import get_llm, get_llm_alt
+from src.ai.llm.prompt_cache import cacheable_system_message
+
+
+class ReactAgentState(AgentState):
+    system_prompt: SystemMessage
+
+
+class ReactAgentStateWithStructuredResponse(AgentStateWithStructuredResponse):
+    system_prompt: SystemMessage
+
+
+def state_prompt(state: Dict[str, Any]) -> List[BaseMessage]:
+    """Prompt of a prebuilt ReAct agent: the request's system message comes in with the input state."""
+    return [state["system_prompt"], *state["messages"]]
+
+
+def build_react_agent(model, tools: List, **kwargs) -> CompiledGraph:
+    """
+    ReAct agent that is compiled once and reused by every request; invoke it with the system
+    message under `system_prompt` next to `messages`.
+    """
+    state_schema = ReactAgentStateWithStructuredResponse if kwargs.get("response_format") else ReactAgentState
+    return create_react_agent(model=model, tools=tools, prompt=state_prompt, state_schema=state_schema, **kwargs)
+
+
+def with_cacheable_prompt(messages):
+    """`messages` with a leading system prompt marked for provider-side caching."""
+    if isinstance(messages, list) and messages and isinstance(messages[0], SystemMessage):
+        return [cacheable_system_message(messages[0]), *messages[1:]]
+    return messages
 
 
 class BaseAgent:
@@ -16,6 +48,8 @@ class BaseAgent:
         self.tools = tools or []
         self.response_schema = response_schema
         self.system_prompt = system_prompt
+        self.react_agent_options: Dict[str, Any] = {}  # create_react_agent arguments besides model, tools and prompt
+        self._react_agents: Dict[Tuple, CompiledGraph] = {}
 
     def format_input_prompt(self, state: Dict[str, Any]) -> str:
         raise NotImplementedError(
@@ -27,3 +61,73 @@ class BaseAgent:
 
     def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
         raise NotImplementedError("Subclasses must implement __call__")
+
+    async def acall(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        raise NotImplementedError("Subclasses must implement acall")
+
+    def invoke_llm(self, messages, **kwargs):
+        messages = with_cacheable_prompt(messages)
+        try:
+            return self.model.invoke(input=messages, **kwargs)
+        except Exception as e:
+            print(f"Falling back to alternate model: {str(e)}")
+            try:
+                return self.model_alt.invoke(input=messages, **kwargs)
+            except Exception as e:
+                print(f"Error occurred in fallback model: {str(e)}")
+                raise e
+
+    async def ainvoke_llm(self, messages, **kwargs):
+        messages = with_cacheable_prompt(messages)
+        try:
+            return await self.model.ainvoke(input=messages, **kwargs)
+        except Exception as e:
+            print(f"Falling back to alternate model: {str(e)}")
+            try:
+                return await self.model_alt.ainvoke(input=messages, **kwargs)
+            except Exception as e:
+                print(f"Error occurred in fallback model: {str(e)}")
+                raise e
+
+    def get_react_agent(self, model, **kwargs) -> CompiledGraph:
+        """The prebuilt ReAct agent of this agent's tools for `model`, compiled on first use."""
+        options = {**self.react_agent_options, **kwargs}
+        key = (id(model), tuple(sorted(options.items())))
+        agent = self._react_agents.get(key)
+        if agent is None:
+            agent = self._react_agents[key] = build_react_agent(model, self.tools, **options)
+        return agent
+
+    def prewarm(self):
+        """Compile the ReAct agents of the primary and the fallback model ahead of the first request."""
+        for model in (self.model, self.model_alt):
+            if model is not None:
+                self.get_react_agent(model)
+
+    def invoke_react_agent(self, agent_input: Dict[str, Any], prompt: SystemMessage, **kwargs) -> Dict[str, Any]:
+        agent_input = {**agent_input, "system_prompt": prompt}
+        try:
+            agent = self.get_react_agent(self.model, **kwargs)
+            return agent.invoke(agent_input)
+        except Exception as e:
+            print(f"Falling back to alternate model: {str(e)}")
+            try:
+                agent = self.get_react_agent(self.model_alt, **kwargs)
+                return agent.invoke(agent_input)
+            except Exception as e:
+                print(f"Error occurred in fallback model: {str(e)}")
+                raise e
+
+    async def ainvoke_react_agent(self, agent_input: Dict[str, Any], prompt: SystemMessage, **kwargs) -> Dict[str, Any]:
+        agent_input = {**agent_input, "system_prompt": prompt}
+        try:
+            agent = self.get_react_agent(self.model, **kwargs)
+            return await agent.ainvoke(agent_input)
+        except Exception as e:
+            print(f"Falling back to alternate model: {str(e)}")
+            try:
+                agent = self.get_react_agent(self.model_alt, **kwargs)
+                return await agent.ainvoke(agent_input)
+            except Exception as e:
+                print(f"Error occurred in fallback model: {str(e)}")
+                raise e
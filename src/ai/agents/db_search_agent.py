@@ -4,7 +4,6 @@ from src.ai.ai_schemas.structured_responses import DBSearchOutput
 from src.ai.agent_prompts.db_search_agent import SYSTEM_PROMPT
 from typing import Dict, Any, Literal
 from langchain_core.messages import HumanMessage, SystemMessage
-from langgraph.prebuilt import create_react_agent
 from .utils import get_context_based_answer_prompt, get_context_messages
 from langgraph.types import Command
 from src.ai.llm.model import get_llm, get_llm_alt
@@ -39,7 +38,7 @@ class DBSearchAgent(BaseAgent):
 
         return input_prompt
 
-    def __call__(self, state: Dict[str, Any]) -> Command[Literal["Planner Agent", "Manager Agent", "Validation Agent"]]:
+    def prepare_agent_input(self, state: Dict[str, Any]):
         input_prompt = self.format_input_prompt(state)
         system_message = SystemMessage(content=self.system_prompt)
         human_message = HumanMessage(content=input_prompt)
@@ -50,20 +49,9 @@ class DBSearchAgent(BaseAgent):
             context_messages = get_context_messages(task['required_context'], state['task_list'])
         
         input = {"messages": context_messages + [human_message]}
-        try:
-            agent = create_react_agent(model=self.model, tools=self.tools, prompt=system_message)
-            communication_log = agent.invoke(input)
-
-        except Exception as e:
-            print(f"Falling back to alternate model: {str(e)}")
-            try:
-                agent = create_react_agent(model=self.model_alt, tools=self.tools, prompt=system_message)
-                communication_log = agent.invoke(input)
-
-            except Exception as e:
-                print(f"Error occurred in fallback model: {str(e)}")
-                raise e
+        return task, system_message, context_messages, input
 
+    def build_command(self, state: Dict[str, Any], task: Dict[str, Any], context_messages: list, communication_log: Dict[str, Any]) -> Command[Literal["Planner Agent", "Manager Agent", "Validation Agent"]]:
         message_history = communication_log['messages']
         filtered_message_history = [
             msg for msg in message_history if msg not in context_messages]
@@ -77,7 +65,17 @@ class DBSearchAgent(BaseAgent):
             goto=agent_name,
             update={
                 "messages": message_history,
-                "current_task": task
+                "current_task": task,
+                "completed_tasks": [task]
             }
         )
 
+    def __call__(self, state: Dict[str, Any]) -> Command[Literal["Planner Agent", "Manager Agent", "Validation Agent"]]:
+        task, system_message, context_messages, input = self.prepare_agent_input(state)
+        communication_log = self.invoke_react_agent(input, system_message)
+        return self.build_command(state, task, context_messages, communication_log)
+
+    async def acall(self, state: Dict[str, Any]) -> Command[Literal["Planner Agent", "Manager Agent", "Validation Agent"]]:
+        task, system_message, context_messages, input = self.prepare_agent_input(state)
+        communication_log = await self.ainvoke_react_agent(input, system_message)
+        return self.build_command(state, task, context_messages, communication_log)
@@ -1,6 +1,7 @@
 from .base_agent import BaseAgent
 from src.ai.ai_schemas.structured_responses import ExecutorAgentOutput
 from src.ai.agent_prompts.executor_agent import SYSTEM_PROMPT
+from src.ai.agent_prompts.assembly import assemble_prompt, PromptContext
 from typing import Dict, Any
 from langchain_core.messages import HumanMessage, SystemMessage
 from src.ai.llm.model import get_llm, get_llm_alt
@@ -36,23 +37,26 @@ class ExecutorAgent(BaseAgent):
         print("----Executor Input----\n", input_prompt, "\n----Executor Input End----")
         return input_prompt
 
+    def format_system_prompt(self, state: Dict[str, Any]) -> str:
+        return assemble_prompt("executor_agent", PromptContext.from_state(state))
+
     def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
         input_prompt = self.format_input_prompt(state)
-        system_message = SystemMessage(content=self.system_prompt)
+        system_message = SystemMessage(content=self.format_system_prompt(state))
+        human_message = HumanMessage(content=input_prompt)
+
+        response = self.invoke_llm([system_message, human_message], response_format=self.response_schema)
+        return self.build_update(human_message, response)
+
+    async def acall(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        input_prompt = self.format_input_prompt(state)
+        system_message = SystemMessage(content=self.format_system_prompt(state))
         human_message = HumanMessage(content=input_prompt)
 
-        try:
-            response = self.model.invoke(
-                input=[system_message, human_message], response_format=self.response_schema)
-        except Exception as e:
-            print(f"Falling back to alternate model: {str(e)}")
-            try:
-                response = self.model_alt.invoke(
-                    input=[system_message, human_message], response_format=self.response_schema)
-            except Exception as e:
-                print(f"Error occurred in fallback model: {str(e)}")
-                raise e
+        response = await self.ainvoke_llm([system_message, human_message], response_format=self.response_schema)
+        return self.build_update(human_message, response)
 
+    def build_update(self, human_message: HumanMessage, response) -> Dict[str, Any]:
         task_list = json.loads(response.content)
 
         # map_task = {
@@ -3,8 +3,9 @@ from src.ai.tools.finance_data_tools import get_stock_data, search_company_info
 # from src.ai.tools.internal_db_tools import search_qdrant_tool
 from typing import Dict, Any, Optional
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from langgraph.prebuilt import create_react_agent
 from src.ai.llm.model import get_llm, get_llm_alt
+from src.ai.agents.base_agent import build_react_agent
+from src.ai.llm.usage_tracker import USAGE_SCOPE, usage_tracker
 from src.ai.llm.config import FastAgentConfig, CountUsageMetricsPricingConfig
 from langgraph.types import Command
 from src.backend.utils.utils import get_date_time, format_fast_agent_update, PRICING, get_user_metadata
@@ -14,13 +15,27 @@ import time
 from src.backend.utils.api_utils import check_stop_conversation
 from src.ai.agents.utils import get_related_queries_util
 import traceback
-from src.ai.agent_prompts.fast_agent import SYSTEM_PROMPT
+from src.ai.agent_prompts.assembly import assemble_prompt, PromptContext
 
 fc = FastAgentConfig()
 cmp = CountUsageMetricsPricingConfig()
 
 llm = get_llm(fc.MODEL, fc.TEMPERATURE, fc.MAX_TOKENS)
 llm_alt = get_llm_alt(fc.ALT_MODEL, fc.ALT_TEMPERATURE, fc.ALT_MAX_TOKENS)
+# Compiled once at import; the assembled system prompt of each request comes in with the input
+fast_react_agent = build_react_agent(llm, [advanced_internet_search, get_stock_data, search_company_info])
+# A query answered through these is a finance query, which the response cache may keep
+FINANCE_TOOLS = {"get_stock_data", "search_company_info"}
+
+
+def calls_finance_tool(update: Dict[str, Any]) -> bool:
+    for node_update in update.values():
+        if not isinstance(node_update, dict):
+            continue
+        for msg in node_update.get('messages') or []:
+            if isinstance(msg, AIMessage) and any(tool_call['name'] in FINANCE_TOOLS for tool_call in msg.tool_calls):
+                return True
+    return False
 
 
 async def format_fast_agent_input_prompt(user_query: str, session_id: str, prev_message_id: str, timezone: str, ip_address: str = "", doc_ids: Optional[list[str]] = None) -> str:
@@ -55,8 +70,9 @@ async def process_fast_agent_input(user_id: str, session_id: str, user_query: st
     """
     start_time = time.monotonic()
     sources_for_message = []
-    query_metadata = {'input_tokens': 0, 'output_tokens': 0, 'total_tokens': 0, 'token_cost': 0.0}
+    query_metadata = {'input_tokens': 0, 'cached_input_tokens': 0, 'output_tokens': 0, 'total_tokens': 0, 'token_cost': 0.0}
     final_response_content = ""
+    finance_query = False
     stopTime = time.time()
 
     local_time = get_date_time(timezone)
@@ -77,44 +93,46 @@ async def process_fast_agent_input(user_id: str, session_id: str, user_query: st
 
 
     def count_usage_metrics(token_usage):
+        pricing = PRICING.get(token_usage.get('model'), PRICING[cmp.MODEL])
+        cached_input_tokens = token_usage.get("cached_input_tokens", 0)
 
-
-        model = token_usage.get(get_llm(cmp.MODEL))
-        pricing = PRICING.get(model, PRICING.get[cmp.MODEL])
-
-        input_cost = pricing["input"] * token_usage.get("input_tokens", 0)
+        input_cost = pricing["input"] * (token_usage.get("input_tokens", 0) - cached_input_tokens) + pricing["cached_input"] * cached_input_tokens
         output_cost = pricing["output"] * token_usage.get("output_tokens", 0)
         total_cost = input_cost + output_cost
 
         query_metadata["input_tokens"] += token_usage.get("input_tokens", 0)
+        query_metadata["cached_input_tokens"] += cached_input_tokens
         query_metadata["output_tokens"] += token_usage.get("output_tokens", 0)
         query_metadata["total_tokens"] += token_usage.get("total_tokens", 0)
         query_metadata["token_cost"] += total_cost
 
 
     yield {"start_stream": str(message_id)}
-    
+    usage_tracker.start(message_id)
+
     try:
-        system_msg = SystemMessage(content=SYSTEM_PROMPT)
         input_messages = await format_fast_agent_input_prompt(user_query, session_id, prev_message_id, timezone, ip_address, doc_ids)
+        prompt_context = PromptContext(user_query=user_query, has_history=len(input_messages) > 1, has_documents=bool(doc_ids))
+        system_msg = SystemMessage(content=assemble_prompt("fast_agent", prompt_context))
         
         # agent = create_react_agent(model=llm, tools=[advanced_internet_search, get_stock_data, search_qdrant_tool, search_company_info], prompt=system_msg)
-        agent = create_react_agent(model=llm, tools=[advanced_internet_search, get_stock_data, search_company_info], prompt=system_msg)
         
         input_data = {
             'user_query': user_query,
             'doc_ids': doc_ids if doc_ids else [],
         }
         yield {"enriched_content": store_current_message(input_data)}
-        message_logs = f"HUMAN INPUT\n{str(input_data)}\n\n"
-        yield {"message_logs": message_logs}
+        yield {"trace": ("human_input", input_data)}
         await mongodb.store_user_query(user_id, session_id, message_id, user_query, timezone, doc_ids)
 
-        async for stream_mode, update in agent.astream(input={"messages": input_messages}, stream_mode=['updates', 'messages', 'custom'], config={'recursion_limit': 50}):
+        async for stream_mode, update in fast_react_agent.astream(input={"messages": input_messages, "system_prompt": system_msg}, stream_mode=['updates', 'messages', 'custom'], config={'recursion_limit': 50, 'metadata': {USAGE_SCOPE: str(message_id)}}):
             if stream_mode == 'updates':
                 print("---\n", update, "\n---")
-                message_logs = f"AGENT UPDATE\n{str((stream_mode, update))}\n\n"
-                yield {"message_logs": message_logs}
+                yield {"trace": ("agent_update", (stream_mode, update))}
+                if not finance_query and calls_finance_tool(update):
+                    finance_query = True
+                    # Read by the response cache in place of the Intent Detector's classification
+                    yield {"cache_hints": {"query_intent": ["realtime"], "is_relevant_query": True}}
             
             if stream_mode == 'custom':
                 print("---\n", update, "\n---")
@@ -129,8 +147,7 @@ async def process_fast_agent_input(user_id: str, session_id: str, user_query: st
             msg_to_yield = await format_fast_agent_update(stream_mode, update)
 
             if msg_to_yield:
-                message_logs = f"FORMATTED MESSAGE\n{str(msg_to_yield)}\n\n"
-                yield {"message_logs": message_logs}
+                yield {"trace": ("formatted_message", msg_to_yield)}
 
             if isinstance(msg_to_yield, list):
                 for m_item in msg_to_yield:
@@ -171,13 +188,14 @@ async def process_fast_agent_input(user_id: str, session_id: str, user_query: st
 
         yield final_data_event
 
-        yield {"store_data": {}, 'notification': True, 'suggestions': True, 'retry': True}
+        for token_usage in await usage_tracker.collect(message_id):
+            count_usage_metrics(token_usage)
+        yield {"store_data": {"metadata": query_metadata}, 'notification': True, 'suggestions': True, 'retry': True}
 
     except Exception as e:
         error_msg = f"Error in agent processing: {traceback.format_exc()}"
         print(error_msg)
-        message_logs = f"ERROR MESSAGE\n{str(error_msg)}\n\n"
-        yield {"message_logs": message_logs}
+        yield {"trace": ("error", error_msg)}
         error_event = {'error': error_msg}
         yield error_event
 
@@ -188,4 +206,4 @@ async def process_fast_agent_input(user_id: str, session_id: str, user_query: st
         yield {"store_data": {}, 'notification': False, 'suggestions': False, 'retry': True}
 
     finally:
-        pass
+        usage_tracker.pop(message_id)
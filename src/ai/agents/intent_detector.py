@@ -1,6 +1,7 @@
 from .base_agent import BaseAgent
 from src.ai.ai_schemas.structured_responses import IntentDetection
 from src.ai.agent_prompts.intent_detector import SYSTEM_PROMPT
+from src.ai.agent_prompts.assembly import assemble_prompt, PromptContext
 from typing import Dict, Any, Literal
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 from langgraph.types import Command
@@ -47,23 +48,24 @@ class IntentDetector(BaseAgent):
         history.append(HumanMessage(content=input_prompt))
         return history
 
-    def __call__(self, state: Dict[str, Any]) -> Command[Literal["Manager Agent", "Planner Agent", "DB Search Agent", "__end__"]]:
+    def format_system_prompt(self, state: Dict[str, Any]) -> str:
+        return assemble_prompt("intent_detector", PromptContext.from_state(state))
+
+    def format_messages(self, state: Dict[str, Any]) -> list:
         history = self.format_input_prompt(state)
-        messages = [SystemMessage(content=self.system_prompt)] + history
-
-        try:
-            output = self.model.invoke(input=messages, response_format=self.response_schema)
-            # print("From Inside Intent Detector")
-            # print(f"input to llm = \n{messages}\n")
-            # print(f"output of llm = \n{output}\n")
-        except Exception as e:
-            print(f"Falling back to alternate model: {str(e)}")
-            try:
-                output = self.model_alt.invoke(input=messages, response_format=self.response_schema)
-            except Exception as e:
-                print(f"Error occurred in fallback model: {str(e)}")
-                raise e
+        return [SystemMessage(content=self.format_system_prompt(state))] + history
+
+    def __call__(self, state: Dict[str, Any]) -> Command[Literal["Manager Agent", "Planner Agent", "DB Search Agent", "__end__"]]:
+        messages = self.format_messages(state)
+        output = self.invoke_llm(messages, response_format=self.response_schema)
+        return self.route(state, output)
+
+    async def acall(self, state: Dict[str, Any]) -> Command[Literal["Manager Agent", "Planner Agent", "DB Search Agent", "__end__"]]:
+        messages = self.format_messages(state)
+        output = await self.ainvoke_llm(messages, response_format=self.response_schema)
+        return self.route(state, output)
 
+    def route(self, state: Dict[str, Any], output) -> Command[Literal["Manager Agent", "Planner Agent", "DB Search Agent", "__end__"]]:
         response = json.loads(output.content)
         print(f"response from llm (json.loads(output.content)) = \n{response}\n")
 
@@ -82,6 +84,7 @@ class IntentDetector(BaseAgent):
                         update={
                             "messages": output,
                             "query_tag": response.get('query_tag'),
+                            "query_intent": response.get('query_intent'),
                             "is_relevant_query": True,
                             "progress": progress
                         }
@@ -98,6 +101,7 @@ class IntentDetector(BaseAgent):
                         update={
                             "messages": output,
                             "query_tag": response.get('query_tag'),
+                            "query_intent": response.get('query_intent'),
                             "formatted_user_query": response.get('formatted_user_query'),
                             "is_relevant_query": True,
                             "progress_bar": progress
@@ -157,18 +157,20 @@ class ManagerAgent(BaseAgent):
        system_message = SystemMessage(content=self.system_prompt)
        human_message = HumanMessage(content=input_prompt)
 
+       response = self.invoke_llm([system_message, human_message])
+       return self.route(state, human_message, response)
 
-       try:
-           response = self.model.invoke(input=[system_message, human_message])
-       except Exception as e:
-           print(f"Falling back to alternate model: {str(e)}")
-           try:
-               response = self.model_alt.invoke(input=[system_message, human_message])
-           except Exception as e:
-               print(f"Error occurred in fallback model: {str(e)}")
-               raise e
+
+   async def acall(self, state: Dict[str, Any]) -> Dict[str, Any] | Command[Literal["Web Search Agent", "Social Media Scrape Agent", "Finance Data Agent", "Coding Agent", "Response Generator Agent", "__end__"]]:
+       input_prompt = self.format_input_prompt(state)
+       system_message = SystemMessage(content=self.system_prompt)
+       human_message = HumanMessage(content=input_prompt)
+
+       response = await self.ainvoke_llm([system_message, human_message])
+       return self.route(state, human_message, response)
 
 
+   def route(self, state: Dict[str, Any], human_message: HumanMessage, response) -> Dict[str, Any] | Command[Literal["Web Search Agent", "Social Media Scrape Agent", "Finance Data Agent", "Coding Agent", "Response Generator Agent", "__end__"]]:
        thinking, task_json = self.extract_thinking_and_json(response.content)
 
 
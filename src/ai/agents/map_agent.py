@@ -1,7 +1,6 @@
 from .base_agent import BaseAgent
 from typing import Dict, Any, Literal
 from langchain_core.messages import HumanMessage, SystemMessage
-from langgraph.prebuilt import create_react_agent
 from .utils import get_context_messages_for_response
 from src.ai.llm.model import get_llm, get_llm_alt
 from src.ai.llm.config import MapConfig
@@ -20,6 +19,7 @@ class MapAgent(BaseAgent):
         self.model_alt = get_llm_alt(mapc.ALT_MODEL, mapc.ALT_TEMPERATURE, mapc.ALT_MAX_TOKENS)
         self.system_prompt = SYSTEM_PROMPT
         self.response_schema = SingleLayerResponse
+        self.react_agent_options = {"response_format": self.response_schema}
 
     def format_input_prompt(self, state: Dict[str, Any]) -> str:
         task = state['current_task']
@@ -32,7 +32,7 @@ class MapAgent(BaseAgent):
 
         return input_prompt
 
-    def __call__(self, state: Dict[str, Any]) -> Command[Literal["Manager Agent", "Task Router"]]:
+    def prepare_agent_input(self, state: Dict[str, Any]):
         task = state['current_task'].copy()
 
         input_prompt = self.format_input_prompt(state)
@@ -41,21 +41,9 @@ class MapAgent(BaseAgent):
 
 
         agent_input = {"messages": [human_message]}
+        return task, system_message, agent_input
 
-        try:
-            agent = create_react_agent(model=self.model, tools=self.tools, response_format=self.response_schema, prompt=system_message)
-            communication_log = agent.invoke(agent_input)
-
-        except Exception as e:
-            print(f"Falling back to alternate model: {str(e)}")
-            try:
-                agent = create_react_agent(model=self.model_alt, tools=self.tools, response_format=self.response_schema, prompt=system_message)
-                communication_log = agent.invoke(agent_input)
-
-            except Exception as e:
-                print(f"Error occurred in fallback model: {str(e)}")
-                raise e
-
+    def build_command(self, state: Dict[str, Any], task: Dict[str, Any], communication_log: Dict[str, Any]) -> Command[Literal["Manager Agent", "Task Router"]]:
         message_history = communication_log['messages']
         task['task_messages'] = communication_log['structured_response'].model_dump()
 
@@ -68,6 +56,17 @@ class MapAgent(BaseAgent):
             goto=agent_name,
             update={
                 "messages": message_history,
-                "current_task": task
+                "current_task": task,
+                "completed_tasks": [task]
             }
         )
+
+    def __call__(self, state: Dict[str, Any]) -> Command[Literal["Manager Agent", "Task Router"]]:
+        task, system_message, agent_input = self.prepare_agent_input(state)
+        communication_log = self.invoke_react_agent(agent_input, system_message)
+        return self.build_command(state, task, communication_log)
+
+    async def acall(self, state: Dict[str, Any]) -> Command[Literal["Manager Agent", "Task Router"]]:
+        task, system_message, agent_input = self.prepare_agent_input(state)
+        communication_log = await self.ainvoke_react_agent(agent_input, system_message)
+        return self.build_command(state, task, communication_log)
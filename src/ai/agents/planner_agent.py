@@ -71,16 +71,18 @@ class PlannerAgent(BaseAgent):
         system_message = SystemMessage(content=self.system_prompt)
         human_message = HumanMessage(content=input_prompt)
 
-        try:
-            response = self.model.invoke(input=[system_message, human_message])
-        except Exception as e:
-            print(f"Falling back to alternate model: {str(e)}")
-            try:
-                response = self.model_alt.invoke(input=[system_message, human_message])
-            except Exception as e:
-                print(f"Error occurred in fallback model: {str(e)}")
-                raise e
-            
+        response = self.invoke_llm([system_message, human_message])
+        return self.build_update(state, human_message, response)
+
+    async def acall(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        input_prompt = self.format_input_prompt(state)
+        system_message = SystemMessage(content=self.system_prompt)
+        human_message = HumanMessage(content=input_prompt)
+
+        response = await self.ainvoke_llm([system_message, human_message])
+        return self.build_update(state, human_message, response)
+
+    def build_update(self, state: Dict[str, Any], human_message: HumanMessage, response) -> Dict[str, Any]:
         print("========\n", response.content, "\n++++++++")
         thinking, task_json = self.extract_thinking_and_json(response.content)
         print(thinking)
@@ -1,13 +1,12 @@
 from .base_agent import BaseAgent
 from src.ai.agent_prompts.response_generator_agent import SYSTEM_PROMPT
-from src.ai.agent_prompts.preference_aware_prompts import get_preference_aware_prompt
+from src.ai.agent_prompts.assembly import assemble_prompt, PromptContext
 from typing import Dict, Any
 from langchain_core.messages import HumanMessage, SystemMessage
 from .utils import get_context_messages_for_response
 from src.ai.llm.model import get_llm, get_llm_alt
 from src.ai.llm.config import ReportGenerationConfig
 from src.ai.tools.graph_gen_tool import graph_tool_list
-from langgraph.prebuilt import create_react_agent
 from datetime import date
 import re
 
@@ -57,39 +56,34 @@ class ReportGenerationAgent(BaseAgent):
 
         return input_prompt
 
-    def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        task = state['current_task'].copy()
+    def format_system_prompt(self, state: Dict[str, Any]) -> str:
+        # Use preference-aware prompt instead of default system prompt
+        user_preference = self.extract_user_preference(state.get('user_metadata', ''))
+        return assemble_prompt(f"response_generator:{user_preference or 'default'}", PromptContext.from_state(state))
+
+    def prepare_agent_input(self, state: Dict[str, Any]):
         # print("--- Start of ReportGenerationAgent ---") #
         # print(f"\n state inside ReportGenerationAgent = {state}\n") #
 
         input_prompt = self.format_input_prompt(state)
         
-        # Extract user preference from user_metadata
-        user_preference = self.extract_user_preference(state.get('user_metadata', ''))
-        
-        # Use preference-aware prompt instead of default system prompt
-        preference_aware_prompt = get_preference_aware_prompt(user_preference)
-        system_message = SystemMessage(content=preference_aware_prompt)
+        system_message = SystemMessage(content=self.format_system_prompt(state))
         human_message = HumanMessage(content=input_prompt)
 
         input = {"messages": [human_message]}
+        return system_message, human_message, input
+
+    def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        system_message, human_message, input = self.prepare_agent_input(state)
+        response = self.invoke_react_agent(input, system_message)
+        return self.build_update(state, human_message, response)
 
-        try:
-            # response = self.model.invoke(input=[system_message, human_message])
-            agent = create_react_agent(model=self.model, tools=self.tools, prompt=system_message)            
-            response = agent.invoke(input)
-            # print(f"response of report generation agent = {response}.") #
-
-        except Exception as e:
-            print(f"Falling back to alternate model: {str(e)}")
-            try:
-                agent = create_react_agent(
-                    model=self.model_alt, tools=self.tools, prompt=system_message)
-                response = agent.invoke(input)
-            except Exception as e:
-                print(f"Error occurred in fallback model: {str(e)}")
-                raise e
+    async def acall(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        system_message, human_message, input = self.prepare_agent_input(state)
+        response = await self.ainvoke_react_agent(input, system_message)
+        return self.build_update(state, human_message, response)
 
+    def build_update(self, state: Dict[str, Any], human_message: HumanMessage, response: Dict[str, Any]) -> Dict[str, Any]:
         # final_response = response.content.strip()
         # Safely extract final response from the last message
         messages = response.get("messages", [])
@@ -28,7 +28,7 @@ Address any identified issues and enhance the overall quality of the output.\n""
 
         return input_prompt
 
-    def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    def prepare_messages(self, state: Dict[str, Any]):
         task = state['current_task'].copy()
 
         input_prompt = self.format_input_prompt(state)
@@ -40,21 +40,23 @@ Address any identified issues and enhance the overall quality of the output.\n""
             context_messages = get_context_messages(
                 task['required_context'], state['task_list'])
 
-        try:
-            response = self.model.invoke(
-                input=[system_message] + context_messages + [human_message])
-        except Exception as e:
-            print(f"Falling back to alternate model: {str(e)}")
-            try:
-                response = self.model_alt.invoke(
-                    input=[system_message] + context_messages + [human_message])
-            except Exception as e:
-                print(f"Error occurred in fallback model: {str(e)}")
-                raise e
+        return task, human_message, [system_message] + context_messages + [human_message]
+
+    def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        task, human_message, messages = self.prepare_messages(state)
+        response = self.invoke_llm(messages)
+        return self.build_update(state, task, human_message, response)
+
+    async def acall(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        task, human_message, messages = self.prepare_messages(state)
+        response = await self.ainvoke_llm(messages)
+        return self.build_update(state, task, human_message, response)
 
+    def build_update(self, state: Dict[str, Any], task: Dict[str, Any], human_message: HumanMessage, response) -> Dict[str, Any]:
         task['task_messages'] = [human_message, response]
 
         return {
             "messages": [human_message, response],
-            "current_task": task
+            "current_task": task,
+            "completed_tasks": [task]
         }
@@ -3,18 +3,19 @@ from litellm import acompletion
 import src.backend.db.mongodb as mongodb
 import json
 import src.backend.utils as utils
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Union
 from datetime import datetime
 import json
 from dotenv import load_dotenv
 import time
 from src.ai.llm.config import SummarizerConfig
 from src.backend.utils.utils import get_unique_response_id
+from src.backend.utils.stream_coalescer import StreamCoalescer, coalesce
 
 load_dotenv()
 smc = SummarizerConfig()
 
-async def stream_summary(user_id: str, session_id: str, message_id: str, prev_message_id: str, user_query: str, local_time: datetime, timezone: str, is_elaborate: bool = False, give_examples: bool = True) -> AsyncGenerator[str, None]:
+async def stream_summary(user_id: str, session_id: str, message_id: str, prev_message_id: str, user_query: str, local_time: datetime, timezone: str, is_elaborate: bool = False, give_examples: bool = True) -> AsyncGenerator[Union[str, bytes], None]:
     start_time = time.monotonic()
     last_message = await mongodb.get_response_by_message_id(prev_message_id)
 
@@ -68,13 +69,18 @@ Your task:
 
         summary_chunks = []
         response_id = get_unique_response_id()
-        async for chunk in stream:
-            if chunk.choices and len(chunk.choices) > 0:
-                delta = chunk.choices[0].delta
-                if hasattr(delta, 'content') and delta.content:
-                    content_piece = delta.content
-                    summary_chunks.append(content_piece)
-                    yield f"data: {json.dumps({'type': 'response-chunk', 'agent_name': agent_name, 'message_id': message_id, 'id': response_id, 'content': content_piece})}\n\n"
+
+        async def content_chunks():
+            async for chunk in stream:
+                if chunk.choices and len(chunk.choices) > 0:
+                    delta = chunk.choices[0].delta
+                    if hasattr(delta, 'content') and delta.content:
+                        content_piece = delta.content
+                        summary_chunks.append(content_piece)
+                        yield {'type': 'response-chunk', 'agent_name': agent_name, 'id': response_id, 'content': content_piece}
+
+        async for frame in coalesce(content_chunks(), StreamCoalescer(message_id)):
+            yield frame
 
         full_summary = ''.join(summary_chunks)
         
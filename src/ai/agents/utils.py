@@ -1,5 +1,5 @@
 from typing import List, Dict, Any, Literal
-from langgraph.types import Command
+from langgraph.types import Command, Send
 from langgraph.graph import END
 from langchain_core.messages import AIMessage, ToolMessage
 from src.ai.llm.model import get_llm, get_llm_alt
@@ -141,57 +141,86 @@ def get_context_messages_for_response(required_context: List[str], task_list: Li
 #     )
 
 
+def get_ready_tasks(task_list: List[Dict[str, Any]], done: set) -> List[Dict[str, Any]]:
+    """
+    Tasks whose `required_context` is fully satisfied by `done`. Context names that do not
+    belong to any task in the plan are ignored, and the Response Generator Agent only becomes
+    ready once every other task of the plan has finished.
+    """
+    task_names = {task['task_name'] for task in task_list}
+    pending = [task for task in task_list if task['task_name'] not in done]
+    ready = []
+
+    for task in pending:
+        if task['agent_name'] == 'Response Generator Agent':
+            dependencies = {other['task_name'] for other in task_list if other['task_name'] != task['task_name']}
+        else:
+            dependencies = {name for name in task.get('required_context') or [] if name in task_names}
+
+        if dependencies <= done:
+            ready.append(task)
+
+    if pending and not ready:
+        # Cyclic or otherwise unsatisfiable plan: fall back to the sequential order.
+        ready = [pending[0]]
+
+    return ready
+
+
 def task_router_node(state: Dict[str, Any]) -> Command[Literal["Web Search Agent", "Social Media Scrape Agent", "Finance Data Agent",
                                                                "Sentiment Analysis Agent", "Data Comparison Agent", "Coding Agent",
-                                                               "Response Generator Agent", "__end__"]]:
+                                                               "DB Search Agent", "Map Agent", "Response Generator Agent",
+                                                               "__end__"]]:
+    """
+    Schedules the planner's `task_list` as a DAG built from the `required_context` edges.
+
+    Every task whose dependencies are complete is sent to its agent in the same superstep, so
+    independent tasks run in parallel and the router only runs again once the whole batch has
+    reported back through `completed_tasks`. In reasoning mode agents report back to the Manager
+    Agent, which only sees the last `current_task`, so tasks are sent one at a time instead.
+    """
     task_list = state['task_list'].copy()
-    current_task = state.get('current_task')
+    completed_tasks = {task['task_name']: task for task in state.get('completed_tasks') or []}
     TOTAL_PROGRESS = 70.0
 
-    if current_task is None:
-        # First task
-        next_task = task_list[0]
-        
-        num_tasks = len(task_list) - 1
-        progress_per_task = TOTAL_PROGRESS / num_tasks if num_tasks > 0 else 0.0
-        
-        new_progress = state.get("progress_bar", 0.0)  # no increment here
-        # print("====Inside Executor agent (initial task)====")
-        # print(f"===Progress in Executor Agent: {new_progress}===")
-        # print(f"===Progress in Executor Agent: {new_progress+10}===")
-    else:
-        # Continuing task list
-        current_task_index = next((index for index, task in enumerate(task_list) if task['task_name'] == current_task['task_name']), -1)
-        task_list[current_task_index] = current_task
-
-        num_tasks = len(task_list) - 1
-        progress_per_task = TOTAL_PROGRESS / num_tasks if num_tasks > 0 else 0.0
-        
-        print(f"\n====Progress per task: {progress_per_task}====\n")
-        current_progress = state.get("progress_bar", 0.0)
-        new_progress = min(current_progress + progress_per_task, 100.0)
+    num_tasks = len(task_list) - 1
+    progress_per_task = TOTAL_PROGRESS / num_tasks if num_tasks > 0 else 0.0
+
+    finished = 0
+    for index, task in enumerate(task_list):
+        if task.get('status') != 'done' and task['task_name'] in completed_tasks:
+            task_list[index] = {**completed_tasks[task['task_name']], 'status': 'done'}
+            finished += 1
+
+    # No increment for the initial dispatch, one step per task that finished since the last batch
+    current_progress = state.get("progress_bar", 0.0)
+    new_progress = min(current_progress + progress_per_task * finished, 100.0)
 
-        print("====Inside Executor agent====")
-        print(f"===Progress in Executor Agent: {new_progress}===")
+    done = {task['task_name'] for task in task_list if task.get('status') == 'done'}
+    ready = get_ready_tasks(task_list, done)
+    if state.get('reasoning'):
+        ready = ready[:1]
 
-        if current_task_index == len(task_list) - 1:
-            return Command(
-                goto=END,
-                update={
-                    'task_list': task_list,
-                    'progress_bar': new_progress
-                }
-            )
+    if not ready:
+        return Command(
+            goto=END,
+            update={
+                'task_list': task_list,
+                'progress_bar': new_progress
+            }
+        )
 
-        next_task = task_list[current_task_index + 1]
+    ready_names = {task['task_name'] for task in ready}
+    task_list = [{**task, 'status': 'running'} if task['task_name'] in ready_names else task for task in task_list]
+    dispatched_tasks = [task for task in task_list if task['task_name'] in ready_names]
 
-    target_agent = next_task['agent_name']
+    branch_state = {**state, 'task_list': task_list, 'progress_bar': new_progress}
 
     return Command(
-        goto=target_agent,
+        goto=[Send(task['agent_name'], {**branch_state, 'current_task': task}) for task in dispatched_tasks],
         update={
-            'current_task': next_task,
             'task_list': task_list,
+            'dispatched_tasks': dispatched_tasks,
             'progress_bar': new_progress
         }
     )
@@ -29,39 +29,41 @@ class ValidationAgent(BaseAgent):
         return "\n".join(input_prompt)
 
   
+    FEEDBACK_CYCLE_LIMIT = 3
+
+    def feedback_limit_command(self, state: Dict[str, Any]) -> Command[Literal["__end__"]]:
+        return Command(
+            goto=END,
+            update={
+                "validation_result": {"is_valid": "Fully Correct Response", "feedback": "Maximum retries reached"},
+                "feedback_cycle": state.get('feedback_cycle', 0),
+                "current_task": None
+            }
+        )
+
     def __call__(self, state: Dict[str, Any]) -> Command[Literal["Planner Agent", "Manager Agent", "__end__"]]:
-        FEEDBACK_CYCLE_LIMIT = 3
+        if state.get('feedback_cycle', 0) >= self.FEEDBACK_CYCLE_LIMIT:
+            return self.feedback_limit_command(state)
 
-        if state.get('feedback_cycle', 0) >= FEEDBACK_CYCLE_LIMIT:
-            return Command(
-                goto=END,
-                update={
-                    "validation_result": {"is_valid": "Fully Correct Response", "feedback": "Maximum retries reached"},
-                    "feedback_cycle": state.get('feedback_cycle', 0),
-                    "current_task": None
-                }
-            )
+        input_prompt = self.format_input_prompt(state)
+        system_message = SystemMessage(content=self.system_prompt)
+        human_message = HumanMessage(content=input_prompt)
+
+        response = self.invoke_llm([system_message, human_message], response_format=self.response_schema)
+        return self.route(state, response)
+
+    async def acall(self, state: Dict[str, Any]) -> Command[Literal["Planner Agent", "Manager Agent", "__end__"]]:
+        if state.get('feedback_cycle', 0) >= self.FEEDBACK_CYCLE_LIMIT:
+            return self.feedback_limit_command(state)
 
         input_prompt = self.format_input_prompt(state)
         system_message = SystemMessage(content=self.system_prompt)
         human_message = HumanMessage(content=input_prompt)
 
-        try:
-            response = self.model.invoke(
-                input=[system_message, human_message],
-                response_format=self.response_schema
-            )
-        except Exception as e:
-            print(f"Falling back to alternate model: {str(e)}")
-            try:
-                response = self.model_alt.invoke(
-                    input=[system_message, human_message],
-                    response_format=self.response_schema
-                )
-            except Exception as e:
-                print(f"Error occurred in fallback model: {str(e)}")
-                raise e
+        response = await self.ainvoke_llm([system_message, human_message], response_format=self.response_schema)
+        return self.route(state, response)
 
+    def route(self, state: Dict[str, Any], response) -> Command[Literal["Planner Agent", "Manager Agent", "__end__"]]:
         validation_result = json.loads(response.content)
 
         new_cycle = state.get('feedback_cycle', 0) + (1 if validation_result['is_valid'] == "Incorrect Response" else 0)
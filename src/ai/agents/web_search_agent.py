@@ -3,9 +3,7 @@ from src.ai.tools.web_search_tools import tool_list
 from src.ai.agent_prompts.web_search_agent import SYSTEM_PROMPT
 from typing import Dict, Any, Literal
 from langchain_core.messages import HumanMessage, SystemMessage
-from langgraph.prebuilt import create_react_agent
 from .utils import get_context_messages
-from langgraph.prebuilt import create_react_agent
 from src.ai.llm.model import get_llm, get_llm_alt
 from src.ai.llm.config import WebSearchConfig
 from langgraph.types import Command
@@ -34,7 +32,7 @@ Address any identified issues and enhance the overall quality of the output.\n""
 
         return input_prompt
 
-    def __call__(self, state: Dict[str, Any]) -> Command[Literal["Manager Agent", "Task Router"]]:
+    def prepare_agent_input(self, state: Dict[str, Any]):
         task = state['current_task'].copy()
 
         input_prompt = self.format_input_prompt(state)
@@ -47,27 +45,14 @@ Address any identified issues and enhance the overall quality of the output.\n""
                 task['required_context'], state['task_list'])
 
         input = {"messages": context_messages + [human_message]}
+        return task, system_message, context_messages, input
 
-        try:
-            agent = create_react_agent(model=self.model, tools=self.tools, prompt=system_message)
-            communication_log = agent.invoke(input)
-
-        except Exception as e:
-            print(f"Falling back to alternate model: {str(e)}")
-            try:
-                agent = create_react_agent(
-                    model=self.model_alt, tools=self.tools, prompt=system_message)
-                communication_log = agent.invoke(input)
-
-            except Exception as e:
-                print(f"Error occurred in fallback model: {str(e)}")
-                raise e
-
+    def build_command(self, state: Dict[str, Any], task: Dict[str, Any], context_messages: list, communication_log: Dict[str, Any]) -> Command[Literal["Manager Agent", "Task Router"]]:
         message_history = communication_log['messages']
         filtered_message_history = [
             msg for msg in message_history if msg not in context_messages]
         task['task_messages'] = filtered_message_history
-        
+
         if state['reasoning']:
             agent_name = "Manager Agent"
         else:
@@ -77,6 +62,17 @@ Address any identified issues and enhance the overall quality of the output.\n""
             goto=agent_name,
             update={
                 "messages": filtered_message_history,
-                "current_task": task
+                "current_task": task,
+                "completed_tasks": [task]
             }
         )
+
+    def __call__(self, state: Dict[str, Any]) -> Command[Literal["Manager Agent", "Task Router"]]:
+        task, system_message, context_messages, input = self.prepare_agent_input(state)
+        communication_log = self.invoke_react_agent(input, system_message)
+        return self.build_command(state, task, context_messages, communication_log)
+
+    async def acall(self, state: Dict[str, Any]) -> Command[Literal["Manager Agent", "Task Router"]]:
+        task, system_message, context_messages, input = self.prepare_agent_input(state)
+        communication_log = await self.ainvoke_react_agent(input, system_message)
+        return self.build_command(state, task, context_messages, communication_log)
@@ -1,3 +1,4 @@
+import operator
 from typing import Annotated, Sequence, Optional, List
 from datetime import datetime
 from langchain_core.messages import BaseMessage
@@ -5,6 +6,11 @@ from typing_extensions import TypedDict
 from langgraph.graph import add_messages
 
 
+def latest_task(left: Optional[dict], right: Optional[dict]) -> Optional[dict]:
+    # Tasks dispatched in parallel by the Task Router all write `current_task` in the same step.
+    return right
+
+
 class InsightAgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]
     manager_instructions: Annotated[Sequence[BaseMessage], add_messages]
@@ -15,13 +21,16 @@ class InsightAgentState(TypedDict):
     file_content: Optional[str]
     user_query: str
     query_tag: str
+    query_intent: Optional[list]
     is_relevant_query: bool
     required_information: str
     initial_info: str
     reasoning : bool
     subtasks: list
     task_list: list
-    current_task: dict
+    current_task: Annotated[Optional[dict], latest_task]
+    completed_tasks: Annotated[list, operator.add]
+    dispatched_tasks: list
     final_response: str
     validation_result: Optional[dict]
     feedback_cycle: int
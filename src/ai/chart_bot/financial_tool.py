@@ -2,7 +2,7 @@ import requests
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
 import os
-import httpx
+from src.ai.tools import http_client
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -51,10 +51,9 @@ async def fetch_stock_price_history(ticker: str, from_date: str = None, to_date:
     if to_date:
         params["to"] = to_date
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, params=params)
-        print(f"response.json() = {response.json()}")
-        return response.json()
+    response = await http_client.aget(url, params=params)
+    print(f"response.json() = {response.json()}")
+    return response.json()
 
 
 @tool(args_schema=CryptoHistoricalPriceInput)
@@ -78,10 +77,9 @@ async def fetch_crypto_price_history(symbol: str, from_date: str = None, to_date
     if to_date:
         params["to"] = to_date
 
-    async with httpx.AsyncClient() as client:
-        print(url)
-        response = await client.get(url, params=params)
-        return response.json()
+    print(url)
+    response = await http_client.aget(url, params=params)
+    return response.json()
 
 
 # get_historical = get_historical_price_full()
@@ -0,0 +1,187 @@
+# chart_bot/indicators.py
+"""
+Local technical-indicator engine for the chart bot.
+
+Source:
+  • The ticker's cached daily series (`market_data_cache.get_series`), fetched from FMP at
+    most once a day and shared with the rest of the app.
+
+Behavior highlights:
+  • Indicators are computed with NumPy over the whole history, so every bar of the requested
+    window has its full look-back and all requested periods come from one load of the closes.
+  • SMA (one cumulative sum for all periods), EMA and Wilder RSI (linear recursive filters),
+    rolling σ (sliding windows).
+  • Signals on any value series: moving-average crossovers, threshold crossings, longest
+    threshold streaks.
+  • Rows come out in the tools' format: newest-first [{"date": "YYYY-MM-DD", <key>: float}].
+"""
+
+from __future__ import annotations
+
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+from src.backend.db.market_data import market_data_cache
+
+
+# ---------- Data ----------
+
+async def load_daily_closes(symbol: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(dates as datetime64[D], closes) of `symbol`, oldest first."""
+    series = await market_data_cache.arun(market_data_cache.get_series(symbol))
+    return series.dates, series.columns["close"]
+
+
+def window(dates: np.ndarray, _from: Optional[str], _to: Optional[str]) -> slice:
+    """Slice of ascending `dates` within [_from, _to] (both optional, 'YYYY-MM-DD')."""
+    lo = np.searchsorted(dates, np.datetime64(_from[:10], "D")) if _from else 0
+    hi = np.searchsorted(dates, np.datetime64(_to[:10], "D"), side="right") if _to else len(dates)
+    return slice(lo, hi)
+
+
+def to_rows(dates: np.ndarray, values: np.ndarray, key: str) -> List[Dict[str, Any]]:
+    """Newest-first rows of the defined (non-NaN) values."""
+    keep = ~np.isnan(values)
+    days = np.datetime_as_string(dates[keep][::-1], unit="D").tolist()
+    return [{"date": d, key: v} for d, v in zip(days, values[keep][::-1].tolist())]
+
+
+def values_of(rows: Iterable[Dict[str, Any]], key: str) -> np.ndarray:
+    """Values of `key` in `rows` as floats, NaN where missing."""
+    return np.array([np.nan if row.get(key) is None else float(row[key]) for row in rows], dtype=np.float64)
+
+
+# ---------- Indicators ----------
+
+def sma_many(values: np.ndarray, periods: Iterable[int]) -> Dict[int, np.ndarray]:
+    """Simple moving averages of every period from one cumulative sum; NaN until a window is full."""
+    values = np.asarray(values, dtype=np.float64)
+    csum = np.concatenate(([0.0], np.cumsum(values)))
+    out: Dict[int, np.ndarray] = {}
+    for p in periods:
+        avg = np.full(len(values), np.nan)
+        if 0 < p <= len(values):
+            avg[p - 1:] = (csum[p:] - csum[:-p]) / p
+        out[p] = avg
+    return out
+
+
+def sma(values: np.ndarray, period: int) -> np.ndarray:
+    return sma_many(values, [period])[period]
+
+
+def ema(values: np.ndarray, alpha: float, seed: Optional[float] = None) -> np.ndarray:
+    """
+    Exponential moving average y[i] = alpha * x[i] + (1 - alpha) * y[i-1], starting from
+    `seed` (the first value when omitted).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return values.copy()
+    if seed is None:
+        seed, values = values[0], values[1:]
+        return np.concatenate(([seed], ema(values, alpha, seed)))
+    smoothed, _ = lfilter([alpha], [1.0, alpha - 1.0], values, zi=[(1.0 - alpha) * seed])
+    return smoothed
+
+
+def wilder_rsi(closes: np.ndarray, period: int) -> np.ndarray:
+    """Wilder RSI of `closes`; NaN for the first `period` bars."""
+    closes = np.asarray(closes, dtype=np.float64)
+    rsi = np.full(len(closes), np.nan)
+    if period <= 0 or len(closes) <= period:
+        return rsi
+    deltas = np.diff(closes)
+    gains = np.clip(deltas, 0.0, None)
+    losses = np.clip(-deltas, 0.0, None)
+    # Seeded with the simple averages of the first `period` changes, then smoothed with 1/period
+    avg_gain = np.concatenate(([gains[:period].mean()], ema(gains[period:], 1.0 / period, gains[:period].mean())))
+    avg_loss = np.concatenate(([losses[:period].mean()], ema(losses[period:], 1.0 / period, losses[:period].mean())))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    rsi[period:] = np.where(avg_loss == 0, 100.0, values)
+    return rsi
+
+
+def rolling_std(values: np.ndarray, period: int, ddof: int = 0) -> np.ndarray:
+    """Standard deviation over each trailing window of `period` values; NaN until a window is full."""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if period <= ddof or len(values) < period:
+        return out
+    out[period - 1:] = sliding_window_view(values, period).std(axis=1, ddof=ddof)
+    return out
+
+
+def log_returns(closes: np.ndarray) -> np.ndarray:
+    closes = np.asarray(closes, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rets = np.log(closes[1:] / closes[:-1])
+    return np.where(closes[:-1] > 0, rets, 0.0)
+
+
+def pct_returns(closes: np.ndarray) -> np.ndarray:
+    closes = np.asarray(closes, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rets = (closes[1:] - closes[:-1]) / closes[:-1]
+    return np.where(closes[:-1] != 0, rets, 0.0)
+
+
+# ---------- Signals ----------
+
+def compare(values: np.ndarray, op: str, threshold: float) -> np.ndarray:
+    """Boolean mask of `values` {gt, ge, lt, le} `threshold`; NaN compares False."""
+    with np.errstate(invalid="ignore"):
+        if op == "gt":
+            return values > threshold
+        if op == "ge":
+            return values >= threshold
+        if op == "lt":
+            return values < threshold
+        if op == "le":
+            return values <= threshold
+    raise ValueError(f"Unknown comparison: {op}")
+
+
+def longest_streak(mask: np.ndarray) -> Tuple[int, Optional[int], Optional[int]]:
+    """(length, first index, last index) of the first longest run of True in `mask`."""
+    if not mask.any():
+        return 0, None, None
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    best = int(np.argmax(ends - starts))
+    return int(ends[best] - starts[best]), int(starts[best]), int(ends[best] - 1)
+
+
+def threshold_crossings(values: np.ndarray, level: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Indices (ascending) where defined values cross `level`:
+      - up: from <= level to > level
+      - down: from >= level to < level
+    Undefined (NaN) values are skipped, comparing each value with the previous defined one.
+    """
+    defined = np.flatnonzero(~np.isnan(values))
+    prev, cur = values[defined[:-1]], values[defined[1:]]
+    up = defined[1:][(prev <= level) & (cur > level)]
+    down = defined[1:][(prev >= level) & (cur < level)]
+    return up, down
+
+
+def crossovers(short: np.ndarray, long: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Indices (ascending) where `short` crosses `long`, over the bars where both are defined:
+      - golden: short - long goes from <= 0 to > 0
+      - death: short - long goes from >= 0 to < 0
+    """
+    return threshold_crossings(short - long, 0.0)
+
+
+def first_and_last_close(dates: np.ndarray, closes: np.ndarray, _from: str, _to: str) -> Optional[Tuple[date, float, date, float]]:
+    """(first date, close, last date, close) of the bars within [_from, _to], None if there are none."""
+    rng = window(dates, _from, _to)
+    if rng.stop <= rng.start:
+        return None
+    return dates[rng.start].astype(date), float(closes[rng.start]), dates[rng.stop - 1].astype(date), float(closes[rng.stop - 1])
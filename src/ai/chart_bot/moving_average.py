@@ -1,12 +1,14 @@
 # chart_bot/moving_average.py
 """
-Simple Moving Average (SMA) tool — FMP-first.
+Simple Moving Average (SMA) tool — local-first.
 
-Primary source:
-  • FMP /stable/technical-indicators/sma
+Primary source (daily only):
+  • Compute SMA locally from the cached FMP EOD closes (see chart_bot/indicators.py), all
+    periods in one pass.
 
-Fallback (daily only, still FMP-only):
-  • Compute SMA locally from FMP /stable/historical-price-eod/full closes.
+Fallback:
+  • FMP /stable/technical-indicators/sma (intraday/weekly/monthly timeframes, or when the
+    local series has no values for a period).
 
 Behavior highlights:
   • Returns newest-first time series for each requested period.
@@ -32,15 +34,16 @@ Return shape:
 from __future__ import annotations
 
 import os
-import asyncio
 import calendar
 from typing import List, Dict, Optional, Literal, Any
 from datetime import datetime, date, timedelta
-from statistics import fmean
 from datetime import datetime, timezone
 import httpx
+from src.ai.tools import http_client
+from src.ai.chart_bot import indicators as ind
 from pydantic import BaseModel, Field, field_validator
 from langchain_core.tools import tool
+import numpy as np
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -48,26 +51,17 @@ load_dotenv()
 FM_API_KEY = os.getenv("FM_API_KEY")
 
 FMP_SMA_URL = "https://financialmodelingprep.com/stable/technical-indicators/sma"
-FMP_EOD_URL = "https://financialmodelingprep.com/stable/historical-price-eod/full"
+DEFAULT_WINDOW_DAYS = 365  # window of the local series when neither from nor to is given
 
 DEFAULT_TIMEOUT = httpx.Timeout(connect=5.0, read=20.0, write=5.0, pool=5.0)
-RETRY_STATUS = {429, 500, 502, 503, 504}
 
 
 # ---------- Small HTTP helper ----------
 
-async def _get_with_retries(client: httpx.AsyncClient, url: str, params: Dict[str, Any], tries: int = 3, backoff: float = 0.75) -> httpx.Response:
-    for i in range(tries):
-        try:
-            resp = await client.get(url, params=params)
-            if resp.status_code in RETRY_STATUS:
-                raise httpx.HTTPStatusError("retryable", request=resp.request, response=resp)
-            resp.raise_for_status()
-            return resp
-        except (httpx.HTTPStatusError, httpx.HTTPError):
-            if i == tries - 1:
-                raise
-            await asyncio.sleep(backoff * (2 ** i))
+async def _get_with_retries(url: str, params: Dict[str, Any], tries: int = 3, backoff: float = 0.75) -> httpx.Response:
+    resp = await http_client.aget(url, params=params, timeout=DEFAULT_TIMEOUT, tries=tries, backoff=backoff)
+    resp.raise_for_status()
+    return resp
 
 
 # ---------- Helpers ----------
@@ -136,50 +130,19 @@ def _extract_historical(payload: Any) -> Optional[List[Dict[str, Any]]]:
                 continue
     return out
 
-async def _fallback_sma_from_eod(
-    client: httpx.AsyncClient,
+async def _local_sma_series(
     symbol: str,
-    period: int,
+    periods: List[int],
     _from: Optional[str],
     _to: Optional[str],
-) -> Optional[List[Dict[str, Any]]]:
+) -> Dict[int, List[Dict[str, Any]]]:
     """
-    Fallback (daily only): compute SMA from FMP EOD closes.
-    Returns newest-first SMA series.
+    Daily SMA of every period over [_from, _to], computed from the cached EOD closes.
+    Look-back bars before the window come from the full history. Returns newest-first series.
     """
-    params = {"symbol": symbol, "apikey": FM_API_KEY}
-    if _from:
-        params["from"] = _from
-    if _to:
-        params["to"] = _to
-
-    r = await _get_with_retries(client, FMP_EOD_URL, params)
-    data = r.json() or {}
-    hist = data.get("historical")
-    if not hist or not isinstance(hist, list):
-        return None
-
-    asc = sorted(
-        (
-            {"date": h.get("date"), "close": h.get("close")}
-            for h in hist
-            if h.get("date") and h.get("close") is not None
-        ),
-        key=lambda x: x["date"],
-    )
-    if len(asc) < period:
-        return None
-
-    closes = [float(x["close"]) for x in asc]
-    dates = [x["date"] for x in asc]
-
-    points: List[Dict[str, Any]] = []
-    for i in range(period - 1, len(closes)):
-        wnd = closes[i - period + 1 : i + 1]
-        sma = fmean(wnd)
-        points.append({"date": dates[i], "sma": float(sma)})
-
-    return sorted(points, key=lambda x: x["date"], reverse=True)
+    dates, closes = await ind.load_daily_closes(symbol)
+    rng = ind.window(dates, _from, _to)
+    return {p: ind.to_rows(dates[rng], avg[rng], "sma") for p, avg in ind.sma_many(closes, periods).items()}
 
 def _detect_crossovers(
     short_series: List[Dict[str, Any]],
@@ -194,18 +157,11 @@ def _detect_crossovers(
     l_map = {r["date"]: r.get("sma") for r in long_series if r.get("date") and r.get("sma") is not None}
     common = sorted(set(s_map.keys()) & set(l_map.keys()))  # ASC
 
-    events: List[Dict[str, Any]] = []
-    prev_diff: Optional[float] = None
-    for d in common:
-        s = s_map[d]; l = l_map[d]
-        diff = s - l
-        if prev_diff is not None:
-            if mode == "golden" and prev_diff <= 0 and diff > 0:
-                events.append({"date": d, "type": "golden"})
-            if mode == "death" and prev_diff >= 0 and diff < 0:
-                events.append({"date": d, "type": "death"})
-        prev_diff = diff
-    return events
+    short = np.array([s_map[d] for d in common], dtype=np.float64)
+    long = np.array([l_map[d] for d in common], dtype=np.float64)
+    golden, death = ind.crossovers(short, long)
+    index = golden if mode == "golden" else death
+    return [{"date": common[i], "type": mode} for i in index]
 
 def _clip_events_to_window(events: List[Dict[str, Any]], _from: Optional[str], _to: Optional[str]) -> List[Dict[str, Any]]:
     if not events or (not _from and not _to):
@@ -268,7 +224,8 @@ async def fetch_sma_from_fmp(
     crossover_mode: Optional[Literal["golden","death"]] = None,
 ) -> Dict[str, Any]:
     """
-    Fetch SMA from FMP (endpoint-first). Fallback computes SMA from FMP EOD closes (daily only).
+    Compute SMA from cached FMP EOD closes (daily). Other timeframes, or periods without local
+    values, use FMP's SMA endpoint.
     Returns newest-first series per period, on_date values, optional crossovers, and provenance notes.
     """
     if not FM_API_KEY:
@@ -331,15 +288,25 @@ async def fetch_sma_from_fmp(
         out["notes"].append(swapped_range_note)
 
     try:
-        async with httpx.AsyncClient(timeout=DEFAULT_TIMEOUT) as client:
-            # For each period, call SMA endpoint; if empty and timeframe==1day, compute from EOD.
-            for p in period_lengths:
+        # Daily: every period from one pass over the cached closes
+        local: Dict[int, List[Dict[str, Any]]] = {}
+        if timeframe == "1day":
+            local_from = _from or (None if _to else _fmt_iso(today - timedelta(days=DEFAULT_WINDOW_DAYS)))
+            try:
+                local = await _local_sma_series(symbol, period_lengths, local_from, _to)
+            except Exception as e:
+                out["notes"].append(f"Could not compute SMA from cached EOD closes ({e}); using FMP SMA endpoint.")
+
+        # For each period without local values, call the SMA endpoint
+        for p in period_lengths:
+            historical: Optional[List[Dict[str, Any]]] = local.get(p)
+            if historical:
+                out["notes"].append(f"Computed {p}-day SMA from cached FMP EOD closes.")
+            else:
                 params = dict(common_params)
                 params["periodLength"] = p
-
-                historical: Optional[List[Dict[str, Any]]] = None
                 try:
-                    resp = await _get_with_retries(client, FMP_SMA_URL, params)
+                    resp = await _get_with_retries(FMP_SMA_URL, params)
                     data = resp.json()
                     historical = _extract_historical(data)
                     if historical:
@@ -348,67 +315,61 @@ async def fetch_sma_from_fmp(
                 except Exception:
                     historical = None
 
-                if (not historical or len(historical) == 0) and timeframe == "1day":
-                    fb = await _fallback_sma_from_eod(client, symbol, p, _from, _to)
-                    if fb:
-                        historical = fb
-                        out["notes"].append(f"Computed {p}-day SMA from FMP EOD closes due to sparse SMA endpoint data.")
-
-                if not historical:
-                    if timeframe != "1day":
-                        return {"error": f"No SMA data returned for the requested intraday timeframe from FMP (period {p}). Try widening the range or use 1day."}
-                    return {"error": f"No SMA data returned for period {p} in the requested window. Try widening the range."}
-
-                out["series"][str(p)] = historical  # newest-first
-
-            # on_date resolution
-            if coerced_on_date:
-                target_date = _parse_iso(coerced_on_date)
-                for p_str, ser in out["series"].items():
-                    if timeframe == "1day":
-                        row = _find_on_or_before(target_date, ser, key="sma")
-                        used = row["date"] if row else None
-                        out["on_date"][p_str] = {
-                            "date_requested": on_date,  # show original
-                            "date_used": used,
-                            "sma": row["sma"] if row else None,
-                            "sma_rounded": round(row["sma"], 2) if row and row.get("sma") is not None else None,
-                        }
-                        if used and used[:10] != coerced_on_date:
-                            out["notes"].append(f"Requested {coerced_on_date} was non-trading; used prior trading day {used[:10]}.")
-                    else:
-                        # pick the most recent bar on that calendar day
-                        day_prefix = coerced_on_date
-                        same_day_rows = [
-                            r for r in ser
-                            if isinstance(r.get("date"), str) and r["date"].startswith(day_prefix) and r.get("sma") is not None
-                        ]
-                        row = same_day_rows[0] if same_day_rows else None
-                        used = row["date"] if row else None
-                        if not row:
-                            prior = next(
-                                (r for r in ser if isinstance(r.get("date"), str) and r["date"][:10] < coerced_on_date and r.get("sma") is not None),
-                                None
-                            )
-                            if prior:
-                                row = prior
-                                used = row["date"]
-                                out["notes"].append(f"No intraday bars on {coerced_on_date}; used nearest prior bar {used}.")
-                        out["on_date"][p_str] = {
-                            "date_requested": on_date,  # original input
-                            "date_used": used,
-                            "sma": row["sma"] if row else None,
-                            "sma_rounded": round(row["sma"], 2) if row and row.get("sma") is not None else None,
-                        }
-
-            # crossovers
-            if crossover_mode and len(period_lengths) == 2:
-                short_p, long_p = sorted(period_lengths)
-                short_series = out["series"].get(str(short_p), [])
-                long_series  = out["series"].get(str(long_p), [])
-                events = _detect_crossovers(short_series, long_series, crossover_mode)
-                events = _clip_events_to_window(events, _from, _to)
-                out["crossovers"] = events
+            if not historical:
+                if timeframe != "1day":
+                    return {"error": f"No SMA data returned for the requested intraday timeframe from FMP (period {p}). Try widening the range or use 1day."}
+                return {"error": f"No SMA data returned for period {p} in the requested window. Try widening the range."}
+
+            out["series"][str(p)] = historical  # newest-first
+
+        # on_date resolution
+        if coerced_on_date:
+            target_date = _parse_iso(coerced_on_date)
+            for p_str, ser in out["series"].items():
+                if timeframe == "1day":
+                    row = _find_on_or_before(target_date, ser, key="sma")
+                    used = row["date"] if row else None
+                    out["on_date"][p_str] = {
+                        "date_requested": on_date,  # show original
+                        "date_used": used,
+                        "sma": row["sma"] if row else None,
+                        "sma_rounded": round(row["sma"], 2) if row and row.get("sma") is not None else None,
+                    }
+                    if used and used[:10] != coerced_on_date:
+                        out["notes"].append(f"Requested {coerced_on_date} was non-trading; used prior trading day {used[:10]}.")
+                else:
+                    # pick the most recent bar on that calendar day
+                    day_prefix = coerced_on_date
+                    same_day_rows = [
+                        r for r in ser
+                        if isinstance(r.get("date"), str) and r["date"].startswith(day_prefix) and r.get("sma") is not None
+                    ]
+                    row = same_day_rows[0] if same_day_rows else None
+                    used = row["date"] if row else None
+                    if not row:
+                        prior = next(
+                            (r for r in ser if isinstance(r.get("date"), str) and r["date"][:10] < coerced_on_date and r.get("sma") is not None),
+                            None
+                        )
+                        if prior:
+                            row = prior
+                            used = row["date"]
+                            out["notes"].append(f"No intraday bars on {coerced_on_date}; used nearest prior bar {used}.")
+                    out["on_date"][p_str] = {
+                        "date_requested": on_date,  # original input
+                        "date_used": used,
+                        "sma": row["sma"] if row else None,
+                        "sma_rounded": round(row["sma"], 2) if row and row.get("sma") is not None else None,
+                    }
+
+        # crossovers
+        if crossover_mode and len(period_lengths) == 2:
+            short_p, long_p = sorted(period_lengths)
+            short_series = out["series"].get(str(short_p), [])
+            long_series  = out["series"].get(str(long_p), [])
+            events = _detect_crossovers(short_series, long_series, crossover_mode)
+            events = _clip_events_to_window(events, _from, _to)
+            out["crossovers"] = events
 
         return out
 
@@ -4,10 +4,11 @@ import asyncio
 import datetime as dt
 from typing import Optional, Dict, Any, Tuple, List
 
-import httpx
+from src.ai.tools import http_client
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool
 from dotenv import load_dotenv
+from src.ai.chart_bot import indicators as ind
 
 load_dotenv()
 fm_api_key = os.getenv("FM_API_KEY")
@@ -45,6 +46,29 @@ def _compute_change(start_price: float, end_price: float) -> Dict[str, Any]:
     return {"start_price": start_price, "end_price": end_price, "change": delta, "change_pct": pct}
 
 
+async def _local_range(
+    ticker: str, from_date: str, to_date: str
+) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Change between the first and last close of the range in the cached FMP EOD series."""
+    try:
+        dates, closes = await ind.load_daily_closes(ticker)
+    except Exception as e:
+        return None, f"Cached EOD series unavailable: {e}"
+
+    bars = ind.first_and_last_close(dates, closes, from_date, to_date)
+    if bars is None:
+        return None, "Cached EOD series has no bars in the range"
+    start_day, sp, end_day, ep = bars
+
+    return {
+        "source": "fmp",
+        "symbol": ticker,
+        "from": start_day.isoformat(),
+        "to": end_day.isoformat(),
+        **_compute_change(sp, ep),
+    }, None
+
+
 async def _fetch_fmp_range(
     ticker: str, from_date: str, to_date: str
 ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
@@ -57,15 +81,14 @@ async def _fetch_fmp_range(
     url = f"{base}/historical-price-eod/full?symbol={ticker}"
     params = {"apikey": fm_api_key, "from": from_date, "to": to_date}
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            r = await client.get(url, params=params)
-            r.raise_for_status()
-            data = r.json()
-        except Exception as e:
-            return None, f"FMP request failed: {e}"
+    try:
+        r = await http_client.aget(url, params=params, timeout=30.0)
+        r.raise_for_status()
+        data = r.json()
+    except Exception as e:
+        return None, f"FMP request failed: {e}"
 
-    hist = data.get("historical") or []
+    hist = data.get("historical") if isinstance(data, dict) else data
     if not isinstance(hist, list) or not hist:
         return None, "FMP returned no historical data for the range"
 
@@ -144,7 +167,7 @@ async def _fetch_yf_range(
 async def calculate_price_change(ticker: str, from_date: str, to_date: str) -> Dict[str, Any]:
     """
     Calculate absolute and percentage price change for a stock over a date range.
-    Uses FMP if FM_API_KEY is set; otherwise falls back to Yahoo Finance (yfinance).
+    Uses the cached FMP EOD series (then the FMP API) if FM_API_KEY is set; otherwise falls back to Yahoo Finance (yfinance).
     Returns a dict with fields: source, symbol, from, to, start_price, end_price, change, change_pct.
     """
     # Basic date validation
@@ -157,6 +180,9 @@ async def calculate_price_change(ticker: str, from_date: str, to_date: str) -> D
         return {"error": "Dates must be in YYYY-MM-DD format"}
 
     if fm_api_key:
+        data, err = await _local_range(ticker, from_date, to_date)
+        if data:
+            return data
         data, err = await _fetch_fmp_range(ticker, from_date, to_date)
         if data:
             return data
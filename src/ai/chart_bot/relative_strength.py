@@ -1,12 +1,13 @@
 # chart_bot/relative_strength.py
 """
-RSI tool — FMP-first.
+RSI tool — local-first.
 
-Primary source:
-  • FMP /stable/technical-indicators/rsi
+Primary source (daily only):
+  • Compute Wilder RSI locally from the cached FMP EOD closes (see chart_bot/indicators.py).
 
-Fallback (daily only, still FMP-only):
-  • Compute Wilder RSI locally from FMP /stable/historical-price-eod/full closes.
+Fallback:
+  • FMP /stable/technical-indicators/rsi (intraday/weekly/monthly timeframes, or when the
+    local series has no values in the window).
 
 Behavior highlights:
   • Returns newest-first time series.
@@ -14,7 +15,7 @@ Behavior highlights:
   • on_date: daily → nearest prior trading day; intraday → last available bar that day, else nearest prior bar.
   • Invalid calendar dates (e.g., 2025-02-29) are coerced to the last valid day of that month and noted.
   • Signals: counts above/below thresholds, threshold crossings (ASC), longest streaks, extremes.
-  • Provenance notes show whether RSI came from the RSI endpoint or was computed from EOD closes.
+  • Provenance notes show whether RSI was computed from EOD closes or came from the RSI endpoint.
 
 Return shape:
 {
@@ -37,13 +38,13 @@ Return shape:
 from __future__ import annotations
 
 import os
-import asyncio
 import calendar
 from typing import List, Dict, Optional, Literal, Any, Tuple
 from datetime import datetime, date, timedelta
-from statistics import fmean
 from datetime import datetime, timezone
 import httpx
+from src.ai.tools import http_client
+from src.ai.chart_bot import indicators as ind
 from pydantic import BaseModel, Field, field_validator
 from langchain_core.tools import tool
 from dotenv import load_dotenv
@@ -52,26 +53,16 @@ load_dotenv()
 # ---------- Env & constants ----------
 FM_API_KEY = os.getenv("FM_API_KEY")
 FMP_RSI_URL = "https://financialmodelingprep.com/stable/technical-indicators/rsi"
-FMP_EOD_URL = "https://financialmodelingprep.com/stable/historical-price-eod/full"
 
 DEFAULT_TIMEOUT = httpx.Timeout(connect=5.0, read=20.0, write=5.0, pool=5.0)
-RETRY_STATUS = {429, 500, 502, 503, 504}
 
 
 # ---------- Small HTTP helper ----------
 
-async def _get_with_retries(client: httpx.AsyncClient, url: str, params: Dict[str, Any], tries: int = 3, backoff: float = 0.75) -> httpx.Response:
-    for i in range(tries):
-        try:
-            resp = await client.get(url, params=params)
-            if resp.status_code in RETRY_STATUS:
-                raise httpx.HTTPStatusError("retryable", request=resp.request, response=resp)
-            resp.raise_for_status()
-            return resp
-        except (httpx.HTTPStatusError, httpx.HTTPError):
-            if i == tries - 1:
-                raise
-            await asyncio.sleep(backoff * (2 ** i))
+async def _get_with_retries(url: str, params: Dict[str, Any], tries: int = 3, backoff: float = 0.75) -> httpx.Response:
+    resp = await http_client.aget(url, params=params, timeout=DEFAULT_TIMEOUT, tries=tries, backoff=backoff)
+    resp.raise_for_status()
+    return resp
 
 
 # ---------- Helpers ----------
@@ -141,36 +132,14 @@ def _find_on_or_before(target: date, series_newest_first: List[Dict[str, Any]],
     return None
 
 def _count_days(series: List[Dict[str, Any]], op: Literal["gt","lt","ge","le"], threshold: float) -> int:
-    cnt = 0
-    for row in series:
-        v = row.get("rsi")
-        if v is None:
-            continue
-        if (op == "gt" and v > threshold) or (op == "lt" and v < threshold) or (op == "ge" and v >= threshold) or (op == "le" and v <= threshold):
-            cnt += 1
-    return cnt
+    return int(ind.compare(ind.values_of(series, "rsi"), op, threshold).sum())
 
 def _streak(series_asc: List[Dict[str, Any]], op: Literal["gt","lt","ge","le"], threshold: float) -> Tuple[int, Optional[str], Optional[str]]:
     """Longest streak in ASC order meeting a condition. Returns (length, start_date, end_date)."""
-    best = 0
-    cur = 0
-    best_range = (None, None)
-    start = None
-    for row in series_asc:
-        v = row.get("rsi")
-        d = row.get("date")
-        ok = (op == "gt" and v > threshold) or (op == "lt" and v < threshold) or (op == "ge" and v >= threshold) or (op == "le" and v <= threshold)
-        if ok:
-            cur += 1
-            if start is None:
-                start = d
-            if cur > best:
-                best = cur
-                best_range = (start, d)
-        else:
-            cur = 0
-            start = None
-    return best, best_range[0], best_range[1]
+    length, start, end = ind.longest_streak(ind.compare(ind.values_of(series_asc, "rsi"), op, threshold))
+    if not length:
+        return 0, None, None
+    return length, series_asc[start].get("date"), series_asc[end].get("date")
 
 def _threshold_crossings(series_asc: List[Dict[str, Any]], level: float) -> Dict[str, List[str]]:
     """
@@ -179,84 +148,22 @@ def _threshold_crossings(series_asc: List[Dict[str, Any]], level: float) -> Dict
       - 'crossed_down': moved from >= level to < level
     Returns dict of date lists in ASC order.
     """
-    up, down = [], []
-    prev = None
-    for row in series_asc:
-        v = row.get("rsi")
-        if v is None:
-            continue
-        if prev is not None:
-            if prev <= level and v > level:
-                up.append(row["date"])
-            if prev >= level and v < level:
-                down.append(row["date"])
-        prev = v
-    return {"crossed_up": up, "crossed_down": down}
-
-async def _fallback_rsi_from_eod(
-    client: httpx.AsyncClient,
+    up, down = ind.threshold_crossings(ind.values_of(series_asc, "rsi"), level)
+    return {"crossed_up": [series_asc[i]["date"] for i in up], "crossed_down": [series_asc[i]["date"] for i in down]}
+
+async def _local_rsi_series(
     symbol: str,
     period: int,
     _from: Optional[str],
     _to: Optional[str],
 ) -> Optional[List[Dict[str, Any]]]:
     """
-    Fallback (daily only): compute Wilder RSI from FMP EOD closes.
-    Returns newest-first RSI series.
+    Daily Wilder RSI over [_from, _to], computed from the cached EOD closes.
+    Smoothing starts at the beginning of the history, not of the window. Returns newest-first RSI series.
     """
-    params = {"symbol": symbol, "apikey": FM_API_KEY}
-    if _from:
-        params["from"] = _from
-    if _to:
-        params["to"] = _to
-
-    r = await _get_with_retries(client, FMP_EOD_URL, params)
-    data = r.json() or {}
-    hist = data.get("historical")
-    if not hist or not isinstance(hist, list):
-        return None
-
-    asc = sorted(
-        (
-            {"date": h.get("date"), "close": h.get("close")}
-            for h in hist
-            if h.get("date") and h.get("close") is not None
-        ),
-        key=lambda x: x["date"],
-    )
-    if len(asc) <= period:
-        return None
-
-    closes = [float(x["close"]) for x in asc]
-    dates  = [x["date"] for x in asc]
-
-    # Wilder's RSI
-    deltas = [closes[i] - closes[i-1] for i in range(1, len(closes))]
-    gains  = [max(d, 0.0) for d in deltas]
-    losses = [max(-d, 0.0) for d in deltas]
-
-    # initial averages
-    avg_gain = fmean(gains[:period])
-    avg_loss = fmean(losses[:period])
-
-    def _compute_rsi(ag: float, al: float) -> float:
-        if al == 0:
-            return 100.0
-        rs = ag / al
-        return 100.0 - (100.0 / (1.0 + rs))
-
-    rsi_points: List[Dict[str, Any]] = []
-    rsi_points.append({"date": dates[period], "rsi": float(_compute_rsi(avg_gain, avg_loss))})
-
-    # Wilder smoothing
-    for i in range(period + 1, len(closes)):
-        gain = gains[i - 1]
-        loss = losses[i - 1]
-        avg_gain = (avg_gain * (period - 1) + gain) / period
-        avg_loss = (avg_loss * (period - 1) + loss) / period
-        rsi_points.append({"date": dates[i], "rsi": float(_compute_rsi(avg_gain, avg_loss))})
-
-    return sorted(rsi_points, key=lambda x: x["date"], reverse=True)
+    dates, closes = await ind.load_daily_closes(symbol)
+    rng = ind.window(dates, _from, _to)
+    return ind.to_rows(dates[rng], ind.wilder_rsi(closes, period)[rng], "rsi") or None
 
 
 # ---------- Input schema ----------
@@ -294,7 +201,8 @@ async def fetch_rsi_from_fmp(
     thresholds: Optional[List[float]] = None,
 ) -> Dict[str, Any]:
     """
-    Fetch RSI from FMP (endpoint-first). Fallback computes Wilder RSI from FMP EOD closes (daily only).
+    Compute Wilder RSI from cached FMP EOD closes (daily). Other timeframes, or windows without
+    local values, use FMP's RSI endpoint.
     Returns newest-first series plus analytics (counts, crossings, streaks, extremes) and provenance notes.
     """
     if not FM_API_KEY:
@@ -354,11 +262,23 @@ async def fetch_rsi_from_fmp(
         out["notes"].append(swapped_range_note)
 
     try:
-        async with httpx.AsyncClient(timeout=DEFAULT_TIMEOUT) as client:
-            # 1) primary: RSI endpoint
-            series = None
+        # 1) primary: compute from cached EOD closes (daily only)
+        series = None
+        if timeframe == "1day":
+            try:
+                series = await _local_rsi_series(symbol, period_length, _from, _to)
+                if series:
+                    out["notes"].append(
+                        f"Computed RSI from cached FMP EOD closes for {symbol} {_from}→{_to} (period={period_length})."
+                    )
+            except Exception as e:
+                out["notes"].append(f"Could not compute RSI from cached EOD closes ({e}); using FMP RSI endpoint.")
+                series = None
+
+        # 2) fallback: RSI endpoint
+        if not series:
             try:
-                resp = await _get_with_retries(client, FMP_RSI_URL, params_base)
+                resp = await _get_with_retries(FMP_RSI_URL, params_base)
                 data = resp.json()
                 series = _extract_rsi_series(data)
                 if series:
@@ -367,77 +287,68 @@ async def fetch_rsi_from_fmp(
             except Exception:
                 series = None
 
-            # 2) fallback: compute from EOD (daily only)
-            if (not series or len(series) == 0) and timeframe == "1day":
-                fb = await _fallback_rsi_from_eod(client, symbol, period_length, _from, _to)
-                if fb:
-                    series = fb
-                    out["notes"].append(
-                        f"Computed RSI from FMP EOD closes for {symbol} {_from}→{_to} (period={period_length})."
+        if not series:
+            if timeframe != "1day":
+                return {"error": "No RSI data returned for the requested intraday timeframe from FMP. Try widening the range or use 1day."}
+            return {"error": "No RSI data returned in the requested window. Try widening the range."}
+
+        out["series"] = series  # newest-first
+
+        # --- on_date resolution ---
+        if coerced_on_date:
+            used = None
+            row = None
+            if timeframe == "1day":
+                row = _find_on_or_before(_parse_iso(coerced_on_date), series, key="rsi")
+                used = row["date"] if row else None
+                if used and used[:10] != coerced_on_date:
+                    out["notes"].append(f"Requested {coerced_on_date} was non-trading; used prior trading day {used[:10]}.")
+            else:
+                # pick the most recent bar on that calendar day (i.e., the day's last bar)
+                day_prefix = coerced_on_date
+                same_day_rows = [
+                    r for r in series
+                    if isinstance(r.get("date"), str) and r["date"].startswith(day_prefix) and r.get("rsi") is not None
+                ]
+                row = same_day_rows[0] if same_day_rows else None
+                used = row["date"] if row else None
+                if not row:
+                    # nearest prior bar in the series
+                    prior = next(
+                        (r for r in series if isinstance(r.get("date"), str) and r["date"][:10] < coerced_on_date and r.get("rsi") is not None),
+                        None
                     )
-
-            if not series:
-                if timeframe != "1day":
-                    return {"error": "No RSI data returned for the requested intraday timeframe from FMP. Try widening the range or use 1day."}
-                return {"error": "No RSI data returned in the requested window. Try widening the range."}
-
-            out["series"] = series  # newest-first
-
-            # --- on_date resolution ---
-            if coerced_on_date:
-                used = None
-                row = None
-                if timeframe == "1day":
-                    row = _find_on_or_before(_parse_iso(coerced_on_date), series, key="rsi")
-                    used = row["date"] if row else None
-                    if used and used[:10] != coerced_on_date:
-                        out["notes"].append(f"Requested {coerced_on_date} was non-trading; used prior trading day {used[:10]}.")
-                else:
-                    # pick the most recent bar on that calendar day (i.e., the day's last bar)
-                    day_prefix = coerced_on_date
-                    same_day_rows = [
-                        r for r in series
-                        if isinstance(r.get("date"), str) and r["date"].startswith(day_prefix) and r.get("rsi") is not None
-                    ]
-                    row = same_day_rows[0] if same_day_rows else None
-                    used = row["date"] if row else None
-                    if not row:
-                        # nearest prior bar in the series
-                        prior = next(
-                            (r for r in series if isinstance(r.get("date"), str) and r["date"][:10] < coerced_on_date and r.get("rsi") is not None),
-                            None
-                        )
-                        if prior:
-                            row = prior
-                            used = row["date"]
-                            out["notes"].append(f"No intraday bars on {coerced_on_date}; used nearest prior bar {used}.")
-
-                out["on_date"] = {
-                    "date_requested": on_date,   # original input
-                    "date_used": used,
-                    "rsi": row["rsi"] if row else None,
-                }
-
-            # --- analytics over the window ---
-            desc = series
-            asc = sorted(series, key=lambda x: x["date"])
-
-            for t in thresholds:
-                out["signals"]["counts"][f"> {t}"] = _count_days(desc, "gt", t)
-                out["signals"]["counts"][f"< {t}"] = _count_days(desc, "lt", t)
-                out["signals"]["crossings"][f"{t}"] = _threshold_crossings(asc, t)
-                L, s, e = _streak(asc, "gt", t)
-                out["signals"]["streaks"][f"gt_{t}"] = {"length": L, "start": s, "end": e}
-                L, s, e = _streak(asc, "lt", t)
-                out["signals"]["streaks"][f"lt_{t}"] = {"length": L, "start": s, "end": e}
-
-            # extremes (guard for numeric)
-            numeric = [r for r in desc if isinstance(r.get("rsi"), (int, float))]
-            if not numeric:
-                return {"error": "RSI series contained no numeric values."}
-            max_row = max(numeric, key=lambda x: x["rsi"])
-            min_row = min(numeric, key=lambda x: x["rsi"])
-            out["extremes"] = {"max": max_row, "min": min_row}
+                    if prior:
+                        row = prior
+                        used = row["date"]
+                        out["notes"].append(f"No intraday bars on {coerced_on_date}; used nearest prior bar {used}.")
+
+            out["on_date"] = {
+                "date_requested": on_date,   # original input
+                "date_used": used,
+                "rsi": row["rsi"] if row else None,
+            }
+
+        # --- analytics over the window ---
+        desc = series
+        asc = sorted(series, key=lambda x: x["date"])
+
+        for t in thresholds:
+            out["signals"]["counts"][f"> {t}"] = _count_days(desc, "gt", t)
+            out["signals"]["counts"][f"< {t}"] = _count_days(desc, "lt", t)
+            out["signals"]["crossings"][f"{t}"] = _threshold_crossings(asc, t)
+            L, s, e = _streak(asc, "gt", t)
+            out["signals"]["streaks"][f"gt_{t}"] = {"length": L, "start": s, "end": e}
+            L, s, e = _streak(asc, "lt", t)
+            out["signals"]["streaks"][f"lt_{t}"] = {"length": L, "start": s, "end": e}
+
+        # extremes (guard for numeric)
+        numeric = [r for r in desc if isinstance(r.get("rsi"), (int, float))]
+        if not numeric:
+            return {"error": "RSI series contained no numeric values."}
+        max_row = max(numeric, key=lambda x: x["rsi"])
+        min_row = min(numeric, key=lambda x: x["rsi"])
+        out["extremes"] = {"max": max_row, "min": min_row}
 
         return out
 
@@ -1,11 +1,13 @@
 """
-Volatility tool (FMP-first).
-Computes and returns historical volatility (σ) using Financial Modeling Prep's
-standard deviation endpoint, with a returns-based fallback (from FMP EOD closes)
-ONLY if the endpoint yields no usable rows (daily timeframe).
+Volatility tool (local-first).
+Computes and returns historical volatility (σ) for the daily timeframe from the cached FMP
+EOD closes (rolling σ of closes, as Financial Modeling Prep's standard deviation endpoint
+computes it), all periods in one pass. Other timeframes, or periods without local values,
+use the endpoint, with a returns-based fallback (from FMP EOD closes) ONLY if the endpoint
+yields no usable rows (daily timeframe).
 
 Outputs both:
-  • $ standard deviation (endpoint value)
+  • $ standard deviation
   • Daily % σ = (standardDeviation / close) × 100
 Optionally: Annualized % σ = Daily % × √trading_days (default 252)
 
@@ -15,11 +17,13 @@ from __future__ import annotations
 
 import os
 import math
+import numpy as np
 from typing import List, Dict, Optional, Literal, Any, Tuple
 from datetime import datetime, date, timedelta
-from statistics import stdev
 from datetime import datetime, timezone
 import httpx
+from src.ai.tools import http_client
+from src.ai.chart_bot import indicators as ind
 from pydantic import BaseModel, Field, field_validator
 from dotenv import load_dotenv
 from langchain_core.tools import tool
@@ -45,6 +49,13 @@ def _fmt_iso(d: date) -> str:
     return d.strftime("%Y-%m-%d")
 
 
+def _eod_rows(payload: Any) -> List[Dict[str, Any]]:
+    """EOD rows of an FMP payload: a list (stable API) or {"historical": [...]}."""
+    if isinstance(payload, dict):
+        payload = payload.get("historical")
+    return payload if isinstance(payload, list) else []
+
+
 def _extract_std_series(payload: Any) -> Optional[List[Dict[str, Any]]]:
     """
     Normalize FMP stddev payload to a list[{date, vol_raw, close}]:
@@ -80,7 +91,6 @@ def _extract_std_series(payload: Any) -> Optional[List[Dict[str, Any]]]:
 
 
 async def _fetch_close_map(
-    client: httpx.AsyncClient,
     symbol: str,
     _from: Optional[str],
     _to: Optional[str],
@@ -93,10 +103,9 @@ async def _fetch_close_map(
         params["to"] = _to
 
     try:
-        r = await client.get(FMP_EOD_URL, params=params)
+        r = await http_client.aget(FMP_EOD_URL, params=params, timeout=DEFAULT_TIMEOUT)
         r.raise_for_status()
-        data = r.json() or {}
-        hist = data.get("historical") or []
+        hist = _eod_rows(r.json())
         out: Dict[str, float] = {}
         for row in hist:
             d = row.get("date")
@@ -124,8 +133,35 @@ def _nearest_prior_close(date_str: str, close_map: Dict[str, float]) -> Optional
     return None
 
 
+async def _local_std_series(
+    symbol: str,
+    periods: List[int],
+    _from: Optional[str],
+    _to: Optional[str],
+) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Daily rolling σ of closes of every period over [_from, _to], computed from the cached EOD
+    closes. Returns newest-first lists of {date, close, vol_raw ($), vol (daily %)}.
+    """
+    dates, closes = await ind.load_daily_closes(symbol)
+    rng = ind.window(dates, _from, _to)
+    out: Dict[int, List[Dict[str, Any]]] = {}
+    for p in periods:
+        sigma = ind.rolling_std(closes, p)[rng]
+        keep = ~np.isnan(sigma)
+        w_dates = np.datetime_as_string(dates[rng][keep][::-1], unit="D").tolist()
+        w_close = closes[rng][keep][::-1]
+        w_sigma = sigma[keep][::-1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            w_pct = np.where(w_close != 0, w_sigma / w_close * 100.0, np.nan)
+        out[p] = [
+            {"date": d, "close": c, "vol_raw": v, "vol": None if math.isnan(pct) else pct}
+            for d, c, v, pct in zip(w_dates, w_close.tolist(), w_sigma.tolist(), w_pct.tolist())
+        ]
+    return out
+
+
 async def _fallback_std_from_eod(
-    client: httpx.AsyncClient,
     symbol: str,
     period: int,
     _from: Optional[str],
@@ -142,10 +178,9 @@ async def _fallback_std_from_eod(
     if _to:
         params["to"] = _to
 
-    r = await client.get(FMP_EOD_URL, params=params)
+    r = await http_client.aget(FMP_EOD_URL, params=params, timeout=DEFAULT_TIMEOUT)
     r.raise_for_status()
-    data = r.json() or {}
-    hist = data.get("historical")
+    hist = _eod_rows(r.json())
     if not hist:
         return None
 
@@ -160,90 +195,44 @@ async def _fallback_std_from_eod(
     if len(asc) <= period:
         return None
 
-    closes = [float(x["close"]) for x in asc]
+    closes = np.array([float(x["close"]) for x in asc])
     dates = [x["date"] for x in asc]
 
-    rets: List[float] = []
-    for i in range(1, len(closes)):
-        if returns_type == "log":
-            rets.append(0.0 if closes[i - 1] <= 0 else math.log(closes[i] / closes[i - 1]))
-        else:
-            rets.append((closes[i] - closes[i - 1]) / closes[i - 1] if closes[i - 1] != 0 else 0.0)
-
-    if len(rets) < period:
+    rets = ind.log_returns(closes) if returns_type == "log" else ind.pct_returns(closes)
+    if len(rets) < period or period < 2:
         return None
 
+    sigma = ind.rolling_std(rets, period, ddof=1)  # fraction (e.g., 0.023)
     out: List[Dict[str, Any]] = []
-    for i in range(period - 1, len(rets)):
-        wnd = rets[i - period + 1 : i + 1]
-        try:
-            sigma = stdev(wnd)  # fraction (e.g., 0.023)
-        except Exception:
-            continue
-        d_i = dates[i + 1]
-        c_i = closes[i + 1]
+    for i in range(len(rets) - 1, period - 2, -1):
+        c_i = float(closes[i + 1])
         out.append(
             {
-                "date": d_i,
+                "date": dates[i + 1],
                 "close": c_i,
-                "vol": float(sigma * 100.0),  # daily %
-                "vol_raw": float(sigma * c_i),  # $ approx
+                "vol": float(sigma[i] * 100.0),  # daily %
+                "vol_raw": float(sigma[i] * c_i),  # $ approx
             }
         )
-
-    return sorted(out, key=lambda x: x["date"], reverse=True)
+    return out
 
 
 def _count_days(series: List[Dict[str, Any]], cmp: str, thr: float) -> int:
-    cnt = 0
-    for row in series:
-        v = row.get("vol")
-        if v is None:
-            continue
-        if (cmp == "gt" and v > thr) or (cmp == "ge" and v >= thr) or (cmp == "lt" and v < thr) or (cmp == "le" and v <= thr):
-            cnt += 1
-    return cnt
+    return int(ind.compare(ind.values_of(series, "vol"), cmp, thr).sum())
 
 
 def _streak(series_asc: List[Dict[str, Any]], cmp: str, thr: float) -> Tuple[int, Optional[str], Optional[str]]:
     """Longest streak in ASC order meeting a condition on percent vol."""
-    best = 0
-    cur = 0
-    start: Optional[str] = None
-    best_range = (None, None)
-    for row in series_asc:
-        v = row.get("vol")
-        d = row.get("date")
-        ok = (cmp == "gt" and v > thr) or (cmp == "ge" and v >= thr) or (cmp == "lt" and v < thr) or (cmp == "le" and v <= thr)
-        if ok:
-            cur += 1
-            if start is None:
-                start = d
-            if cur > best:
-                best = cur
-                best_range = (start, d)
-        else:
-            cur = 0
-            start = None
-    return best, best_range[0], best_range[1]
+    length, start, end = ind.longest_streak(ind.compare(ind.values_of(series_asc, "vol"), cmp, thr))
+    if not length:
+        return 0, None, None
+    return length, series_asc[start].get("date"), series_asc[end].get("date")
 
 
 def _threshold_crossings(series_asc: List[Dict[str, Any]], level: float) -> Dict[str, List[str]]:
     """Detect crossings vs a percent threshold level."""
-    up: List[str] = []
-    down: List[str] = []
-    prev: Optional[float] = None
-    for row in series_asc:
-        v = row.get("vol")
-        if v is None:
-            continue
-        if prev is not None:
-            if prev <= level and v > level:
-                up.append(row["date"])
-            if prev >= level and v < level:
-                down.append(row["date"])
-        prev = v
-    return {"crossed_up": up, "crossed_down": down}
+    up, down = ind.threshold_crossings(ind.values_of(series_asc, "vol"), level)
+    return {"crossed_up": [series_asc[i]["date"] for i in up], "crossed_down": [series_asc[i]["date"] for i in down]}
 
 
 def _annualize_pct(vol_pct_daily: Optional[float], timeframe: str, trading_days: int) -> Optional[float]:
@@ -296,7 +285,8 @@ async def fetch_volatility_from_fmp(
     returns_type: str = "log",
 ) -> Dict[str, Any]:
     """
-    Fetch rolling volatility (σ) from FMP's standardDeviation endpoint.
+    Compute rolling volatility (σ) from cached FMP EOD closes (daily); other timeframes use
+    FMP's standardDeviation endpoint.
 
     Returns:
       {
@@ -351,13 +341,27 @@ async def fetch_volatility_from_fmp(
     }
 
     try:
-        async with httpx.AsyncClient(timeout=DEFAULT_TIMEOUT) as client:
-            for p in period_lengths:
+        # ---- Primary (daily): every period from one pass over the cached closes ----
+        local: Dict[int, List[Dict[str, Any]]] = {}
+        if timeframe == "1day":
+            try:
+                local = await _local_std_series(symbol, period_lengths, _from, _to)
+            except Exception as e:
+                out["notes"].append(f"Could not compute volatility from cached EOD closes ({e}); using FMP standardDeviation endpoint.")
+
+        for p in period_lengths:
+            ser: List[Dict[str, Any]] = local.get(p) or []
+            if ser:
+                if annualize:
+                    for r in ser:
+                        r["vol_annualized"] = _annualize_pct(r.get("vol"), timeframe, trading_days)
+                out["notes"].append(f"Computed {p}-period volatility (σ of closes) from cached FMP EOD closes.")
+            else:
                 params = dict(common)
                 params["periodLength"] = p
 
-                # ---- Primary: FMP stddev endpoint ----
-                resp = await client.get(FMP_STD_URL, params=params)
+                # ---- Fallback: FMP stddev endpoint ----
+                resp = await http_client.aget(FMP_STD_URL, params=params, timeout=DEFAULT_TIMEOUT)
                 raw_series: Optional[List[Dict[str, Any]]] = None
                 try:
                     resp.raise_for_status()
@@ -365,8 +369,6 @@ async def fetch_volatility_from_fmp(
                 except Exception:
                     raw_series = None
 
-                ser: List[Dict[str, Any]] = []
-
                 if raw_series:
                     need_close = any(r.get("close") in (None, 0) for r in raw_series)
                     close_map: Dict[str, float] = {}
@@ -374,7 +376,7 @@ async def fetch_volatility_from_fmp(
                         # widen by ±3 days to fill gaps
                         map_from = _fmt_iso(_parse_iso(_from) - timedelta(days=3)) if _from else None
                         map_to = _fmt_iso(_parse_iso(_to) + timedelta(days=3)) if _to else None
-                        close_map = await _fetch_close_map(client, symbol, map_from, map_to)
+                        close_map = await _fetch_close_map(symbol, map_from, map_to)
 
                     for r in raw_series:
                         dt = r["date"]
@@ -395,110 +397,110 @@ async def fetch_volatility_from_fmp(
                     if ser:
                         out["notes"].append(f"Used FMP standardDeviation endpoint for {p}-period volatility.")
 
-                # ---- Fallback: returns-based (daily only) ----
-                if not ser and timeframe == "1day":
-                    fb = await _fallback_std_from_eod(client, symbol, p, _from, _to, returns_type=returns_type)
-                    if fb:
-                        if annualize:
-                            for r in fb:
-                                r["vol_annualized"] = _annualize_pct(r.get("vol"), timeframe, trading_days)
-                        ser = fb
-                        out["notes"].append(
-                            f"No usable stddev rows from endpoint; computed {p}-period volatility from FMP EOD closes (returns-based)."
-                        )
-
-                if not ser:
-                    return {
-                        "error": f"No volatility data returned for period {p}. Try daily timeframe or widen the date range."
-                    }
-
-                ser = sorted(ser, key=lambda x: x["date"], reverse=True)
-                out["series"][str(p)] = ser
-
-            # ---- on_date selection ----
-            if on_date:
-                for p_str, ser in out["series"].items():
-                    used: Optional[str] = None
-                    sel: Optional[Dict[str, Any]] = None
-                    if timeframe == "1day":
-                        # Prefer rows that have % σ; if absent, allow rows with only $ σ.
-                        target = _parse_iso(on_date)
-                        sel = next(
-                            (row for row in ser if _parse_iso(row["date"]) <= target and row.get("vol") is not None),
-                            None,
-                        ) or next(
-                            (row for row in ser if _parse_iso(row["date"]) <= target and row.get("vol_raw") is not None),
+            # ---- Fallback: returns-based (daily only) ----
+            if not ser and timeframe == "1day":
+                fb = await _fallback_std_from_eod(symbol, p, _from, _to, returns_type=returns_type)
+                if fb:
+                    if annualize:
+                        for r in fb:
+                            r["vol_annualized"] = _annualize_pct(r.get("vol"), timeframe, trading_days)
+                    ser = fb
+                    out["notes"].append(
+                        f"No usable stddev rows from endpoint; computed {p}-period volatility from FMP EOD closes (returns-based)."
+                    )
+
+            if not ser:
+                return {
+                    "error": f"No volatility data returned for period {p}. Try daily timeframe or widen the date range."
+                }
+
+            ser = sorted(ser, key=lambda x: x["date"], reverse=True)
+            out["series"][str(p)] = ser
+
+        # ---- on_date selection ----
+        if on_date:
+            for p_str, ser in out["series"].items():
+                used: Optional[str] = None
+                sel: Optional[Dict[str, Any]] = None
+                if timeframe == "1day":
+                    # Prefer rows that have % σ; if absent, allow rows with only $ σ.
+                    target = _parse_iso(on_date)
+                    sel = next(
+                        (row for row in ser if _parse_iso(row["date"]) <= target and row.get("vol") is not None),
+                        None,
+                    ) or next(
+                        (row for row in ser if _parse_iso(row["date"]) <= target and row.get("vol_raw") is not None),
+                        None,
+                    )
+                    if sel:
+                        used = sel["date"]
+                        if used[:10] != on_date:
+                            out["notes"].append(
+                                f"Requested {on_date} was non-trading or missing; used prior trading day {used[:10]}."
+                            )
+                        if sel.get("close") is None:
+                            out["notes"].append("Backfilled close from FMP EOD to compute percent volatility.")
+                else:
+                    # Intraday: newest bar on that calendar day; else nearest prior bar
+                    same_day = [
+                        r for r in ser if isinstance(r.get("date"), str) and r["date"].startswith(on_date) and
+                        (r.get("vol") is not None or r.get("vol_raw") is not None)
+                    ]
+                    sel = same_day[0] if same_day else None
+                    used = sel["date"] if sel else None
+                    if not sel:
+                        prior = next(
+                            (
+                                r
+                                for r in ser
+                                if r.get("date") and r["date"][:10] < on_date and
+                                (r.get("vol") is not None or r.get("vol_raw") is not None)
+                            ),
                             None,
                         )
-                        if sel:
+                        if prior:
+                            sel = prior
                             used = sel["date"]
-                            if used[:10] != on_date:
-                                out["notes"].append(
-                                    f"Requested {on_date} was non-trading or missing; used prior trading day {used[:10]}."
-                                )
-                            if sel.get("close") is None:
-                                out["notes"].append("Backfilled close from FMP EOD to compute percent volatility.")
-                    else:
-                        # Intraday: newest bar on that calendar day; else nearest prior bar
-                        same_day = [
-                            r for r in ser if isinstance(r.get("date"), str) and r["date"].startswith(on_date) and
-                            (r.get("vol") is not None or r.get("vol_raw") is not None)
-                        ]
-                        sel = same_day[0] if same_day else None
-                        used = sel["date"] if sel else None
-                        if not sel:
-                            prior = next(
-                                (
-                                    r
-                                    for r in ser
-                                    if r.get("date") and r["date"][:10] < on_date and
-                                    (r.get("vol") is not None or r.get("vol_raw") is not None)
-                                ),
-                                None,
-                            )
-                            if prior:
-                                sel = prior
-                                used = sel["date"]
-                                out["notes"].append(f"No intraday bars on {on_date}; used nearest prior bar {used}.")
-
-                    on_obj = {
-                        "date_requested": on_date,
-                        "date_used": used,
-                        "close": sel.get("close") if sel else None,
-                        "vol_raw": sel.get("vol_raw") if sel else None,  # $ σ
-                        "vol": sel.get("vol") if sel else None,          # daily %
-                    }
-                    if on_obj["vol"] is None and on_obj["vol_raw"] is not None and on_obj["close"]:
-                        on_obj["vol"] = float(on_obj["vol_raw"] / on_obj["close"] * 100.0)
-                    if annualize and timeframe == "1day" and on_obj.get("vol") is not None:
-                        on_obj["vol_annualized"] = _annualize_pct(on_obj["vol"], timeframe, trading_days)
-
-                    out["on_date"][p_str] = on_obj
-
-            # ---- analytics: thresholds & extremes (percent scale) ----
-            for p_str, ser in out["series"].items():
-                ser_pct = [r for r in ser if r.get("vol") is not None]
-                if not ser_pct:
-                    continue
+                            out["notes"].append(f"No intraday bars on {on_date}; used nearest prior bar {used}.")
+
+                on_obj = {
+                    "date_requested": on_date,
+                    "date_used": used,
+                    "close": sel.get("close") if sel else None,
+                    "vol_raw": sel.get("vol_raw") if sel else None,  # $ σ
+                    "vol": sel.get("vol") if sel else None,          # daily %
+                }
+                if on_obj["vol"] is None and on_obj["vol_raw"] is not None and on_obj["close"]:
+                    on_obj["vol"] = float(on_obj["vol_raw"] / on_obj["close"] * 100.0)
+                if annualize and timeframe == "1day" and on_obj.get("vol") is not None:
+                    on_obj["vol_annualized"] = _annualize_pct(on_obj["vol"], timeframe, trading_days)
+
+                out["on_date"][p_str] = on_obj
+
+        # ---- analytics: thresholds & extremes (percent scale) ----
+        for p_str, ser in out["series"].items():
+            ser_pct = [r for r in ser if r.get("vol") is not None]
+            if not ser_pct:
+                continue
 
-                asc = sorted(ser_pct, key=lambda x: x["date"])
-                desc = ser_pct  # newest-first as stored
+            asc = sorted(ser_pct, key=lambda x: x["date"])
+            desc = ser_pct  # newest-first as stored
 
-                signals = {"counts": {}, "crossings": {}, "streaks": {}}
-                for t in thresholds:
-                    signals["counts"][f"> {t}%"] = _count_days(desc, "gt", t)
-                    signals["counts"][f"< {t}%"] = _count_days(desc, "lt", t)
-                    signals["crossings"][f"{t}%"] = _threshold_crossings(asc, t)
-                    L_hi, s_hi, e_hi = _streak(asc, "gt", t)
-                    L_lo, s_lo, e_lo = _streak(asc, "lt", t)
-                    signals["streaks"][f"> {t}%"] = {"length": L_hi, "start": s_hi, "end": e_hi}
-                    signals["streaks"][f"< {t}%"] = {"length": L_lo, "start": s_lo, "end": e_lo}
+            signals = {"counts": {}, "crossings": {}, "streaks": {}}
+            for t in thresholds:
+                signals["counts"][f"> {t}%"] = _count_days(desc, "gt", t)
+                signals["counts"][f"< {t}%"] = _count_days(desc, "lt", t)
+                signals["crossings"][f"{t}%"] = _threshold_crossings(asc, t)
+                L_hi, s_hi, e_hi = _streak(asc, "gt", t)
+                L_lo, s_lo, e_lo = _streak(asc, "lt", t)
+                signals["streaks"][f"> {t}%"] = {"length": L_hi, "start": s_hi, "end": e_hi}
+                signals["streaks"][f"< {t}%"] = {"length": L_lo, "start": s_lo, "end": e_lo}
 
-                out["signals"][p_str] = signals
+            out["signals"][p_str] = signals
 
-                max_row = max(ser_pct, key=lambda x: x["vol"])
-                min_row = min(ser_pct, key=lambda x: x["vol"])
-                out["extremes"][p_str] = {"max": max_row, "min": min_row}
+            max_row = max(ser_pct, key=lambda x: x["vol"])
+            min_row = min(ser_pct, key=lambda x: x["vol"])
+            out["extremes"][p_str] = {"max": max_row, "min": min_row}
 
         return out
 
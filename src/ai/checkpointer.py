@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from langgraph.checkpoint.memory import MemorySaver
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    In-memory checkpointer shared by every run of a compiled graph.
+
+    Threads (one per `thread_id`, i.e. per `message_id`) are evicted once they
+    are older than `ttl_seconds` or when more than `max_threads` are held, and
+    can be released explicitly with `release()` as soon as a run finishes.
+    """
+
+    def __init__(self, max_threads: int = 512, ttl_seconds: float = 900.0):
+        super().__init__()
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self._last_access: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _touch(self, thread_id: Optional[str]):
+        if thread_id is None:
+            return
+        with self._lock:
+            self._last_access[thread_id] = time.monotonic()
+            self._last_access.move_to_end(thread_id)
+        self._evict()
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for thread_id, last_access in self._last_access.items():
+                if now - last_access > self.ttl_seconds or len(self._last_access) - len(expired) > self.max_threads:
+                    expired.append(thread_id)
+                else:
+                    break
+            for thread_id in expired:
+                del self._last_access[thread_id]
+
+        for thread_id in expired:
+            self.delete_thread(thread_id)
+
+    def release(self, thread_id: str):
+        """Drop every checkpoint, write and blob stored for `thread_id`."""
+        with self._lock:
+            self._last_access.pop(thread_id, None)
+        self.delete_thread(thread_id)
+
+    def active_threads(self) -> int:
+        with self._lock:
+            return len(self._last_access)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        self._touch(config["configurable"].get("thread_id"))
+        return next_config
+
+    def put_writes(self, config, writes, task_id, task_path: str = ""):
+        super().put_writes(config, writes, task_id, task_path)
+        self._touch(config["configurable"].get("thread_id"))
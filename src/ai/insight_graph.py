@@ -1,5 +1,6 @@
 from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import MemorySaver
+from src.ai.checkpointer import BoundedMemorySaver
+from src.ai.llm.config import InsightGraphCheckpointConfig
 from src.ai.ai_schemas.graph_states import InsightAgentState
 from src.ai.agents.db_search_agent import DBSearchAgent
 from src.ai.agents.intent_detector import IntentDetector
@@ -19,12 +20,14 @@ from src.ai.agents.map_agent import MapAgent
 from IPython.display import Markdown, Image, display
 import os
 
+igcc = InsightGraphCheckpointConfig()
 
 class InsightAgentGraph:
     def __init__(self):
         self.state = InsightAgentState
-        # self.checkpointer = MemorySaver()
+        self.checkpointer = BoundedMemorySaver(max_threads=igcc.MAX_THREADS, ttl_seconds=igcc.TTL_SECONDS)
         self.agents = self._initialize_agents()
+        self.prewarm()
         self.graph = self._create_graph()
 
     def _initialize_agents(self):
@@ -49,23 +52,38 @@ class InsightAgentGraph:
 
         self.validation_agent = ValidationAgent()
 
+    def prewarm(self):
+        # Tool-calling agents reuse their compiled ReAct sub-graphs, so build them before the first request
+        for agent in (
+            self.db_search_agent,
+            self.web_search_agent,
+            self.social_media_agent,
+            self.finance_data_agent,
+            self.coding_agent,
+            self.map_agent,
+            self.response_generator_agent,
+        ):
+            agent.prewarm()
+
     def _create_graph(self):
+        # Agent nodes are registered through their async `acall` so LLM round-trips run on the
+        # event loop instead of occupying a worker thread for the whole call.
         graph = StateGraph(self.state)
-        graph.add_node("Query Intent Detector", self.intent_detector)
-        graph.add_node("DB Search Agent", self.db_search_agent)
-        graph.add_node("Planner Agent", self.planner_agent)
-        graph.add_node("Manager Agent", self.manager_agent)
-        graph.add_node("Executor Agent", self.executor_agent)
+        graph.add_node("Query Intent Detector", self.intent_detector.acall)
+        graph.add_node("DB Search Agent", self.db_search_agent.acall)
+        graph.add_node("Planner Agent", self.planner_agent.acall)
+        graph.add_node("Manager Agent", self.manager_agent.acall)
+        graph.add_node("Executor Agent", self.executor_agent.acall)
         graph.add_node("Task Router", self.task_router)
-        graph.add_node("Web Search Agent", self.web_search_agent)
-        graph.add_node("Social Media Scrape Agent", self.social_media_agent)
-        graph.add_node("Finance Data Agent", self.finance_data_agent)
-        graph.add_node("Sentiment Analysis Agent", self.sentiment_analysis_agent)
-        graph.add_node("Data Comparison Agent", self.data_comparison_agent)
-        graph.add_node("Coding Agent", self.coding_agent)
-        graph.add_node("Map Agent", self.map_agent)
-        graph.add_node("Response Generator Agent", self.response_generator_agent)
-        graph.add_node("Validation Agent", self.validation_agent)
+        graph.add_node("Web Search Agent", self.web_search_agent.acall)
+        graph.add_node("Social Media Scrape Agent", self.social_media_agent.acall)
+        graph.add_node("Finance Data Agent", self.finance_data_agent.acall)
+        graph.add_node("Sentiment Analysis Agent", self.sentiment_analysis_agent.acall)
+        graph.add_node("Data Comparison Agent", self.data_comparison_agent.acall)
+        graph.add_node("Coding Agent", self.coding_agent.acall)
+        graph.add_node("Map Agent", self.map_agent.acall)
+        graph.add_node("Response Generator Agent", self.response_generator_agent.acall)
+        graph.add_node("Validation Agent", self.validation_agent.acall)
 
         graph.add_edge(START, "Query Intent Detector")
         graph.add_edge("Planner Agent", "Executor Agent")
@@ -75,7 +93,7 @@ class InsightAgentGraph:
         
         graph.add_edge("Response Generator Agent", END)
 
-        insight_graph = graph.compile(checkpointer=MemorySaver())
+        insight_graph = graph.compile(checkpointer=self.checkpointer)
 
         return insight_graph
 
@@ -85,7 +103,11 @@ class InsightAgentGraph:
         return self.graph.get_graph().draw_mermaid()
 
     def get_graph(self):
-        return self._create_graph()
+        # Compiled once in __init__ and shared by every request; runs are isolated by thread_id.
+        return self.graph
+
+    def release_thread(self, thread_id: str):
+        self.checkpointer.release(thread_id)
 
     def get_mermaid_png(self):
         return self.graph.get_graph().draw_mermaid_png()
@@ -424,3 +424,30 @@ class WebSearchConfig:
 #     STREAM = True
 
 
+
+class InsightGraphCheckpointConfig:
+    MAX_THREADS = 512
+    TTL_SECONDS = 900
+
+
+class ResponseCacheConfig:
+    EMBEDDING_MODEL = "gemini/text-embedding-004"
+    SIMILARITY_THRESHOLD = 0.93
+
+
+class PromptBudgetConfig:
+    # System prompt tokens per agent; optional sections are left out beyond these
+    INTENT_DETECTOR = 8500
+    FAST_AGENT = 9500
+    EXECUTOR = 1500
+    RESPONSE_GENERATOR = 1500
+
+
+class PromptCacheConfig:
+    # Gemini context caches of static system prompts
+    TTL_SECONDS = 3600
+    REFRESH_BEFORE_SECONDS = 600  # extend a handle's TTL once it expires within this window
+    MIN_PROMPT_CHARS = 8192  # ~2048 tokens, the smallest prompt Gemini caches explicitly
+    MAX_HANDLES = 64
+    FAILURE_COOLDOWN_SECONDS = 600
+    REQUEST_TIMEOUT_SECONDS = 10
@@ -1,8 +1,15 @@
 from langchain_community.chat_models import ChatLiteLLM
 # from langchain_litellm import ChatLiteLLM
 from dotenv import dotenv_values
-from typing import List, Optional, Any
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Any, Tuple
+from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.runnables import ensure_config
+import litellm
+import logging
 import os
+from src.ai.llm.prompt_cache import cacheable_prompt, prompt_cache
+from src.ai.llm.usage_tracker import USAGE_SCOPE, cached_tokens, usage_scope
 
 
 # os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
@@ -26,17 +33,113 @@ if groq_api_key and not os.getenv("GROQ_API_KEY"):
     os.environ["GROQ_API_KEY"] = groq_api_key
 
 
+logger = logging.getLogger("uvicorn")
+
+
+class CachingChatLiteLLM(ChatLiteLLM):
+    """
+    ChatLiteLLM that sends a system prompt marked with `cacheable_system_message` as a cached
+    content handle of `prompt_cache`, falling back to the plain prompt if the cached call fails,
+    and tags every call with its run's usage scope for `usage_tracker`.
+    """
+
+    @property
+    def _model_id(self) -> str:
+        return self.model_name or self.model
+
+    def _prepare(self, messages: List[BaseMessage], run_manager, kwargs: Dict[str, Any]) -> Tuple[Optional[str], List[BaseMessage], Dict[str, Any]]:
+        """The prompt to serve from the cache (if any), the messages with a plain system prompt and the call kwargs."""
+        # Streaming calls get no run manager; the metadata of the enclosing run is in the config context
+        scope = usage_scope(getattr(run_manager, "metadata", None) or ensure_config().get("metadata"))
+        if scope is not None and "metadata" not in kwargs:
+            kwargs = {**kwargs, "metadata": {USAGE_SCOPE: scope}}
+        prompt = cacheable_prompt(messages[0]) if messages else None
+        if prompt is None:
+            return None, messages, kwargs
+        messages = [SystemMessage(content=prompt), *messages[1:]]
+        if len(messages) < 2 or {"tools", "functions", "cached_content"} & kwargs.keys():
+            return None, messages, kwargs
+        return prompt, messages, kwargs
+
+    def _create_chat_result(self, response) -> ChatResult:
+        result = super()._create_chat_result(response)
+        cached = cached_tokens(response.get("usage"))
+        if cached:
+            for generation in result.generations:
+                if getattr(generation.message, "usage_metadata", None):
+                    generation.message.usage_metadata["input_token_details"] = {"cache_read": cached}
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, stream=None, **kwargs) -> ChatResult:
+        prompt, messages, kwargs = self._prepare(messages, run_manager, kwargs)
+        cached_content = await prompt_cache.aget(self._model_id, prompt) if prompt else None
+        if cached_content:
+            try:
+                return await super()._agenerate(messages[1:], stop, run_manager, stream, cached_content=cached_content, **kwargs)
+            except Exception as e:
+                prompt_cache.invalidate(self._model_id, prompt, e)
+        return await super()._agenerate(messages, stop, run_manager, stream, **kwargs)
+
+    def _generate(self, messages, stop=None, run_manager=None, stream=None, **kwargs) -> ChatResult:
+        prompt, messages, kwargs = self._prepare(messages, run_manager, kwargs)
+        cached_content = prompt_cache.get(self._model_id, prompt) if prompt else None
+        if cached_content:
+            try:
+                return super()._generate(messages[1:], stop, run_manager, stream, cached_content=cached_content, **kwargs)
+            except Exception as e:
+                prompt_cache.invalidate(self._model_id, prompt, e)
+        return super()._generate(messages, stop, run_manager, stream, **kwargs)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        prompt, messages, kwargs = self._prepare(messages, run_manager, kwargs)
+        cached_content = await prompt_cache.aget(self._model_id, prompt) if prompt else None
+        if cached_content:
+            started = False
+            try:
+                async for chunk in super()._astream(messages[1:], stop, run_manager, cached_content=cached_content, **kwargs):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if started:
+                    raise
+                prompt_cache.invalidate(self._model_id, prompt, e)
+        async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+            yield chunk
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        prompt, messages, kwargs = self._prepare(messages, run_manager, kwargs)
+        cached_content = prompt_cache.get(self._model_id, prompt) if prompt else None
+        if cached_content:
+            started = False
+            try:
+                for chunk in super()._stream(messages[1:], stop, run_manager, cached_content=cached_content, **kwargs):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if started:
+                    raise
+                prompt_cache.invalidate(self._model_id, prompt, e)
+        yield from super()._stream(messages, stop, run_manager, **kwargs)
+
+
 def get_llm(model_name: str, temperature: float = None, max_tokens: int = None):
-    model = ChatLiteLLM(model_name=model_name, temperature=temperature, max_tokens=max_tokens, max_retries=2)
+    model = CachingChatLiteLLM(model_name=model_name, temperature=temperature, max_tokens=max_tokens, max_retries=2)
     # model = ChatLiteLLM(model=model_name, temperature=temperature, max_tokens=max_tokens, max_retries=2)
     return model
 
 
 def get_llm_groq(model_name: str , temperature: float = None, top_p: float = None, top_k: int = None) -> ChatLiteLLM:
-    return ChatLiteLLM(model=model_name, temperature=temperature, top_p=top_p, top_k=top_k)
+    return CachingChatLiteLLM(model=model_name, temperature=temperature, top_p=top_p, top_k=top_k)
 
 
 def get_llm_alt(model_name: str, temperature: float = None, max_tokens: int = None):
-    model = ChatLiteLLM(model= model_name, temperature=temperature, max_tokens=max_tokens)
+    model = CachingChatLiteLLM(model= model_name, temperature=temperature, max_tokens=max_tokens)
     return model
 
+
+
+async def aget_embedding(text: str, model_name: str) -> List[float]:
+    response = await litellm.aembedding(model=model_name, input=[text])
+    return response.data[0]["embedding"]
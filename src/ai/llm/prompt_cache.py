@@ -0,0 +1,205 @@
+"""
+Provider-side caching of static system prompts.
+
+A system message marked with `cacheable_system_message` is uploaded to Gemini once as a
+`cachedContents` resource; later calls of the same model with the same prompt only name the
+cached content, whose tokens Gemini bills at the cached-input rate. `PromptCache` creates a
+handle on first use, extends its TTL while requests keep using it and creates a new one once it
+expired.
+
+Prompts below Gemini's minimum cache size, calls with tools bound (cached content cannot be
+combined with request tools) and other providers send the prompt as before; Gemini's implicit
+caching still applies to their stable prefix.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+import httpx
+from langchain_core.messages import BaseMessage, SystemMessage
+from src.ai.llm.config import PromptCacheConfig
+
+logger = logging.getLogger("uvicorn")
+
+pcc = PromptCacheConfig()
+
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "true").lower() == "true"
+GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta"
+CACHE_CONTROL = {"type": "ephemeral"}
+
+Request = Tuple[str, str, Dict[str, Any]]
+
+
+def cacheable_system_message(message: SystemMessage) -> SystemMessage:
+    """`message` with its text marked as a cacheable prefix."""
+    if not isinstance(message.content, str):
+        return message
+    return SystemMessage(content=[{"type": "text", "text": message.content, "cache_control": CACHE_CONTROL}])
+
+
+def cacheable_prompt(message: BaseMessage) -> Optional[str]:
+    """Text of a system message marked with `cacheable_system_message`, else None."""
+    if not isinstance(message, SystemMessage) or not isinstance(message.content, list):
+        return None
+    blocks = message.content
+    if not all(isinstance(block, dict) and block.get("type") == "text" for block in blocks):
+        return None
+    if not any("cache_control" in block for block in blocks):
+        return None
+    return "".join(block["text"] for block in blocks)
+
+
+def supports_cached_content(model: str) -> bool:
+    return model.startswith("gemini/")
+
+
+class CachedContent(NamedTuple):
+    name: str
+    expires_at: float
+
+
+class PromptCache:
+    def __init__(
+        self,
+        enabled: bool = PROMPT_CACHE_ENABLED,
+        ttl: int = pcc.TTL_SECONDS,
+        refresh_before: int = pcc.REFRESH_BEFORE_SECONDS,
+        min_chars: int = pcc.MIN_PROMPT_CHARS,
+        max_handles: int = pcc.MAX_HANDLES,
+        failure_cooldown: int = pcc.FAILURE_COOLDOWN_SECONDS,
+        timeout: float = pcc.REQUEST_TIMEOUT_SECONDS,
+    ):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.refresh_before = refresh_before
+        self.min_chars = min_chars
+        self.max_handles = max_handles
+        self.failure_cooldown = failure_cooldown
+        self.timeout = timeout
+        self._handles: "OrderedDict[str, CachedContent]" = OrderedDict()
+        self._failed_until: Dict[str, float] = {}
+        self._async_locks: Dict[str, asyncio.Lock] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def usable(self, model: str, prompt: str) -> bool:
+        """Whether calls of `model` with `prompt` should go through a cached content."""
+        if not self.enabled or not supports_cached_content(model) or len(prompt) < self.min_chars:
+            return False
+        if not os.getenv("GEMINI_API_KEY"):
+            return False
+        return self._failed_until.get(self._key(model, prompt), 0) <= time.time()
+
+    def _fresh(self, key: str) -> Optional[CachedContent]:
+        handle = self._handles.get(key)
+        if handle is None or handle.expires_at - self.refresh_before <= time.time():
+            return None
+        self._handles.move_to_end(key)
+        return handle
+
+    def _remember(self, key: str, handle: CachedContent):
+        # Handles pushed out here are not deleted; they simply expire at the provider
+        self._handles[key] = handle
+        self._handles.move_to_end(key)
+        while len(self._handles) > self.max_handles:
+            self._handles.popitem(last=False)
+
+    def _fail(self, key: str, error: Exception):
+        logger.warning(f"Prompt cache unavailable for {self.failure_cooldown}s: {error}")
+        self._handles.pop(key, None)
+        self._failed_until[key] = time.time() + self.failure_cooldown
+
+    def invalidate(self, model: str, prompt: str, error: Exception):
+        """Stop using the handle of a prompt whose cached call failed."""
+        self._fail(self._key(model, prompt), error)
+
+    def _requests(self, model: str, prompt: str, stale: Optional[CachedContent]) -> Tuple[Optional[Request], Request]:
+        """The request extending `stale` (if it is still alive) and the one creating a new handle."""
+        refresh = None
+        if stale is not None and stale.expires_at > time.time():
+            refresh = ("PATCH", f"{GEMINI_API_URL}/{stale.name}", {"ttl": f"{self.ttl}s"})
+        create = ("POST", f"{GEMINI_API_URL}/cachedContents", {
+            "model": f"models/{model.split('/', 1)[1]}",
+            "systemInstruction": {"parts": [{"text": prompt}]},
+            "ttl": f"{self.ttl}s",
+            "displayName": f"prompt-{self._key(model, prompt)[:16]}",
+        })
+        return refresh, create
+
+    def _send(self, client: httpx.Client, request: Request) -> CachedContent:
+        method, url, body = request
+        params = {"updateMask": "ttl"} if method == "PATCH" else None
+        response = client.request(method, url, params=params, json=body, headers={"x-goog-api-key": os.getenv("GEMINI_API_KEY", "")})
+        response.raise_for_status()
+        return CachedContent(response.json()["name"], time.time() + self.ttl)
+
+    async def _asend(self, client: httpx.AsyncClient, request: Request) -> CachedContent:
+        method, url, body = request
+        params = {"updateMask": "ttl"} if method == "PATCH" else None
+        response = await client.request(method, url, params=params, json=body, headers={"x-goog-api-key": os.getenv("GEMINI_API_KEY", "")})
+        response.raise_for_status()
+        return CachedContent(response.json()["name"], time.time() + self.ttl)
+
+    async def aget(self, model: str, prompt: str) -> Optional[str]:
+        """Name of a live cached content holding `prompt`, or None to send the prompt itself."""
+        if not self.usable(model, prompt):
+            return None
+        key = self._key(model, prompt)
+        handle = self._fresh(key)
+        if handle is not None:
+            return handle.name
+
+        async with self._async_locks.setdefault(key, asyncio.Lock()):
+            handle = self._fresh(key)
+            if handle is not None:
+                return handle.name
+            refresh, create = self._requests(model, prompt, self._handles.get(key))
+            try:
+                async with httpx.AsyncClient(timeout=self.timeout) as client:
+                    if refresh is not None:
+                        try:
+                            handle = await self._asend(client, refresh)
+                        except httpx.HTTPError as e:
+                            logger.info(f"Could not extend cached prompt, creating a new one: {e}")
+                    if handle is None:
+                        handle = await self._asend(client, create)
+            except Exception as e:
+                self._fail(key, e)
+                return None
+            self._remember(key, handle)
+            return handle.name
+
+    def get(self, model: str, prompt: str) -> Optional[str]:
+        """Synchronous `aget`."""
+        if not self.usable(model, prompt):
+            return None
+        key = self._key(model, prompt)
+        with self._lock:
+            handle = self._fresh(key)
+            if handle is not None:
+                return handle.name
+            refresh, create = self._requests(model, prompt, self._handles.get(key))
+            try:
+                with httpx.Client(timeout=self.timeout) as client:
+                    if refresh is not None:
+                        try:
+                            handle = self._send(client, refresh)
+                        except httpx.HTTPError as e:
+                            logger.info(f"Could not extend cached prompt, creating a new one: {e}")
+                    if handle is None:
+                        handle = self._send(client, create)
+            except Exception as e:
+                self._fail(key, e)
+                return None
+            self._remember(key, handle)
+            return handle.name
+
+
+prompt_cache = PromptCache()
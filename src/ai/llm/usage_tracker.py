@@ -0,0 +1,151 @@
+"""
+Token usage of the LLM calls made for one request.
+
+Models from `get_llm` pass the `usage_scope` of their run (from the graph config's metadata) on
+to litellm. `usage_tracker` receives litellm's success callback with the final usage of every
+call, streamed or not, and collects it per scope, cached input tokens included, until the
+request takes it with `collect`.
+
+litellm reports the usage of async calls from a task it schedules after the call returns (and of
+sync calls from a thread), so the last call of a request usually reports after the request has
+finished streaming. The tracker notes every call of a scope when it starts and `collect` waits
+for those still running to report before it hands the usage over.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+import litellm
+from litellm.integrations.custom_logger import CustomLogger
+
+logger = logging.getLogger("uvicorn")
+
+USAGE_SCOPE = "usage_scope"
+MAX_SCOPES = 1024  # requests tracked at once; the oldest are dropped if never popped
+COLLECT_TIMEOUT = 2.0  # seconds `collect` waits for calls that have not reported (e.g. an abandoned stream)
+COLLECT_POLL_INTERVAL = 0.01
+
+
+def _field(container: Any, name: str) -> Any:
+    if container is None:
+        return None
+    if isinstance(container, dict):
+        return container.get(name)
+    return getattr(container, name, None)
+
+
+def cached_tokens(usage: Any) -> int:
+    """Prompt tokens served from the provider's cache, from a litellm usage object or dict."""
+    return _field(_field(usage, "prompt_tokens_details"), "cached_tokens") or 0
+
+
+def token_usage(model: str, usage: Any) -> Dict[str, Any]:
+    """Usage in the format `count_usage_metrics` expects."""
+    return {
+        "model": model,
+        "input_tokens": _field(usage, "prompt_tokens") or 0,
+        "output_tokens": _field(usage, "completion_tokens") or 0,
+        "total_tokens": _field(usage, "total_tokens") or 0,
+        "cached_input_tokens": cached_tokens(usage),
+    }
+
+
+class UsageTracker(CustomLogger):
+    def __init__(self, max_scopes: int = MAX_SCOPES):
+        super().__init__()
+        self.max_scopes = max_scopes
+        self._usage: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._running: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def start(self, scope: str):
+        with self._lock:
+            self._usage[str(scope)] = []
+            self._running[str(scope)] = set()
+            while len(self._usage) > self.max_scopes:
+                dropped, _ = self._usage.popitem(last=False)
+                self._running.pop(dropped, None)
+
+    def pop(self, scope: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._running.pop(str(scope), None)
+            return self._usage.pop(str(scope), [])
+
+    def running(self, scope: str) -> int:
+        """Calls of `scope` that have started and not reported yet."""
+        with self._lock:
+            return len(self._running.get(str(scope)) or ())
+
+    async def collect(self, scope: str, timeout: float = COLLECT_TIMEOUT) -> List[Dict[str, Any]]:
+        """`pop` once every call of `scope` has reported its usage, or after `timeout` seconds."""
+        deadline = time.monotonic() + timeout
+        # Lets the logging tasks litellm has already scheduled run first
+        await asyncio.sleep(0)
+        while self.running(scope) and time.monotonic() < deadline:
+            await asyncio.sleep(COLLECT_POLL_INTERVAL)
+        return self.pop(scope)
+
+    @staticmethod
+    def _call(kwargs: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+        """(scope, litellm call id) of a callback's kwargs."""
+        litellm_params = kwargs.get("litellm_params") or {}
+        scope = (litellm_params.get("metadata") or {}).get(USAGE_SCOPE)
+        return scope, kwargs.get("litellm_call_id") or litellm_params.get("litellm_call_id")
+
+    def _finish(self, scope: Optional[str], call_id: Optional[str]):
+        if scope is None or call_id is None:
+            return
+        with self._lock:
+            running = self._running.get(str(scope))
+            if running is not None:
+                running.discard(call_id)
+
+    def record(self, kwargs: Dict[str, Any], response_obj: Any):
+        scope, call_id = self._call(kwargs)
+        litellm_params = kwargs.get("litellm_params") or {}
+        usage = _field(response_obj, "usage")
+        if scope is None or usage is None:
+            self._finish(scope, call_id)
+            return
+        model = kwargs.get("model") or ""
+        provider = litellm_params.get("custom_llm_provider")
+        if provider and not model.startswith(f"{provider}/"):
+            model = f"{provider}/{model}"
+        with self._lock:
+            records = self._usage.get(str(scope))
+            if records is not None:
+                records.append(token_usage(model, usage))
+            running = self._running.get(str(scope))
+            if running is not None and call_id is not None:
+                running.discard(call_id)
+
+    def log_pre_api_call(self, model, messages, kwargs):
+        scope, call_id = self._call(kwargs)
+        if scope is None or call_id is None:
+            return
+        with self._lock:
+            running = self._running.get(str(scope))
+            if running is not None:
+                running.add(call_id)
+
+    def log_success_event(self, kwargs, response_obj, start_time, end_time):
+        self.record(kwargs, response_obj)
+
+    async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+        self.record(kwargs, response_obj)
+
+    def log_failure_event(self, kwargs, response_obj, start_time, end_time):
+        self._finish(*self._call(kwargs))
+
+    async def async_log_failure_event(self, kwargs, response_obj, start_time, end_time):
+        self._finish(*self._call(kwargs))
+
+
+def usage_scope(metadata: Optional[Dict[str, Any]]) -> Optional[str]:
+    return (metadata or {}).get(USAGE_SCOPE)
+
+
+usage_tracker = UsageTracker()
+litellm.callbacks.append(usage_tracker)
@@ -0,0 +1,165 @@
+"""
+SARIMAX forecasts off the API workers' interpreters.
+
+`forecast_service.forecast` prepares the closes of a ticker and hands the fits to a bounded
+process pool, so they no longer hold the GIL of the worker that serves the streams. Fits are
+cached by (ticker, bar frequency, model, last bar date, horizon, closes): in-process, and in
+Redis for the other workers, so predicting the same ticker again on the same day only reapplies
+the sentiment adjustment. A new day's fit starts from the parameters of the ticker's previous fit.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Dict, List, Optional, Sequence, Tuple, Union
+import pandas as pd
+from src.ai.stock_prediction.sarimax_worker import fit_forecast
+from src.ai.stock_prediction.stock_prediction_functions import PRICE_MULTIPLIER, forecast_frames, needs_fallback, prepare_close_prices
+from src.backend.utils.api_utils import RedisManager, redis_manager
+from src.backend.utils.single_flight import SingleFlight
+
+logger = logging.getLogger("uvicorn")
+
+FORECAST_WORKERS = int(os.getenv("FORECAST_WORKERS", "2"))
+FORECAST_CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", "1024"))
+FORECAST_CACHE_REDIS_TTL = int(os.getenv("FORECAST_CACHE_REDIS_TTL", str(24 * 3600)))
+FORECAST_CACHE_REDIS = os.getenv("FORECAST_CACHE_REDIS", "true").lower() == "true"
+CACHE_KEY_PREFIX = "forecast:"
+
+Fit = Dict[str, List[Any]]
+Forecast = Tuple[pd.Series, pd.DataFrame]
+
+
+class ForecastService:
+    def __init__(
+        self,
+        manager: Optional[RedisManager],
+        max_workers: int = FORECAST_WORKERS,
+        max_entries: int = FORECAST_CACHE_SIZE,
+        redis_ttl: int = FORECAST_CACHE_REDIS_TTL,
+        use_redis: bool = FORECAST_CACHE_REDIS,
+    ):
+        self.manager = manager
+        self.max_workers = max_workers
+        self.max_entries = max_entries
+        self.redis_ttl = redis_ttl
+        self.use_redis = use_redis and manager is not None
+        self.flights = SingleFlight()
+        self.fits_run = 0
+        self._fits: "OrderedDict[str, Fit]" = OrderedDict()
+        self._params: "OrderedDict[Tuple[str, str, str], List[float]]" = OrderedDict()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # Spawned, not forked: the API process runs threads and event loops
+                    self._executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    @staticmethod
+    def _key(symbol: str, freq: str, model: str, series: pd.Series, steps: int) -> str:
+        digest = hashlib.sha1(series.to_numpy().tobytes()).hexdigest()[:16]
+        return f"{symbol}:{freq}:{model}:{series.index[-1].date()}:{steps}:{digest}"
+
+    def _remember(self, entries: OrderedDict, key: Any, value: Any):
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    async def _get_shared(self, key: str) -> Optional[Fit]:
+        try:
+            raw = await self.manager.safe_execute("get", f"{CACHE_KEY_PREFIX}{key}")
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            logger.warning(f"Forecast cache read failed for {key}: {e}")
+            return None
+
+    async def _put_shared(self, key: str, fit: Fit):
+        try:
+            await self.manager.safe_execute("set", f"{CACHE_KEY_PREFIX}{key}", json.dumps(fit), ex=self.redis_ttl)
+        except Exception as e:
+            logger.warning(f"Forecast cache write failed for {key}: {e}")
+
+    async def _run_fit(self, key: str, params_key: Tuple[str, str, str], series: pd.Series, model: str, steps: int) -> Fit:
+        start_params = self._params.get(params_key)
+        loop = asyncio.get_running_loop()
+        try:
+            fit = await loop.run_in_executor(self.executor, fit_forecast, series, model, steps, start_params)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); the next fit starts a new pool
+            self.shutdown()
+            raise
+        self.fits_run += 1
+        self._remember(self._params, params_key, fit["params"])
+        self._remember(self._fits, key, fit)
+        if self.use_redis:
+            await self._put_shared(key, fit)
+        return fit
+
+    async def _fit(self, symbol: str, model: str, series: pd.Series, steps: int) -> Fit:
+        freq = series.index.freqstr or ""
+        key = self._key(symbol, freq, model, series, steps)
+        fit = self._fits.get(key)
+        if fit is not None:
+            self._fits.move_to_end(key)
+        elif self.use_redis:
+            fit = await self._get_shared(key)
+            if fit is not None:
+                self._remember(self._fits, key, fit)
+                self._params.setdefault((symbol, freq, model), fit["params"])
+        if fit is None:
+            fit = await self.flights.run(key, lambda: self._run_fit(key, (symbol, freq, model), series, model, steps))
+        return fit
+
+    async def forecast(
+        self,
+        history_data: Optional[Dict[str, Any]],
+        exchange_symbol: str,
+        forecast_steps: int = 5,
+        rating: Optional[Awaitable[float]] = None,
+    ) -> Forecast:
+        """
+        `sarimax_predict` with the fits in the process pool and cached. The fits only need the
+        closes: `rating`, when given instead of the history's `current_rating`, is awaited once
+        the seasonal fit is in, so a slow sentiment lookup runs alongside it.
+        """
+        if not history_data:
+            raise ValueError("No historical data provided")
+        symbol = history_data["symbol"].upper()
+        close_prices = await asyncio.to_thread(prepare_close_prices, history_data, exchange_symbol)
+        close_prices_scaled = close_prices * PRICE_MULTIPLIER
+
+        fit = await self._fit(symbol, "seasonal", close_prices_scaled, forecast_steps)
+        sentiment_percent = await rating if rating is not None else history_data["current_rating"]
+        adjusted_mean_series, adjusted_ci_df = forecast_frames(fit, sentiment_percent)
+        if needs_fallback(adjusted_mean_series, adjusted_ci_df, close_prices):
+            logger.info(f"Seasonal forecast of {symbol} too large or invalid, using the fallback model")
+            fit = await self._fit(symbol, "fallback", close_prices_scaled, forecast_steps)
+            adjusted_mean_series, adjusted_ci_df = forecast_frames(fit)
+        return adjusted_mean_series, adjusted_ci_df
+
+    async def forecast_many(self, requests: Sequence[Tuple[Optional[Dict[str, Any]], str]], forecast_steps: int = 5) -> List[Union[Forecast, Exception]]:
+        """Forecasts of (history_data, exchange_symbol) pairs, in order; failures are returned, not raised."""
+        return await asyncio.gather(
+            *(self.forecast(history_data, exchange_symbol, forecast_steps) for history_data, exchange_symbol in requests),
+            return_exceptions=True,
+        )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+forecast_service = ForecastService(redis_manager)
@@ -0,0 +1,44 @@
+"""
+SARIMAX fitting, run in the forecast service's worker processes.
+
+This module only imports NumPy, pandas and statsmodels, so spawned workers start quickly and do
+not load the API. Fits take and return plain data that pickles cheaply and can be cached as JSON.
+"""
+import warnings
+from typing import Any, Dict, List, Optional, Sequence
+import pandas as pd
+from statsmodels.tools.sm_exceptions import ConvergenceWarning
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+warnings.simplefilter("default", ConvergenceWarning)
+
+MODELS = {
+    "seasonal": {"order": (1, 1, 1), "seasonal_order": (1, 1, 1, 5)},
+    "fallback": {"order": (1, 1, 1), "seasonal_order": (0, 0, 0, 0)},
+}
+
+
+def fit_forecast(series: pd.Series, model: str, steps: int, start_params: Optional[Sequence[float]] = None) -> Dict[str, List[Any]]:
+    """
+    Fit the `model` SARIMAX to `series` and forecast `steps` bars ahead with a 95% interval.
+    `start_params` (the parameters of an earlier fit of the same model) seed the optimizer.
+    """
+    sarimax = SARIMAX(series, **MODELS[model], enforce_stationarity=False, enforce_invertibility=False)
+    results = None
+    if start_params is not None:
+        try:
+            results = sarimax.fit(start_params=list(start_params), disp=False)
+        except Exception:
+            results = None
+    if results is None:
+        results = sarimax.fit(disp=False)
+
+    forecast = results.get_forecast(steps=steps)
+    conf_int = forecast.conf_int(alpha=0.05)
+    return {
+        "params": [float(value) for value in results.params],
+        "index": [timestamp.isoformat() for timestamp in forecast.predicted_mean.index],
+        "mean": forecast.predicted_mean.tolist(),
+        "lower": conf_int.iloc[:, 0].tolist(),
+        "upper": conf_int.iloc[:, 1].tolist(),
+    }
@@ -19,8 +19,10 @@ import src.backend.db.mongodb as mongodb
 
 load_dotenv()
 
-from statsmodels.tsa.statespace.sarimax import SARIMAX
 from statsmodels.tools.sm_exceptions import ConvergenceWarning
+from src.ai.stock_prediction.sarimax_worker import fit_forecast
+
+PRICE_MULTIPLIER = 10  # prices are scaled up before fitting
 
 # logging.basicConfig(
 #     filename="statsmodels_warnings.log",
@@ -471,17 +473,8 @@ def adjust_values_quad(
 
 #     return adjusted_mean_series, adjusted_ci_df 
 
-def sarimax_predict(history_data, exchange_symbol, forecast_steps=5):
-    """Forecast future stock/crypto prices using SARIMAX, adjusted by sentiment."""
-
-    if not history_data:
-        raise ValueError("No historical data provided")
-
-    sentiment_percent = history_data["current_rating"]
-    symbol = history_data["symbol"]
-
-    print(f"Symbol = {symbol} | Sentiment Rating = {sentiment_percent}")
-
+def prepare_close_prices(history_data, exchange_symbol):
+    """Recent continuous closes of `history_data` at the exchange's bar frequency, gaps forward-filled."""
     # Normalize into DataFrame
     df = pd.DataFrame(history_data["historical"])
     df["date"] = pd.to_datetime(df["date"])
@@ -500,76 +493,75 @@ def sarimax_predict(history_data, exchange_symbol, forecast_steps=5):
     else:
         close_prices = close_prices.asfreq("B")
 
-    close_prices = close_prices.ffill()
+    return close_prices.ffill()
+
+
+def forecast_frames(fit, sentiment_percent=None):
+    """
+    (mean series, lower/upper DataFrame) of a `fit_forecast` result in price units, adjusted by
+    sentiment when `sentiment_percent` is given.
+    """
+    index = pd.DatetimeIndex(fit["index"])
+    if sentiment_percent is None:
+        adjusted_mean = np.array(fit["mean"]) / PRICE_MULTIPLIER
+        adjusted_lower = np.array(fit["lower"]) / PRICE_MULTIPLIER
+        adjusted_upper = np.array(fit["upper"]) / PRICE_MULTIPLIER
+    else:
+        adjusted_mean = []
+        adjusted_lower = []
+        adjusted_upper = []
+
+        for avg, min_val, max_val in zip(fit["mean"], fit["lower"], fit["upper"]):
+            adj_max, adj_avg, adj_min = adjust_values_quad(
+                sentiment_percent, max_val, avg, min_val
+            )
 
-    multiplier = 10
-    close_prices_scaled = close_prices * multiplier
+            adjusted_mean.append(adj_avg)
+            adjusted_lower.append(adj_min)
+            adjusted_upper.append(adj_max)
 
-    model = SARIMAX(
-        close_prices_scaled,
-        order=(1, 1, 1),
-        seasonal_order=(1, 1, 1, 5),
-        enforce_stationarity=False,
-        enforce_invertibility=False,
+        adjusted_mean = np.array(adjusted_mean) / PRICE_MULTIPLIER
+        adjusted_lower = np.array(adjusted_lower) / PRICE_MULTIPLIER
+        adjusted_upper = np.array(adjusted_upper) / PRICE_MULTIPLIER
+
+    adjusted_mean_series = pd.Series(adjusted_mean, index=index)
+    adjusted_ci_df = pd.DataFrame(
+        {"lower": adjusted_lower, "upper": adjusted_upper}, index=index
     )
+    return adjusted_mean_series, adjusted_ci_df
+
 
-    results = model.fit(disp=False)
-    forecast = results.get_forecast(steps=forecast_steps)
-    forecast_mean = forecast.predicted_mean
-    conf_int = forecast.conf_int(alpha=0.05)
+def needs_fallback(adjusted_mean_series, adjusted_ci_df, close_prices):
+    """Whether a seasonal forecast is too large or invalid to show."""
+    mean = adjusted_mean_series.to_numpy()
+    upper = adjusted_ci_df["upper"].to_numpy()
+    closes = close_prices.to_numpy()
+    return bool((mean[-1] == 0) or (upper[-1] == 0) or (upper[-1] > 5 * closes[-1]) or (upper[-3] > 4 * closes[-3]) or (upper[-2] > 4 * closes[-2]))
 
-    # Adjust using sentiment
-    adjusted_mean = []
-    adjusted_lower = []
-    adjusted_upper = []
 
-    for i in range(len(forecast_mean)):
-        avg = forecast_mean.iloc[i]
-        min_val = conf_int.iloc[i, 0]
-        max_val = conf_int.iloc[i, 1]
+def sarimax_predict(history_data, exchange_symbol, forecast_steps=5):
+    """Forecast future stock/crypto prices using SARIMAX, adjusted by sentiment."""
+
+    if not history_data:
+        raise ValueError("No historical data provided")
 
-        adj_max, adj_avg, adj_min = adjust_values_quad(
-            sentiment_percent, max_val, avg, min_val
-        )
+    sentiment_percent = history_data["current_rating"]
+    symbol = history_data["symbol"]
 
-        adjusted_mean.append(adj_avg)
-        adjusted_lower.append(adj_min)
-        adjusted_upper.append(adj_max)
+    print(f"Symbol = {symbol} | Sentiment Rating = {sentiment_percent}")
 
-    adjusted_mean = np.array(adjusted_mean) / multiplier
-    adjusted_lower = np.array(adjusted_lower) / multiplier
-    adjusted_upper = np.array(adjusted_upper) / multiplier
+    close_prices = prepare_close_prices(history_data, exchange_symbol)
+    close_prices_scaled = close_prices * PRICE_MULTIPLIER
 
-    adjusted_mean_series = pd.Series(adjusted_mean, index=forecast_mean.index)
-    adjusted_ci_df = pd.DataFrame(
-        {"lower": adjusted_lower, "upper": adjusted_upper}, index=forecast_mean.index
-    )
+    fit = fit_forecast(close_prices_scaled, "seasonal", forecast_steps)
+    adjusted_mean_series, adjusted_ci_df = forecast_frames(fit, sentiment_percent)
 
     # Optional fallback logic for extreme predictions
-    if (adjusted_mean_series[-1] == 0) or (adjusted_upper[-1] == 0) or (adjusted_upper[-1] > 5 * close_prices[-1]) or (adjusted_upper[-3] > 4 * close_prices[-3]) or (adjusted_upper[-2] > 4 * close_prices[-2]):
+    if needs_fallback(adjusted_mean_series, adjusted_ci_df, close_prices):
         print("\n==== Prediction too large or invalid — switching to fallback model ====\n")
 
-        fallback_model = SARIMAX(
-            close_prices_scaled,
-            order=(1, 1, 1),
-            seasonal_order=(0, 0, 0, 0),
-            enforce_stationarity=False,
-            enforce_invertibility=False,
-        )
-
-        fallback_results = fallback_model.fit(disp=False)
-        forecast = fallback_results.get_forecast(steps=forecast_steps)
-        forecast_mean = forecast.predicted_mean
-        conf_int = forecast.conf_int(alpha=0.05)
-
-        adjusted_mean = forecast_mean / multiplier
-        adjusted_lower = conf_int.iloc[:, 0] / multiplier
-        adjusted_upper = conf_int.iloc[:, 1] / multiplier
-
-        adjusted_mean_series = pd.Series(adjusted_mean, index=forecast_mean.index)
-        adjusted_ci_df = pd.DataFrame(
-            {"lower": adjusted_lower, "upper": adjusted_upper}, index=forecast_mean.index
-        )
+        fit = fit_forecast(close_prices_scaled, "fallback", forecast_steps)
+        adjusted_mean_series, adjusted_ci_df = forecast_frames(fit)
 
     print("adjusted_mean_series:\n", adjusted_mean_series)
     print("adjusted_ci_df:\n", adjusted_ci_df)
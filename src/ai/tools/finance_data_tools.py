@@ -1,7 +1,8 @@
 import asyncio
 from asyncio.log import logger
 from beanie import Document
-import requests
+import httpx
+from src.ai.tools import http_client
 from langchain_core.tools import tool, BaseTool
 import os
 import json
@@ -162,7 +163,7 @@ class SearchCompanyInfoTool(BaseTool):
     def _fetch_fmp_data(self, query: str) -> Union[List[Dict[str, Any]], str]:
         try:
             url = f"https://financialmodelingprep.com/stable/search-name?query={query}&apikey={fm_api_key}"
-            fmp_response = requests.get(url)
+            fmp_response = http_client.get(url)
             return fmp_response.json()
         except Exception as e:
             return f"Error in getting company information from FMP for {query}: {str(e)}"
@@ -865,19 +866,21 @@ class GetStockData(BaseTool):
             try:
                 if exchange_symbol and ticker:
                     try:
-                        url = f"https://financialmodelingprep.com/stable/quote/?symbol={ticker}&apikey={fm_api_key}"
-                        currency_url = f'https://financialmodelingprep.com/stable/search-symbol?query={ticker}&apikey={fm_api_key}'
-                        data_resp = requests.get(url, timeout=10)
-                        search_resp = requests.get(currency_url, timeout=8)
-                        if data_resp.ok:
-                            fmp_json = data_resp.json()
-                        else:
-                            print(f"[DEBUG] FMP realtime status {data_resp.status_code} for {ticker}")
+                        # Shared with concurrent sessions asking about the same ticker; the symbol
+                        # search is cached in Mongo
+                        try:
+                            fmp_json = mongodb.fetch_stock_quote(ticker)
+                        except Exception as e_quote:
+                            print(f"[DEBUG] FMP realtime failed for {ticker}: {e_quote}")
                             fmp_json = None
+                        try:
+                            currency_json = mongodb.search_company(ticker).get("results")
+                        except Exception as e_search:
+                            print(f"[DEBUG] FMP symbol search failed for {ticker}: {e_search}")
+                            currency_json = None
                         if isinstance(fmp_json, list) and len(fmp_json) > 0 and isinstance(fmp_json[0], dict):
                             realtime_response = dict(fmp_json[0])
-                            if search_resp.ok:
-                                currency_json = search_resp.json()
+                            if currency_json is not None:
                                 if isinstance(currency_json, list) and len(currency_json) > 0 and isinstance(currency_json[0], dict):
                                     realtime_response["currency"] = currency_json[0].get("currency", realtime_response.get("currency", "USD"))
                                 else:
@@ -1269,10 +1272,10 @@ class CompanyEssentialFinancialsTool(BaseTool):
 
     def _fetch_data(self, url: str):
         try:
-            response = requests.get(url)
+            response = http_client.get(url)
             response.raise_for_status()
             return response.json()
-        except requests.exceptions.RequestException as err:
+        except (httpx.HTTPError, ValueError) as err:
             print(f"An error occurred: {err} for URL: {url}")
         return None
 
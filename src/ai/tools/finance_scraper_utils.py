@@ -1,10 +1,8 @@
-import os
 import re
-import requests
+import numpy as np
 from datetime import datetime, timedelta, timezone
-from collections import defaultdict
-
-fmp_api_key = os.environ.get("FM_API_KEY")
+import src.backend.db.mongodb as mongodb
+from src.backend.db.ohlcv import last_per_period
 
 
 def contains_numeric_data(table) -> bool:
@@ -69,7 +67,6 @@ def get_historical_data_fmp(ticker: str, period: str):
     Args:
         ticker: Stock symbol (e.g., "AAPL")
         period: Time period ("1mo", "3mo", "6mo", "ytd", "1y", "5y", "max")
-        api_key: Your FMP API key
     """
     try:
         frequency = "1d"
@@ -105,42 +102,14 @@ def get_historical_data_fmp(ticker: str, period: str):
             start_date = today - timedelta(days=30)
             frequency = "1d"
 
-        # Format dates for FMP API
-        from_date = start_date.strftime("%Y-%m-%d")
-        to_date = today.strftime("%Y-%m-%d")
-        
-        # FMP API endpoint
-        # base_url = "https://financialmodelingprep.com/api/v3/historical-price-full"
-        # url = f"{base_url}/{ticker}?from={from_date}&to={to_date}&apikey={fmp_api_key}"
-        base_url = "https://financialmodelingprep.com/stable/historical-price-eod/full"
-        url = f"{base_url}?symbol={ticker}&from={from_date}&to={to_date}&apikey={fmp_api_key}"
-
-        print(f"Fetching data from FMP API: {url}")
         print(f"Period: {period}, Frequency: {frequency}")
-        
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        
-        if 'historical' in data and data['historical']:
-            raw_data = data['historical']
-            
-            # Convert to our JSON format first
-            formatted_data = convert_fmp_to_json(raw_data, ticker)
-            
-            # Apply frequency filtering using simple datetime grouping
-            filtered_data = apply_frequency_filter_simple(formatted_data, frequency)
-            
-            if filtered_data:
-                return filtered_data
-            else:
-                raise RuntimeError("No data available after filtering")
-        else:
-            raise RuntimeError("No historical data found from FMP API")
-            
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching data from FMP API: {e}")
-        raise e
+
+        # Every period is a slice of the ticker's stored daily series, fetched from FMP once a day
+        series = mongodb.get_ohlcv_series(ticker).since(start_date.date()).resample(frequency)
+        if len(series):
+            return convert_fmp_to_json(series.to_records(ticker), ticker)
+        raise RuntimeError("No historical data found from FMP API")
+
     except Exception as e:
         print(f"Error in fetching historical data for {ticker}: {e}")
         raise e
@@ -154,15 +123,21 @@ def apply_frequency_filter_simple(data, frequency):
         data: List of formatted data with 'date' in "MMM DD, YYYY" format
         frequency: "1d", "1wk", or "1mo"
     """
-    if frequency == "1d":
-        return data
-    elif frequency == "1wk":
+    if frequency == "1wk":
         return get_last_trading_day_of_week(data)
     elif frequency == "1mo":
         return get_last_trading_day_of_month(data)
     else:
         return data
 
+def _last_trading_days(data, frequency):
+    """Last item of each week or month of `data`, oldest first."""
+    if not data:
+        return []
+    dates = np.array([datetime.strptime(item['date'], "%b %d, %Y").date() for item in data], dtype="datetime64[D]")
+    order = np.argsort(dates, kind="stable")
+    return [data[i] for i in order[last_per_period(dates[order], frequency)]]
+
 def get_last_trading_day_of_week(data):
     """
     Group data by week and return the last trading day of each week.
@@ -171,28 +146,7 @@ def get_last_trading_day_of_week(data):
     Args:
         data: List of data with 'date' in "MMM DD, YYYY" format
     """
-    if not data:
-        return []
-    
-    # Group by week
-    weekly_groups = defaultdict(list)
-    for item in data:
-        date_obj = datetime.strptime(item['date'], "%b %d, %Y")
-        # Get ISO week (year, week_number)
-        iso_year, iso_week, _ = date_obj.isocalendar()
-        week_key = f"{iso_year}-W{iso_week:02d}"
-        weekly_groups[week_key].append((date_obj, item))
-    
-    # Get the last trading day from each week
-    result = []
-    for week_key in sorted(weekly_groups.keys()):
-        week_data = weekly_groups[week_key]
-        # Sort by date and take the last one (most recent in the week)
-        week_data.sort(key=lambda x: x[0])
-        last_trading_day = week_data[-1][1]  # Get the data item
-        result.append(last_trading_day)
-    
-    return result
+    return _last_trading_days(data, "1wk")
 
 def get_last_trading_day_of_month(data):
     """
@@ -201,24 +155,4 @@ def get_last_trading_day_of_month(data):
     Args:
         data: List of data with 'date' in "MMM DD, YYYY" format
     """
-    if not data:
-        return []
-    
-    # Group by month
-    monthly_groups = defaultdict(list)
-    for item in data:
-        date_obj = datetime.strptime(item['date'], "%b %d, %Y")
-        # Get year-month key
-        month_key = f"{date_obj.year}-{date_obj.month:02d}"
-        monthly_groups[month_key].append((date_obj, item))
-    
-    # Get the last trading day from each month
-    result = []
-    for month_key in sorted(monthly_groups.keys()):
-        month_data = monthly_groups[month_key]
-        # Sort by date and take the last one (most recent in the month)
-        month_data.sort(key=lambda x: x[0])
-        last_trading_day = month_data[-1][1]  # Get the data item
-        result.append(last_trading_day)
-    
-    return result
\ No newline at end of file
+    return _last_trading_days(data, "1mo")
@@ -0,0 +1,127 @@
+"""
+Shared outbound HTTP clients for the data providers (FMP, Google Maps, ...).
+
+Blocking callers share one keep-alive pool per process and async callers one pool per event
+loop, so repeated calls to the same provider reuse their TLS connections. Requests negotiate
+HTTP/2 when `h2` is installed, the number of in-flight requests per host is capped, and
+retryable failures are retried with the exponential backoff the chart bot has always used.
+Redirects are followed, as they were with `requests`.
+"""
+import asyncio
+import os
+import threading
+import time
+import weakref
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+import httpx
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+DEFAULT_TIMEOUT = httpx.Timeout(connect=5.0, read=20.0, write=5.0, pool=5.0)
+DEFAULT_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "16"))
+RETRY_STATUS = {429, 500, 502, 503, 504}
+RETRY_TRIES = 3
+RETRY_BACKOFF = 0.75
+
+
+_sync_client: Optional[httpx.Client] = None
+_sync_host_limits: Dict[str, threading.BoundedSemaphore] = {}
+_sync_lock = threading.Lock()
+
+# event loop -> (client, per-host semaphores); clients and semaphores cannot be shared across loops
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[httpx.AsyncClient, Dict[str, asyncio.Semaphore]]]" = weakref.WeakKeyDictionary()
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc
+
+
+def get_client() -> httpx.Client:
+    global _sync_client
+    if _sync_client is None:
+        with _sync_lock:
+            if _sync_client is None:
+                _sync_client = httpx.Client(http2=HTTP2_AVAILABLE, timeout=DEFAULT_TIMEOUT, limits=DEFAULT_LIMITS, follow_redirects=True)
+    return _sync_client
+
+
+def _sync_host_limit(host: str) -> threading.BoundedSemaphore:
+    with _sync_lock:
+        if host not in _sync_host_limits:
+            _sync_host_limits[host] = threading.BoundedSemaphore(PER_HOST_LIMIT)
+        return _sync_host_limits[host]
+
+
+def _async_state() -> Tuple[httpx.AsyncClient, Dict[str, asyncio.Semaphore]]:
+    loop = asyncio.get_running_loop()
+    state = _async_clients.get(loop)
+    if state is None or state[0].is_closed:
+        state = (httpx.AsyncClient(http2=HTTP2_AVAILABLE, timeout=DEFAULT_TIMEOUT, limits=DEFAULT_LIMITS, follow_redirects=True), {})
+        _async_clients[loop] = state
+    return state
+
+
+def get_async_client() -> httpx.AsyncClient:
+    return _async_state()[0]
+
+
+def get(url: str, params: Optional[Dict[str, Any]] = None, timeout: Any = httpx.USE_CLIENT_DEFAULT,
+        tries: int = RETRY_TRIES, backoff: float = RETRY_BACKOFF) -> httpx.Response:
+    """
+    Blocking GET through the shared pool. Transport errors and `RETRY_STATUS` responses are
+    retried; the last response is returned as is, so callers decide whether to `raise_for_status()`.
+    """
+    client = get_client()
+    host_limit = _sync_host_limit(_host(url))
+
+    for i in range(tries):
+        try:
+            with host_limit:
+                resp = client.get(url, params=params, timeout=timeout)
+            if resp.status_code not in RETRY_STATUS or i == tries - 1:
+                return resp
+        except httpx.TransportError:
+            if i == tries - 1:
+                raise
+        time.sleep(backoff * (2 ** i))
+
+
+async def aget(url: str, params: Optional[Dict[str, Any]] = None, timeout: Any = httpx.USE_CLIENT_DEFAULT,
+               tries: int = RETRY_TRIES, backoff: float = RETRY_BACKOFF) -> httpx.Response:
+    """Async counterpart of `get()`, using the pool of the running event loop."""
+    client, host_limits = _async_state()
+    host = _host(url)
+    if host not in host_limits:
+        host_limits[host] = asyncio.Semaphore(PER_HOST_LIMIT)
+    host_limit = host_limits[host]
+
+    for i in range(tries):
+        try:
+            async with host_limit:
+                resp = await client.get(url, params=params, timeout=timeout)
+            if resp.status_code not in RETRY_STATUS or i == tries - 1:
+                return resp
+        except httpx.TransportError:
+            if i == tries - 1:
+                raise
+        await asyncio.sleep(backoff * (2 ** i))
+
+
+async def aclose():
+    """Close the pool of the running event loop and the blocking pool (application shutdown)."""
+    global _sync_client
+    state = _async_clients.pop(asyncio.get_running_loop(), None)
+    if state is not None:
+        await state[0].aclose()
+
+    with _sync_lock:
+        client, _sync_client = _sync_client, None
+    if client is not None:
+        client.close()
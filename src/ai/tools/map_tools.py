@@ -1,4 +1,4 @@
-import requests
+from src.ai.tools import http_client
 from langchain_core.tools import tool, BaseTool
 from typing import List, Literal, Type, Dict
 import time
@@ -41,7 +41,7 @@ class GoogleGeocodingTool(BaseTool):
             
             try:
                 print(f"---Geocoding: {place}---")
-                response = requests.get(url, params=params, timeout=GOOGLE_MAPS_TIMEOUT)
+                response = http_client.get(url, params=params, timeout=GOOGLE_MAPS_TIMEOUT)
                 response.raise_for_status()
                 
                 data = response.json()
@@ -13,6 +13,7 @@ import anyio
 import src.backend.db.mongodb as mongodb
 from src.backend.models.app_io_schemas import Registration
 from src.backend.utils.api_utils import generate_otp, redis_manager
+from src.backend.core.principal_cache import principal_cache
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 router = APIRouter()
@@ -130,6 +131,7 @@ async def reset_password(data: ResetPasswordRequest):
     # Update password in database
     user.password = pwd_context.hash(data.new_password.encode('utf-8'))
     await user.save()
+    await principal_cache.invalidate(user.id)
     
     # Clean up the token after successful password reset
     await redis_manager.safe_execute("delete",key)
@@ -9,10 +9,11 @@ import base64
 import tempfile
 
 from src.ai.chart_bot.generate_related_qn import chart_bot_related_query
-from src.ai.stock_prediction.stock_prediction_functions import get_sentiment_rating, get_stock_history, sarimax_predict
+from src.ai.stock_prediction.stock_prediction_functions import get_sentiment_rating, get_stock_history
+from src.ai.stock_prediction.forecast_service import forecast_service
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-from fastapi import APIRouter, Request, HTTPException, Query,status, BackgroundTasks, File, UploadFile
+from fastapi import APIRouter, Request, HTTPException, Query, Header, status, BackgroundTasks, File, UploadFile
 from fastapi.responses import StreamingResponse,JSONResponse, StreamingResponse
 from typing import Optional, Dict, Any, AsyncGenerator
 from src.ai.ai_schemas.tool_structured_input import TickerSchema
@@ -21,7 +22,7 @@ import src.backend.db.mongodb as mongodb
 from src.backend.utils.agent_comm import process_agent_input_functional
 from src.ai.agents.fast_agent import process_fast_agent_input
 from src.ai.agents.summarizer import stream_summary
-from src.backend.models.app_io_schemas import StockPredictionRequest, StockDataRequest, ResponseFeedback, ExportResponse, UpdateSessionAccess,UpdateMessageAccess
+from src.backend.models.app_io_schemas import StockPredictionRequest, StockPredictionBatchRequest, StockDataRequest, ResponseFeedback, ExportResponse, UpdateSessionAccess,UpdateMessageAccess
 # from src.backend.utils.api_utils import notify_slack_error, redis_manager
 from src.backend.utils.export_utils import markdown_to_pdf, markdown_to_docx, slugify
 import src.backend.utils as utils
@@ -29,7 +30,12 @@ import src.backend.db.filestorage as filestorage
 from src.backend.db.mongodb import RelatedQueriesResponse,UploadResponse, MessageLog,StockDataRequest, QueryRequestModel
 from src.backend.core.api_limit import apiSecurityFree
 from src.ai.stock_prediction.stock_prediction import StockAnalysisAgent
-from src.backend.utils.api_utils import redis_manager
+from src.backend.utils.stop_signals import stop_signals
+from src.backend.utils.sse_streams import sse_streams
+from src.backend.utils.stream_coalescer import StreamCoalescer
+from src.backend.utils.trace_recorder import TraceRecorder
+from src.backend.utils.response_cache import response_cache
+from src.backend.db.message_checkpoint import MessageCheckpointer
 from src.backend.db.mongodb import handle_partial_data_storage
 from src.backend.utils.utils import render_charts_as_images
 
@@ -41,12 +47,13 @@ async def ping():
     return {"ok": True}
 
 @router.get("/sessions")
-async def list_sessions2(user : apiSecurityFree, page: int = 1, limit: int = 25) -> Dict[str, Any]:
+async def list_sessions2(user : apiSecurityFree, page: int = 1, limit: int = 25, cursor: Optional[str] = None) -> Dict[str, Any]:
     """
     Fetch all sessions of a user, ordered by timestamp.
+    Pass the `next_cursor` of the previous response as `cursor` to load the next page.
     """
     
-    sessions = await mongodb.get_sessions_by_user2(user.id.__str__(), page, limit)
+    sessions = await mongodb.get_sessions_by_user2(user.id.__str__(), page, limit, cursor)
     if not sessions:
         raise HTTPException(status_code=404, detail="No sessions found for this user.")
     return sessions
@@ -56,15 +63,17 @@ async def search_sessions_by_title_pagination(
     user: apiSecurityFree,
     keyword: str = None,
     page: int = 1,
-    limit: int = 10
+    limit: int = 10,
+    cursor: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Return paginated sessions whose title contains the keyword, grouped by timeline.
+    Pass the `next_cursor` of the previous response as `cursor` to load the next page.
     """
     
     if(keyword == "" or keyword == None or keyword == " "):
-        return await mongodb.get_sessions_by_user2(user.id.__str__(), page, limit)
-    result = await mongodb.get_sessions_by_user_and_keyword_pagination(user.id.__str__(), keyword, page, limit)
+        return await mongodb.get_sessions_by_user2(user.id.__str__(), page, limit, cursor)
+    result = await mongodb.get_sessions_by_user_and_keyword_pagination(user.id.__str__(), keyword, page, limit, cursor)
     return result
 
 @router.put("/sessions/rename")
@@ -156,6 +165,9 @@ async def query_and_stream(user: apiSecurityFree, query: QueryRequestModel, requ
     
     if not session_id:
         session_id = str(uuid.uuid4())
+    else:
+        # A retry reuses the message id: a stop of its previous run must not end this one
+        await stop_signals.reset(session_id, message_id)
 
     async def event_generator() -> AsyncGenerator[str, None]:
         nonlocal session_id, message_id
@@ -167,14 +179,16 @@ async def query_and_stream(user: apiSecurityFree, query: QueryRequestModel, requ
         }
         yield f"event: session_info\ndata: {json.dumps(session_info_event_data)}\n\n"
 
-        token_buffer = []
+        coalescer = StreamCoalescer(message_id)
         stock_graph = set()
         user_data = await mongodb.fetch_user_by_id(user_id)
         user_name = user_data.full_name if user_data and user_data.full_name else "user"
         error_flag = False
-        message_log = ""
+        trace = TraceRecorder(session_id, message_id, enabled=query.trace)
+        checkpointer = MessageCheckpointer(session_id, message_id)
         current_messages_log = []
         processor_iterator = None
+        stop_waiter = None
         time_taken = 0
 
 
@@ -187,7 +201,7 @@ async def query_and_stream(user: apiSecurityFree, query: QueryRequestModel, requ
         try:
             if search_mode == 'summarizer':
                 async for event in stream_summary(user_id, session_id, message_id, prev_message_id, user_query, local_time, timezone, is_elaborate, is_example):
-                    yield event.encode('utf-8')
+                    yield event if isinstance(event, bytes) else event.encode('utf-8')
                 return
                 
             else:
@@ -219,28 +233,35 @@ async def query_and_stream(user: apiSecurityFree, query: QueryRequestModel, requ
                         ip_address = ip_address,
                         doc_ids = doc_ids,
                     )
+
+                # Repeated questions are answered from the response cache without running the agents
+                cache_key = await response_cache.key_for(user_id, session_id, prev_message_id, user_query, search_mode, realtime_info, timezone, retry_response, doc_ids)
+                processor_iterator = response_cache.serve(processor_iterator, cache_key, user_id, session_id, message_id, user_query, search_mode, timezone)
                     
             TIMEOUT_PERIOD = 300
             KEEP_ALIVE_INTERVAL = 5
             KEEP_ALIVE_COUNT = 0
             MAX_KEEP_ALIVE_COUNT = 60
-            batched_event_count = 0
-            await mongodb.append_data(user_id, session_id, message_id, current_messages_log, local_time, timezone)
+            LONG_ANSWER_TOKENS = 300 * 15  # answers longer than this are not offered for elaboration
+            await checkpointer.start(user_id, local_time, timezone)
+            # Stop requests are pushed to this event by the worker's pub/sub listener
+            stop_event = await stop_signals.subscribe(session_id, message_id)
+            stop_waiter = asyncio.create_task(stop_event.wait())
             while True:
-                stop_key = f"stop:{session_id}"
-                stop_signal = await redis_manager.safe_execute("get", stop_key)
-                if stop_signal:
-                    # Handle both string and bytes responses from Redis
-                    stop_signal_str = stop_signal.decode('utf-8') if isinstance(stop_signal, bytes) else str(stop_signal)
-                    if stop_signal_str == message_id:
-                        # Clear the stop signal
-                        await redis_manager.safe_execute("delete", stop_key)
-                        raise asyncio.CancelledError("User requested stop")
+                if stop_event.is_set():
+                    await stop_signals.clear(session_id)
+                    raise asyncio.CancelledError("User requested stop")
                 try:
                     processor_task = asyncio.create_task(anext(processor_iterator))
                     try:
                         while True:
-                            done, _ = await asyncio.wait({processor_task}, timeout=KEEP_ALIVE_INTERVAL)
+                            flush_in = coalescer.flush_in()
+                            wait_timeout = KEEP_ALIVE_INTERVAL if flush_in is None else flush_in
+                            done, _ = await asyncio.wait({processor_task, stop_waiter}, timeout=wait_timeout, return_when=asyncio.FIRST_COMPLETED)
+                            if stop_waiter in done:
+                                processor_task.cancel()
+                                await stop_signals.clear(session_id)
+                                raise asyncio.CancelledError("User requested stop")
                             if processor_task in done:
                                 try:
                                     data_from_processor = processor_task.result()
@@ -260,6 +281,10 @@ async def query_and_stream(user: apiSecurityFree, query: QueryRequestModel, requ
                                     continue    
                                 break
 
+                            elif flush_in is not None:
+                                # Buffered tokens are due; send them without waiting for the next one
+                                yield coalescer.flush()
+
                             else:
                                 KEEP_ALIVE_COUNT += 1
                                 if KEEP_ALIVE_COUNT >= MAX_KEEP_ALIVE_COUNT:
@@ -270,16 +295,7 @@ async def query_and_stream(user: apiSecurityFree, query: QueryRequestModel, requ
                                         pass
                                     raise RuntimeError(f"No update from processor for {TIMEOUT_PERIOD} seconds. Stream aborted.")
                                 yield f"data: {json.dumps({'type': 'Keep-alive', 'alive-counter': KEEP_ALIVE_COUNT})}\n\n".encode('utf-8')
-                                
-                                # Check for stop signal during keep-alive
-                                stop_signal = await redis_manager.safe_execute("get", stop_key)
-                                if stop_signal:
-                                    # Handle both string and bytes responses from Redis
-                                    stop_signal_str = stop_signal.decode('utf-8') if isinstance(stop_signal, bytes) else str(stop_signal)
-                                    if stop_signal_str == message_id:
-                                        processor_task.cancel()
-                                        await redis_manager.safe_execute("delete", stop_key)
-                                        raise asyncio.CancelledError("User requested stop")
+                                checkpointer.maybe_flush()
 
                     # except StopAsyncIteration:
                     #     stream_completed = True
@@ -308,49 +324,14 @@ async def query_and_stream(user: apiSecurityFree, query: QueryRequestModel, requ
                                 'type': data_to_send['type'],
                                 'timestamp': time.time()
                             })
-                        # agent_changed = (token_buffer and (data_to_send.get('agent_name', '') != token_buffer[0].get('agent_name', '') or data_to_send.get('id', '') != token_buffer[0].get('id', '')))
-
-                        if token_buffer and (len(token_buffer) >= 15 or data_to_send.get('agent_name') != token_buffer[0].get('agent_name')):
-                            batched_event_type = token_buffer[0].get('type', 'unknown_chunk_type')
-                            
-                            batched_event = {
-                                "type": batched_event_type, 
-                                "agent_name": token_buffer[0].get('agent_name', ''), 
-                                "message_id": message_id, 
-                                "id": token_buffer[0].get('id','')
-                            }
-
-                            if any('content' in t for t in token_buffer):
-                                batched_event["content"] = "".join([t.get('content','') for t in token_buffer if 'content' in t])
-
-                            if any('title' in t for t in token_buffer):
-                                batched_event["title"] = "".join([t.get('title','') for t in token_buffer if 'title' in t])
-
-                            yield f"data: {json.dumps(batched_event)}\n\n".encode('utf-8')
-                            batched_event_count += 1
-                            token_buffer = []
-
-                        token_buffer.append(data_to_send)
+                            checkpointer.add_chunk(data_to_send)
+                        for frame in coalescer.add(data_to_send):
+                            yield frame
 
                     else:
-                        if token_buffer:
-                            batched_event_type = token_buffer[0].get('type', 'unknown_chunk_type')
-                            
-                            batched_event = {
-                                "type": batched_event_type, 
-                                "agent_name": token_buffer[0].get('agent_name', ''), 
-                                "message_id": message_id, 
-                                "id": token_buffer[0].get('id','')
-                            }
-
-                            if any('content' in t for t in token_buffer):
-                                batched_event["content"] = "".join([t.get('content','') for t in token_buffer if 'content' in t])
-
-                            if any('title' in t for t in token_buffer):
-                                batched_event["title"] = "".join([t.get('title','') for t in token_buffer if 'title' in t])
-
-                            yield f"data: {json.dumps(batched_event)}\n\n".encode('utf-8')
-                            token_buffer = []
+                        frame = coalescer.flush()
+                        if frame:
+                            yield frame
 
                         if 'type' in data_to_send:
                             if data_to_send['type'] == 'stock_data':
@@ -368,10 +349,11 @@ async def query_and_stream(user: apiSecurityFree, query: QueryRequestModel, requ
                             else:
                                 data_to_send['message_id'] = message_id
                                 yield f"data: {json.dumps(data_to_send)}\n\n".encode('utf-8')
-                        elif 'message_logs' in data_to_send:
-                            message_log += data_to_send['message_logs']
+                        elif 'trace' in data_to_send:
+                            trace.record(*data_to_send['trace'])
                         elif 'enriched_content' in data_to_send:
                             current_messages_log.append(data_to_send['enriched_content'])
+                            checkpointer.add_entry(data_to_send['enriched_content'])
 
                         elif 'time' in data_to_send:
                             time_taken = data_to_send.get('in_seconds', 0)
@@ -427,16 +409,13 @@ async def query_and_stream(user: apiSecurityFree, query: QueryRequestModel, requ
                                     progress_payload = {"type": "progress", "progress_bar": 100.0}
                                     yield f"data: {json.dumps(progress_payload)}\n\n".encode('utf-8')
                                 
-                                if batched_event_count > 300:
+                                if coalescer.token_count > LONG_ANSWER_TOKENS:
                                     complete_payload['is_elaborate'] = False
                                 else:
                                     complete_payload['is_elaborate'] = True                             
                                     
                                 yield f"data: {json.dumps(complete_payload)}\n\n".encode('utf-8')
 
-                            if message_log:
-                                bgt.add_task(mongodb.append_graph_log_to_mongo, session_id, message_id, message_log)
-
                             break
 
                         elif 'logs' in data_to_send:
@@ -456,7 +435,7 @@ async def query_and_stream(user: apiSecurityFree, query: QueryRequestModel, requ
                                     progress_payload = {"type": "progress", "progress_bar": 100.0}
                                     yield f"data: {json.dumps(progress_payload)}\n\n".encode('utf-8')
 
-                                if batched_event_count > 300:
+                                if coalescer.token_count > LONG_ANSWER_TOKENS:
                                     complete_payload['is_elaborate'] = False
                                 else:
                                     complete_payload['is_elaborate'] = True        
@@ -464,7 +443,6 @@ async def query_and_stream(user: apiSecurityFree, query: QueryRequestModel, requ
                                 # yield f"data: {json.dumps({'type': 'complete', 'message_id': message_id, 'notification': False, 'suggestions': False})}\n\n".encode('utf-8')
                                 yield f"data: {json.dumps(complete_payload)}\n\n".encode('utf-8')
 
-                            bgt.add_task(mongodb.append_graph_log_to_mongo, session_id, message_id, message_log)
                             break
                 except Exception as e:
                     traceback.print_exc()
@@ -483,7 +461,6 @@ async def query_and_stream(user: apiSecurityFree, query: QueryRequestModel, requ
                 partial_sources=partial_sources,
                 partial_related_queries=partial_related_queries,
                 partial_metadata=partial_metadata,
-                message_log=message_log,
                 local_time=local_time,
                 timezone=timezone,
                 time_taken=time_taken,
@@ -499,11 +476,45 @@ async def query_and_stream(user: apiSecurityFree, query: QueryRequestModel, requ
             #     await notify_slack_error(user_name or user_id, str(error_payload))
 
             yield f"data: {json.dumps(error_payload)}\n\n".encode('utf-8')
+        finally:
+            if stop_waiter is not None:
+                stop_waiter.cancel()
+            stop_signals.unsubscribe(session_id, message_id)
+            trace.finish()
+            await checkpointer.close()
+
+    # Generation is decoupled from this connection: every frame is appended to the message's
+    # Redis Stream, and `bgt` runs when the answer is done rather than when the client leaves
+    # (the empty BackgroundTasks keeps FastAPI from attaching `bgt` to the response as well).
+    return StreamingResponse(
+        sse_streams.run(user_id, message_id, event_generator(), on_complete=bgt),
+        media_type="text/event-stream",
+        background=BackgroundTasks(),
+        headers={
+            'Cache-Control': 'no-cache',
+            'Connection': 'keep-alive',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@router.get("/query-stream/resume")
+async def resume_query_stream(
+    user: apiSecurityFree,
+    message_id: str = Query(...),
+    last_event_id: Optional[str] = Query(None),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """
+    Replay the stream of an answer from the event after `Last-Event-ID` (header, or the
+    `last_event_id` query parameter) and keep following it until the answer is complete.
+    """
+    owner = await sse_streams.owner(message_id)
+    if owner is None or owner != user.id.__str__():
+        raise HTTPException(status_code=404, detail="Stream not found or expired.")
 
     return StreamingResponse(
-        event_generator(),
+        sse_streams.replay(message_id, last_event_id or last_event_id_header),
         media_type="text/event-stream",
-        background=bgt,
         headers={
             'Cache-Control': 'no-cache',
             'Connection': 'keep-alive',
@@ -516,8 +527,7 @@ async def stop_response_generation(user: apiSecurityFree, session_id: str = Quer
     session_log = await mongodb.get_session_log_by_user_and_session_id(user.id.__str__(), session_id)
     if not session_log:
         raise HTTPException(status_code=404, detail="Session not found or access denied.")
-    key = f"stop:{session_id}"
-    await redis_manager.safe_execute("set", key, message_id, 3)
+    await stop_signals.request_stop(session_id, message_id)
 
 @router.post("/stock_data")
 async def stock_data_endpoint(user: apiSecurityFree, payload: StockDataRequest):
@@ -757,72 +767,108 @@ async def get_map_data(user: apiSecurityFree, message_id: str):
         raise HTTPException(status_code=500, detail=f"Error fetching public session messages: {str(e)}")
 
 
-@router.post("/stock-predict")
-async def predict_stock(user: apiSecurityFree, request: StockPredictionRequest):
-    """Predict stock prices for a given company using LangGraph agent."""
-    
+def _predicted_points(adjusted_mean_series, adjusted_ci_df, company_name: str) -> list:
+    predicted_data = []
+    for date, predicted_price in adjusted_mean_series.items():
+        ci = adjusted_ci_df.loc[date]
+        formatted_date = date.strftime('%b %d, %Y')
+        predicted_data.append({
+            "date": formatted_date,
+            "high": round(ci['upper'], 2),
+            "low": round(ci['lower'], 2),
+            "close": round(predicted_price, 2),
+            "type": "predicted",
+            "ticker": company_name
+        })
+    return predicted_data
+
+
+async def _load_history(ticker: str, company_name: str, exchange_symbol: str) -> Optional[Dict[str, Any]]:
+    """Sentiment rating and price history of a ticker, fetched side by side."""
+    (rating, reason), history_data = await asyncio.gather(
+        asyncio.to_thread(get_sentiment_rating, company_name, exchange_symbol),
+        asyncio.to_thread(get_stock_history, ticker, None, None),
+    )
+    if history_data is not None:
+        # The history only carries the rating along, so it is attached once both are in
+        history_data.update(current_rating=rating, reason=reason)
+    return history_data
+
+
+async def _predict_points(ticker: str, company_name: str, exchange_symbol: str) -> list:
+    """Forecast points; the fit starts on the history alone while the sentiment rating is fetched."""
+
+    async def sentiment_rating() -> float:
+        rating, _ = await asyncio.to_thread(get_sentiment_rating, company_name, exchange_symbol)
+        return rating
+
+    rating = asyncio.ensure_future(sentiment_rating())
+    try:
+        history_data = await asyncio.to_thread(get_stock_history, ticker, None, None)
+        adjusted_mean_series, adjusted_ci_df = await forecast_service.forecast(history_data, exchange_symbol, 5, rating=rating)
+    finally:
+        rating.cancel()
+    return _predicted_points(adjusted_mean_series, adjusted_ci_df, company_name)
+
+
+async def _recent_points(ticker: str, company_name: str, exchange_symbol: str, period: str) -> list:
+    """The last 14 days of the ticker's chart data."""
+    historical_data = []
+    fourteen_days_ago = datetime.now() - timedelta(days=14)
+    ticker_data = TickerSchema(ticker=ticker, exchange_symbol=exchange_symbol)
+    period = period.lower()
+    if period.endswith('m'):
+        period = period+"o"
+    result_json = await asyncio.to_thread(
+        get_stock_data._run,
+        ticker_data=[ticker_data],
+        period=period
+    )
+    response_data = result_json[0]
+    for data_point in response_data['historical']['data']:
+        date_str = data_point.get("date")
+        if date_str:
+            try:
+                data_date = datetime.strptime(date_str, "%b %d, %Y")
+                if data_date >= fourteen_days_ago:
+                    historical_data.append({
+                        "date": data_point.get("date"),
+                        "high": float(data_point.get("high", 0).replace(",", "")),
+                        "low": float(data_point.get("low", 0).replace(",", "")),
+                        "open": float(data_point.get("open", 0).replace(",", "")),
+                        "close": float(data_point.get("close", 0).replace(",", "")),
+                        "type": "historical",
+                        "ticker": company_name
+                    })
+            except ValueError:
+                continue
+    return historical_data
+
+
+def _check_prediction_request(request: StockPredictionRequest):
     if not request.ticker or not request.company_name:
         raise HTTPException(status_code=400, detail="Company name cannot be empty")
-    
-    company_name = request.company_name
-    ticker = request.ticker
-    exchange_symbol = request.exchange_symbol
     if stock_agent is None:
         raise HTTPException(status_code=503, detail="Stock Analysis Agent not initialized")
-    
-    try:
 
-        rating, reason = await asyncio.to_thread(get_sentiment_rating, company_name, exchange_symbol)
 
-        history_data = await asyncio.to_thread(get_stock_history, ticker, rating, reason)
-
-        adjusted_mean_series, adjusted_ci_df = await asyncio.to_thread(
-            sarimax_predict, history_data, exchange_symbol, 5
-        )
+@router.post("/stock-predict")
+async def predict_stock(user: apiSecurityFree, request: StockPredictionRequest):
+    """
+    Predict stock prices for a given company. The recent chart data, the sentiment rating and
+    the price history are fetched concurrently; the forecast is fitted as soon as the history is
+    in and adjusted by the rating once both are done.
+    """
+    _check_prediction_request(request)
+    company_name = request.company_name
+    ticker = request.ticker
+    exchange_symbol = request.exchange_symbol
 
-        historical_data = []
-        current_date = datetime.now()
-        fourteen_days_ago = current_date - timedelta(days=14)
-        ticker_data = TickerSchema(ticker=ticker, exchange_symbol=request.exchange_symbol)
-        period = request.period.lower()
-        if period.endswith('m'):
-            period = period+"o"
-        result_json = await asyncio.to_thread(
-            get_stock_data._run,
-            ticker_data=[ticker_data],
-            period=period
+    try:
+        historical_data, predicted_data = await asyncio.gather(
+            _recent_points(ticker, company_name, exchange_symbol, request.period),
+            _predict_points(ticker, company_name, exchange_symbol),
         )
-        response_data = result_json[0]
-        for data_point in response_data['historical']['data']:
-            date_str = data_point.get("date")
-            if date_str:
-                try:
-                    data_date = datetime.strptime(date_str, "%b %d, %Y")
-                    if data_date >= fourteen_days_ago:
-                        historical_data.append({
-                            "date": data_point.get("date"),
-                            "high": float(data_point.get("high", 0).replace(",", "")),
-                            "low": float(data_point.get("low", 0).replace(",", "")),
-                            "open": float(data_point.get("open", 0).replace(",", "")),
-                            "close": float(data_point.get("close", 0).replace(",", "")),
-                            "type": "historical",
-                            "ticker": company_name
-                        })
-                except ValueError:
-                    continue
-
-        predicted_data = []
-        for date, predicted_price in adjusted_mean_series.items():
-            ci = adjusted_ci_df.loc[date]
-            formatted_date = date.strftime('%b %d, %Y')
-            predicted_data.append({
-                "date": formatted_date,
-                "high": round(ci['upper'], 2),
-                "low": round(ci['lower'], 2),
-                "close": round(predicted_price, 2),
-                "type": "predicted",
-                "ticker": company_name
-            })
 
         combined_data = historical_data + predicted_data
         print("Combined Data Length:", combined_data)
@@ -832,6 +878,64 @@ async def predict_stock(user: apiSecurityFree, request: StockPredictionRequest):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+@router.post("/stock-predict/stream")
+async def predict_stock_stream(user: apiSecurityFree, request: StockPredictionRequest):
+    """
+    `/stock-predict` as server-sent events: a `historical` and a `predicted` event, each sent as
+    soon as its points are ready (or an `error` event for that part), then `complete`.
+    """
+    _check_prediction_request(request)
+    company_name = request.company_name
+    ticker = request.ticker
+    exchange_symbol = request.exchange_symbol
+
+    async def event_generator() -> AsyncGenerator[str, None]:
+        stages = {
+            asyncio.ensure_future(_recent_points(ticker, company_name, exchange_symbol, request.period)): "historical",
+            asyncio.ensure_future(_predict_points(ticker, company_name, exchange_symbol)): "predicted",
+        }
+        pending = set(stages)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        payload = {"type": stages[task], "data": task.result()}
+                    except Exception as e:
+                        payload = {"type": "error", "stage": stages[task], "content": f"Internal server error: {str(e)}"}
+                    yield f"data: {json.dumps(payload)}\n\n"
+            yield f"data: {json.dumps({'type': 'complete'})}\n\n"
+        finally:
+            # The client went away: stop whatever is still running
+            for task in pending:
+                task.cancel()
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
+@router.post("/stock-predict/batch")
+async def predict_stocks(user: apiSecurityFree, request: StockPredictionBatchRequest):
+    """Forecast the next 5 bars of several tickers in one call; each item fails on its own."""
+
+    histories = await asyncio.gather(
+        *(_load_history(item.ticker, item.company_name, item.exchange_symbol) for item in request.items), return_exceptions=True
+    )
+    forecasts = await forecast_service.forecast_many(
+        [(None if isinstance(history, Exception) else history, item.exchange_symbol) for item, history in zip(request.items, histories)], 5
+    )
+
+    predictions = []
+    for item, history, forecast in zip(request.items, histories, forecasts):
+        prediction = {"ticker": item.ticker, "company_name": item.company_name}
+        error = history if isinstance(history, Exception) else forecast if isinstance(forecast, Exception) else None
+        if error is not None:
+            prediction["error"] = str(error)
+        else:
+            prediction["predicted"] = _predicted_points(*forecast, item.company_name)
+        predictions.append(prediction)
+    return {"predictions": predictions}
+
+
 @router.post("/time-taken2")
 async def check_time_taken_endpoint(user: apiSecurityFree, session_id: Optional[str] = None, message_id: Optional[str]= None):
     # check_user = await MessageOutput.find_one(
@@ -5,6 +5,7 @@ from fastapi import APIRouter, Depends
 from fastapi.security import OAuth2PasswordBearer
 from src.backend.db import mongodb
 from src.backend.core.api_limit import apiSecurityFree
+from src.backend.core.principal_cache import principal_cache
 from src.backend.models.app_io_schemas import Onboarding, OnboardingRequest
 from src.backend.utils.preference_detector import detect_response_preference
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
@@ -13,12 +14,11 @@ router = APIRouter()
 
 @router.patch("/user")
 async def update_user(user: apiSecurityFree, request: mongodb.UpdateUserRequest):
-
-    for key,value in request.model_dump().items() :
-        if value :
-            user._set_attr(key,value)
-        
-    await user.save()
+    # The principal is a cached copy without the password hash, so only the changed fields are written
+    changes = {key: value for key, value in request.model_dump().items() if value}
+    if changes:
+        await user.set(changes)
+        await principal_cache.invalidate(user.id)
     return user
 
 
@@ -3,9 +3,14 @@ from fastapi import FastAPI, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, HTMLResponse
 from src.backend.utils.api_utils import redis_manager
+from src.backend.utils.stop_signals import stop_signals
+from src.backend.utils.trace_recorder import trace_writer
 from src.ai.stock_prediction.stock_prediction import StockAnalysisAgent
+from src.ai.stock_prediction.forecast_service import forecast_service
 from contextlib import asynccontextmanager
 from src.backend.db import mongodb
+from src.ai.tools import http_client
+from src.backend.db.market_data import market_data_cache
 from src.backend.api.auth import router as auth_router
 from src.backend.api.session import router as session_router
 from src.backend.api.user import router as user_router
@@ -19,7 +24,13 @@ stock_agent = StockAnalysisAgent()
 async def on_startup(app: FastAPI):
     await mongodb.init_db()
     await redis_manager.connect()
+    await stop_signals.start()
     yield
+    await stop_signals.stop()
+    await trace_writer.close()
+    await http_client.aclose()
+    market_data_cache.close()
+    forecast_service.shutdown()
 
 app = FastAPI(title="Finance Insight Agent API", lifespan=on_startup)
 
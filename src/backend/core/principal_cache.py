@@ -0,0 +1,116 @@
+"""
+Cache of the users behind authenticated requests.
+
+`GetCurrentUser` resolves the bearer token of every API call to its `Users` document. The JWT is
+still verified on each call, but the user record comes from `principal_cache`: a short-TTL
+in-process LRU in front of an optional Redis tier shared by the workers, both keyed by user id.
+Writes to a user invalidate both tiers; the in-process entries of other workers expire within
+PRINCIPAL_CACHE_TTL seconds.
+
+Each request gets its own `Users` instance, so a route that changes its user never changes the
+cached copy. The password hash is never cached.
+"""
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from src.backend.models.model import Users
+from src.backend.utils.api_utils import RedisManager, redis_manager
+
+logger = logging.getLogger("uvicorn")
+
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+PRINCIPAL_CACHE_REDIS_TTL = int(os.getenv("PRINCIPAL_CACHE_REDIS_TTL", "300"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "4096"))
+PRINCIPAL_CACHE_REDIS = os.getenv("PRINCIPAL_CACHE_REDIS", "true").lower() == "true"
+CACHE_KEY_PREFIX = "principal:"
+UNCACHED_FIELDS = {"password"}
+
+UserLoader = Callable[[str], Awaitable[Optional[Users]]]
+
+
+class PrincipalCache:
+    def __init__(
+        self,
+        manager: Optional[RedisManager],
+        ttl: float = PRINCIPAL_CACHE_TTL,
+        redis_ttl: int = PRINCIPAL_CACHE_REDIS_TTL,
+        max_entries: int = PRINCIPAL_CACHE_SIZE,
+        use_redis: bool = PRINCIPAL_CACHE_REDIS,
+    ):
+        self.manager = manager
+        self.ttl = ttl
+        self.redis_ttl = redis_ttl
+        self.max_entries = max_entries
+        self.use_redis = use_redis and manager is not None
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"{CACHE_KEY_PREFIX}{user_id}"
+
+    def _get_local(self, user_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return data
+
+    def _put_local(self, user_id: str, data: Dict[str, Any]):
+        self._entries[user_id] = (time.monotonic() + self.ttl, data)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _get_shared(self, user_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            raw = await self.manager.safe_execute("get", self._key(user_id))
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            logger.warning(f"Principal cache read failed for user {user_id}: {e}")
+            return None
+
+    async def _put_shared(self, user_id: str, data: Dict[str, Any]):
+        try:
+            await self.manager.safe_execute("set", self._key(user_id), json.dumps(data), ex=self.redis_ttl)
+        except Exception as e:
+            logger.warning(f"Principal cache write failed for user {user_id}: {e}")
+
+    async def get(self, user_id: str, loader: UserLoader) -> Optional[Users]:
+        """The user with `user_id`, loaded with `loader` on a miss; unknown users are not cached."""
+        user_id = str(user_id)
+        data = self._get_local(user_id)
+        if data is None and self.use_redis:
+            data = await self._get_shared(user_id)
+            if data is not None:
+                self._put_local(user_id, data)
+        if data is None:
+            user = await loader(user_id)
+            if user is None:
+                return None
+            data = user.model_dump(mode="json", exclude=UNCACHED_FIELDS)
+            self._put_local(user_id, data)
+            if self.use_redis:
+                await self._put_shared(user_id, data)
+        return Users.model_validate(data)
+
+    async def invalidate(self, user_id: str):
+        user_id = str(user_id)
+        self._entries.pop(user_id, None)
+        if self.use_redis:
+            try:
+                await self.manager.safe_execute("delete", self._key(user_id))
+            except Exception as e:
+                logger.warning(f"Principal cache invalidation failed for user {user_id}: {e}")
+
+    def clear(self):
+        self._entries.clear()
+
+
+principal_cache = PrincipalCache(redis_manager)
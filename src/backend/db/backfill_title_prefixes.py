@@ -0,0 +1,53 @@
+"""
+Fills `SessionLog.title_prefixes` for sessions written before the title search index existed.
+New and renamed sessions maintain the field themselves; the backfill is idempotent.
+
+Run from the repository root:
+    python -m src.backend.db.backfill_title_prefixes [--dry-run] [--batch-size 500]
+"""
+import argparse
+import asyncio
+import os
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from src.backend.models.model import SessionLog, title_prefixes
+
+
+async def backfill(dry_run: bool = False, batch_size: int = 500) -> int:
+    collection = SessionLog.get_motor_collection()
+    cursor = collection.find({"title_prefixes": {"$exists": False}}, {"title": 1})
+    updated = 0
+    operations = []
+
+    async for session in cursor:
+        operations.append(UpdateOne({"_id": session["_id"]}, {"$set": {"title_prefixes": title_prefixes(session.get("title") or "")}}))
+        if len(operations) >= batch_size:
+            if not dry_run:
+                await collection.bulk_write(operations, ordered=False)
+            updated += len(operations)
+            operations = []
+
+    if operations:
+        if not dry_run:
+            await collection.bulk_write(operations, ordered=False)
+        updated += len(operations)
+    return updated
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true", help="count the sessions to backfill without writing")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.getenv("MONGO_URI"))
+    await init_beanie(database=client["insight_agent"], document_models=[SessionLog])
+
+    updated = await backfill(dry_run=args.dry_run, batch_size=args.batch_size)
+    print(f"sessions: {updated}" + (" (dry run)" if args.dry_run else ""))
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,397 @@
+import asyncio
+import copy
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, IndexModel, ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from src.ai.tools import http_client
+from src.backend.utils.async_runner import AsyncRunner
+from src.backend.utils.api_utils import redis_manager
+from src.backend.utils.single_flight import RedisLock, SingleFlight
+from src.backend.db.ohlcv import OHLCVSeries
+from src.backend.db.query_plans import find_collscans
+from src.backend.models.model import CompanyProfile, FMPQueryResult, TickerPriceSeries, FinancialStatement
+
+logger = logging.getLogger("uvicorn")
+
+MONGO_URI = os.getenv("MONGO_URI")
+FMP_API_KEY = os.getenv("FM_API_KEY")
+FMP_SOURCE = "https://financialmodelingprep.com/"
+FMP_BASE_URL = "https://financialmodelingprep.com/stable"
+MARKET_DATA_DB = "insight_agent_fmp"
+LRU_SIZE = int(os.getenv("MARKET_DATA_LRU_SIZE", "1024"))
+QUOTE_TTL = float(os.getenv("MARKET_DATA_QUOTE_TTL", "5"))  # seconds a realtime quote is shared
+REDIS_LOCK_ENABLED = os.getenv("MARKET_DATA_REDIS_LOCK", "true").lower() == "true" and bool(os.getenv("REDIS_HOST"))
+REDIS_LOCK_TTL = int(os.getenv("MARKET_DATA_REDIS_LOCK_TTL", "30"))
+
+FMP_STATEMENT_ENDPOINTS = {
+    "balance_sheet": "balance-sheet-statement",
+    "cash_flow": "cash-flow-statement",
+    "income_statement": "income-statement"
+}
+HISTORICAL_PERIOD_DAYS = {"1M": 30, "3M": 90, "6M": 180, "1Y": 365, "5Y": 1825, "MAX": 7300}
+OHLCV_HISTORY_DAYS = HISTORICAL_PERIOD_DAYS["MAX"]  # depth of the first fetch of a ticker's series
+
+MARKET_DATA_INDEXES = {
+    model.Settings.name: model.Settings.indexes
+    for model in (CompanyProfile, FMPQueryResult, TickerPriceSeries, FinancialStatement)
+}
+MARKET_DATA_INDEXES["stock_price_changes"] = [IndexModel([("symbol", ASCENDING)], unique=True)]
+
+MARKET_DATA_QUERY_SHAPES = [
+    ("fmp_query_results", {"query": ""}),
+    ("company_profiles", {"symbol": ""}),
+    ("financial_statements", {"symbol": "", "statement_type": "", "period": ""}),
+    ("ohlcv_series", {"ticker": ""}),
+    ("stock_price_changes", {"symbol": ""}),
+]
+
+
+def _end_of_day(value: datetime) -> datetime:
+    return datetime.combine(value.date() + timedelta(days=1), datetime.min.time())
+
+
+def _thirty_days_after(value: datetime) -> datetime:
+    return value + timedelta(days=30)
+
+
+def period_start(period: str, today: date) -> date:
+    """First day of a `HISTORICAL_PERIOD_DAYS` period or "YTD" ending on `today`; 30 days for others."""
+    period = period.upper()
+    if period == "YTD":
+        return date(today.year, 1, 1)
+    return today - timedelta(days=HISTORICAL_PERIOD_DAYS.get(period, 30))
+
+
+class LRUCache:
+    """Thread-safe LRU of documents, each with its own expiry. Values are copied on the way out."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Tuple[datetime, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if datetime.now() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+
+    def put(self, key: Hashable, value: Any, expires_at: datetime):
+        with self._lock:
+            self._entries[key] = (expires_at, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class MarketDataCache:
+    """
+    Cache of FMP market data in front of the `insight_agent_fmp` database.
+
+    Lookups go through an in-process LRU first, then Mongo, then FMP. One Motor client is
+    kept for the lifetime of the process on a dedicated event loop, so the service can be
+    called from the agents' tool threads (`run()`) as well as from async code (`arun()`).
+    Refreshed documents are written with a single upsert on a unique key, so concurrent
+    refreshes of the same document cannot insert it twice.
+
+    Concurrent lookups of the same (provider, endpoint, symbol, period) share one in-flight
+    fetch, and a Redis lock lets a single worker refresh a document while the others wait and
+    read it from Mongo, so FMP calls grow with distinct symbols rather than with users.
+
+    Price history is kept as one columnar series per ticker (`ohlcv_series`): it is fetched once,
+    extended daily with the rows after its last date, and every period is a slice of it.
+    """
+
+    def __init__(self, mongo_uri: Optional[str] = MONGO_URI, lru_size: int = LRU_SIZE, use_redis_lock: bool = REDIS_LOCK_ENABLED):
+        self.mongo_uri = mongo_uri
+        self.lru = LRUCache(lru_size)
+        self.flights = SingleFlight()
+        self.locks = RedisLock(redis_manager.redis_config if use_redis_lock else None, ttl=REDIS_LOCK_TTL, prefix="lock:fmp:")
+        self._runner: Optional[AsyncRunner] = None
+        self._client: Optional[AsyncIOMotorClient] = None
+        self._lock = threading.Lock()
+
+    @property
+    def runner(self) -> AsyncRunner:
+        if self._runner is None:
+            with self._lock:
+                if self._runner is None:
+                    self._runner = AsyncRunner()
+        return self._runner
+
+    @property
+    def db(self):
+        # Only touched from coroutines running on `self.runner`, which owns the Motor client
+        if self._client is None:
+            self._client = AsyncIOMotorClient(self.mongo_uri)
+        return self._client[MARKET_DATA_DB]
+
+    def run(self, coro: Awaitable[Any]) -> Any:
+        """Run a service coroutine from synchronous code and wait for its result."""
+        return self.runner.run_coroutine(coro).result()
+
+    async def arun(self, coro: Awaitable[Any]) -> Any:
+        """Await a service coroutine from any event loop."""
+        return await asyncio.wrap_future(self.runner.run_coroutine(coro))
+
+    async def ensure_indexes(self):
+        for collection, indexes in MARKET_DATA_INDEXES.items():
+            try:
+                await self.db[collection].create_indexes(indexes)
+            except OperationFailure as e:
+                # Duplicates written before the keys were unique block the index until removed
+                logger.warning(f"Could not create the indexes of {collection}: {e}")
+
+    async def find_collscans(self) -> list:
+        return await find_collscans([(self.db[collection], query, None) for collection, query in MARKET_DATA_QUERY_SHAPES])
+
+    async def _fetch_json(self, url: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        response = await http_client.aget(url, params={**(params or {}), "apikey": FMP_API_KEY})
+        response.raise_for_status()
+        return response.json()
+
+    async def _get_or_refresh(
+        self,
+        collection: str,
+        key: Dict[str, Any],
+        timestamp_field: str,
+        fresh_until: Callable[[datetime], datetime],
+        fetch: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Exception]]:
+        """
+        Return the cached document for `key`, refreshing it through `fetch` (which returns the
+        fields to `$set`) when it is missing or stale. When the refresh fails, the stale
+        document (or None) is returned together with the error so callers keep their own
+        fallback behaviour.
+        """
+        lru_key = (collection,) + tuple(sorted(key.items()))
+        document = self.lru.get(lru_key)
+        if document is not None:
+            return document, None
+        return await self.flights.run(("fmp",) + lru_key, lambda: self._refresh(collection, key, lru_key, timestamp_field, fresh_until, fetch))
+
+    async def _find_fresh(self, collection: str, key: Dict[str, Any], lru_key: Tuple, timestamp_field: str, fresh_until: Callable[[datetime], datetime]) -> Tuple[Optional[Dict[str, Any]], bool]:
+        record = await self.db[collection].find_one(key)
+        if record and record.get(timestamp_field) and datetime.now() < fresh_until(record[timestamp_field]):
+            self.lru.put(lru_key, record, fresh_until(record[timestamp_field]))
+            return record, True
+        return record, False
+
+    async def _refresh(
+        self,
+        collection: str,
+        key: Dict[str, Any],
+        lru_key: Tuple,
+        timestamp_field: str,
+        fresh_until: Callable[[datetime], datetime],
+        fetch: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Exception]]:
+        record, fresh = await self._find_fresh(collection, key, lru_key, timestamp_field, fresh_until)
+        if fresh:
+            return record, None
+
+        async with self.locks.hold(":".join(str(part) for part in lru_key)) as owner:
+            if not owner:
+                # Another worker refreshed the document while this one waited for its lock
+                record, fresh = await self._find_fresh(collection, key, lru_key, timestamp_field, fresh_until)
+                if fresh:
+                    return record, None
+            return await self._fetch_and_store(collection, key, lru_key, timestamp_field, fresh_until, fetch, record)
+
+    async def _fetch_and_store(
+        self,
+        collection: str,
+        key: Dict[str, Any],
+        lru_key: Tuple,
+        timestamp_field: str,
+        fresh_until: Callable[[datetime], datetime],
+        fetch: Callable[[], Awaitable[Dict[str, Any]]],
+        record: Optional[Dict[str, Any]],
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Exception]]:
+        try:
+            update = await fetch()
+        except Exception as e:
+            return record, e
+
+        now = datetime.now()
+        document = await self._upsert(collection, key, {**update, timestamp_field: now})
+        self.lru.put(lru_key, document, fresh_until(now))
+        return document, None
+
+    async def _upsert(self, collection: str, key: Dict[str, Any], fields: Dict[str, Any], projection: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """`$set` `fields` on the document of `key`, inserting it when missing; returns the updated document."""
+        update = {"$set": fields}
+        try:
+            return await self.db[collection].find_one_and_update(key, update, projection=projection, upsert=True, return_document=ReturnDocument.AFTER)
+        except DuplicateKeyError:
+            # A concurrent upsert of the same key inserted the document first: update that one
+            return await self.db[collection].find_one_and_update(key, update, projection=projection, return_document=ReturnDocument.AFTER)
+
+    async def get_quote(self, symbol: str) -> Any:
+        """Realtime FMP quote of `symbol`; callers within QUOTE_TTL seconds share one request."""
+        symbol = symbol.upper()
+        lru_key = ("quote", symbol)
+        quote = self.lru.get(lru_key)
+        if quote is not None:
+            return quote
+
+        async def fetch():
+            data = await self._fetch_json(f"{FMP_BASE_URL}/quote", {"symbol": symbol})
+            self.lru.put(lru_key, data, datetime.now() + timedelta(seconds=QUOTE_TTL))
+            return data
+
+        return await self.flights.run(("fmp",) + lru_key, fetch)
+
+    async def search_company(self, query: str) -> Dict[str, Any]:
+        async def fetch():
+            return {"results": await self._fetch_json(f"{FMP_BASE_URL}/search-symbol", {"query": query})}
+
+        document, error = await self._get_or_refresh(
+            "fmp_query_results", {"query": query.upper()}, "timestamp", _thirty_days_after, fetch)
+        if error:
+            raise HTTPException(status_code=500, detail=f"Error in getting company information from FMP for {query}: {str(error)}")
+        return document
+
+    async def get_company_profile(self, symbol: str) -> Dict[str, Any]:
+        symbol = symbol.upper()
+
+        async def fetch():
+            data = await self._fetch_json(f"{FMP_BASE_URL}/profile", {"symbol": symbol})
+            if not data or not isinstance(data, list):
+                raise HTTPException(status_code=404, detail="Company not found")
+            return {"data": data[0]}
+
+        document, error = await self._get_or_refresh(
+            "company_profiles", {"symbol": symbol}, "last_updated", _end_of_day, fetch)
+        if error and document:
+            return {"data": document["data"], "source": f"mongodb (fallback, update failed: {str(error)})"}
+        if error:
+            raise HTTPException(status_code=500, detail=f"Error fetching profile: {str(error)}")
+        return {"data": document["data"], "source": FMP_SOURCE}
+
+    async def get_financial_statements(self, symbol: str, statement_type: str, period: str = "annual", limit: int = 5) -> list:
+        symbol = symbol.upper()
+        if statement_type not in FMP_STATEMENT_ENDPOINTS:
+            raise ValueError("Invalid statement_type")
+
+        async def fetch():
+            data = await self._fetch_json(f"{FMP_BASE_URL}/{FMP_STATEMENT_ENDPOINTS[statement_type]}", {"symbol": symbol, "limit": limit})
+            if not isinstance(data, list) or not data:
+                raise Exception("No data found in FMP")
+            return {"data": data}
+
+        document, error = await self._get_or_refresh(
+            "financial_statements", {"symbol": symbol, "statement_type": statement_type, "period": period},
+            "last_updated", _thirty_days_after, fetch)
+        if error:
+            raise error
+        return document["data"]
+
+    async def _find_series(self, ticker: str, lru_key: Tuple) -> Tuple[Optional[OHLCVSeries], bool]:
+        record = await self.db["ohlcv_series"].find_one({"ticker": ticker})
+        if record is None:
+            return None, False
+        series = OHLCVSeries.from_block(record["block"])
+        if datetime.now() < _end_of_day(record["last_updated"]):
+            self.lru.put(lru_key, series, _end_of_day(record["last_updated"]))
+            return series, True
+        return series, False
+
+    async def _refresh_series(self, ticker: str, lru_key: Tuple) -> OHLCVSeries:
+        series, fresh = await self._find_series(ticker, lru_key)
+        if fresh:
+            return series
+
+        async with self.locks.hold(":".join(lru_key)) as owner:
+            if not owner:
+                series, fresh = await self._find_series(ticker, lru_key)
+                if fresh:
+                    return series
+            return await self._extend_series(ticker, lru_key, series)
+
+    async def _extend_series(self, ticker: str, lru_key: Tuple, series: Optional[OHLCVSeries]) -> OHLCVSeries:
+        series = series if series is not None else OHLCVSeries.empty()
+        to_date = datetime.now().date()
+        # The last stored day is fetched again, as it may have been stored before the close
+        from_date = series.last_date or to_date - timedelta(days=OHLCV_HISTORY_DAYS)
+        rows = await self._fetch_json(f"{FMP_BASE_URL}/historical-price-eod/full", {"symbol": ticker, "from": str(from_date), "to": str(to_date)})
+        if not isinstance(rows, list):
+            raise Exception(f"Unexpected historical data from FMP for {ticker}: {rows}")
+        series = series.merge(OHLCVSeries.from_records(rows))
+
+        now = datetime.now()
+        await self._upsert("ohlcv_series", {"ticker": ticker}, {
+            "block": series.to_block(),
+            "first_date": str(series.dates[0]) if len(series) else None,
+            "last_date": str(series.last_date) if len(series) else None,
+            "rows": len(series),
+            "last_updated": now,
+        }, projection={"_id": 1})
+        self.lru.put(lru_key, series, _end_of_day(now))
+        return series
+
+    async def get_series(self, ticker: str) -> OHLCVSeries:
+        """Daily OHLCV history of `ticker`, refreshed once a day by appending the new rows."""
+        ticker = ticker.upper()
+        lru_key = ("ohlcv_series", ticker)
+        series = self.lru.get(lru_key)
+        if series is not None:
+            return series
+        return await self.flights.run(("fmp",) + lru_key, lambda: self._refresh_series(ticker, lru_key))
+
+    async def get_historical(self, ticker: str, period: str) -> Any:
+        """FMP end-of-day rows of `ticker` over `period`, newest first, sliced from its series."""
+        ticker = ticker.upper()
+        series = await self.get_series(ticker)
+        return series.since(period_start(period, datetime.now().date())).to_records(ticker)
+
+    async def get_stock_price_change(self, symbol: str) -> Dict[str, Any]:
+        symbol = symbol.upper()
+
+        async def fetch():
+            try:
+                data = await self._fetch_json(f"{FMP_BASE_URL}/stock-price-change", {"symbol": symbol})
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"FMP request error: {str(e)}")
+            if not data:
+                raise HTTPException(status_code=404, detail="No stock price change data found.")
+            return {"data": data[0]}
+
+        document, error = await self._get_or_refresh(
+            "stock_price_changes", {"symbol": symbol}, "last_updated", _end_of_day, fetch)
+        if error:
+            raise error
+        return {"symbol": symbol, "changes": [document["data"]], "source": FMP_SOURCE}
+
+    def close(self):
+        if self._runner is None:
+            return
+        if self._client is not None:
+            self._runner.loop.call_soon_threadsafe(self._client.close)
+        self.run(self.locks.aclose())
+        self._runner.shutdown()
+        self._runner, self._client = None, None
+
+
+market_data_cache = MarketDataCache()
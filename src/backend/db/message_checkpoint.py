@@ -0,0 +1,171 @@
+"""
+Incremental persistence of an answer while it is being streamed.
+
+`MessageCheckpointer` collects what the stream produces (research steps, charts, sources,
+errors and the response text so far) and writes it to the message's `MessageLog` as small
+`$push`/`$set` deltas, at most every `CHECKPOINT_INTERVAL` seconds or as soon as
+`CHECKPOINT_BYTES` of new data are pending. The log stays `in_progress` until the final
+`append_data` rewrites it, so a stream whose worker died can be recognised and shown from its
+last checkpoint.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import src.backend.db.mongodb as mongodb
+from src.backend.models.model import MessageLog, AccessLevel
+from src.backend.utils.utils import get_unique_response_id
+
+logger = logging.getLogger("uvicorn")
+
+CHECKPOINT_INTERVAL = float(os.getenv("MESSAGE_CHECKPOINT_INTERVAL", "2"))
+CHECKPOINT_BYTES = int(os.getenv("MESSAGE_CHECKPOINT_BYTES", "8192"))
+PLACEHOLDER_RESPONSE = '**There was an error generating the response**'
+
+
+def _size(value: Any) -> int:
+    if isinstance(value, str):
+        return len(value)
+    return len(json.dumps(value, default=str))
+
+
+class MessageCheckpointer:
+    def __init__(self, session_id: str, message_id: str, interval: float = CHECKPOINT_INTERVAL, max_bytes: int = CHECKPOINT_BYTES):
+        self.session_id = str(session_id)
+        self.message_id = str(message_id)
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self._push: Dict[str, List[Any]] = {}
+        self._set: Dict[str, Any] = {}
+        self._response_parts: List[str] = []
+        self._response_meta: Optional[Dict[str, Any]] = None
+        self._response_dirty = False
+        self._pending_bytes = 0
+        self._last_flush = time.monotonic()
+        self._write: Optional[asyncio.Task] = None
+        self._closed = False
+
+    @property
+    def _filter(self) -> Dict[str, str]:
+        return {"session_id": self.session_id, "message_id": self.message_id}
+
+    async def start(self, user_id: str, local_time: datetime, time_zone: str):
+        """
+        Create the message log (or reset the streamed fields of a retried one) and mark it in
+        progress. A log that never gets another write shows the usual error response.
+        """
+        await MessageLog.get_motor_collection().update_one(
+            self._filter,
+            {
+                "$set": {"research": [], "stock_chart": [], "in_progress": True, "checkpointed_at": datetime.now(timezone.utc)},
+                "$setOnInsert": {
+                    "created_at": local_time,
+                    "access_level": AccessLevel.PRIVATE.value,
+                    "time_taken": 0,
+                    "response": {
+                        "agent_name": "Response Generator Agent",
+                        "content": PLACEHOLDER_RESPONSE,
+                        "id": get_unique_response_id(),
+                        "created_at": local_time.isoformat(),
+                    },
+                },
+            },
+            upsert=True,
+        )
+        await mongodb.add_session(self.session_id, 'New Chat', local_time, time_zone, user_id)
+
+    def _push_item(self, field: str, item: Any):
+        self._push.setdefault(field, []).append(item)
+        self._pending_bytes += _size(item)
+
+    def _set_field(self, field: str, value: Any):
+        self._set[field] = value
+        self._pending_bytes += _size(value)
+
+    def add_entry(self, content: Optional[Dict[str, Any]]):
+        """One entry of `current_messages_log`, classified the way `append_data` stores it."""
+        if not content or self._closed:
+            return
+        if 'user_query' in content:
+            self._set_field("human_input", content)
+        elif content.get('type') == 'research':
+            if content.get('agent_name') != "DB Search Agent":
+                self._push_item("research", {'agent_name': content['agent_name'], 'title': content['title'], 'id': content.get('id', get_unique_response_id()), 'created_at': content['created_at']})
+        elif 'research-manager' in content:
+            self._push_item("research", {'agent_name': content['agent_name'], 'title': content['research-manager'], 'id': content.get('id', get_unique_response_id()), 'created_at': content['created_at']})
+        elif 'response' in content or content.get('type') == 'response':
+            text = content['response'] if 'response' in content else content['content']
+            self._response_parts = [text]
+            self._response_meta = {'agent_name': content.get('agent_name', ''), 'id': content.get('id', get_unique_response_id()), 'created_at': content.get('created_at')}
+            self._response_dirty = True
+            self._pending_bytes += len(text)
+        elif content.get('type') == 'stock_data':
+            self._push_item("stock_chart", content.get('data') or {})
+        elif 'sources' in content:
+            self._set_field("sources", content['sources'])
+        elif 'error' in content:
+            self._set_field("error", content)
+        self.maybe_flush()
+
+    def add_chunk(self, chunk: Dict[str, Any]):
+        """A streamed response token; the text so far is checkpointed as the response."""
+        if self._closed or chunk.get('type') != 'response-chunk' or not chunk.get('content'):
+            return
+        if self._response_meta is None or self._response_meta['agent_name'] != chunk.get('agent_name', ''):
+            self._response_parts = []
+            self._response_meta = {'agent_name': chunk.get('agent_name', ''), 'id': chunk.get('id') or get_unique_response_id(), 'created_at': datetime.now(timezone.utc).isoformat()}
+        self._response_parts.append(chunk['content'])
+        self._response_dirty = True
+        self._pending_bytes += len(chunk['content'])
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        """Start a checkpoint write if one is due and none is in flight."""
+        if self._closed or not self._pending_bytes:
+            return
+        if self._write is not None and not self._write.done():
+            return
+        if self._pending_bytes < self.max_bytes and time.monotonic() - self._last_flush < self.interval:
+            return
+        self._write = asyncio.create_task(self._flush())
+
+    def _take_update(self) -> Optional[Dict[str, Any]]:
+        if not self._pending_bytes:
+            return None
+        sets = dict(self._set)
+        if self._response_dirty:
+            sets["response"] = {**self._response_meta, "content": "".join(self._response_parts)}
+        sets["checkpointed_at"] = datetime.now(timezone.utc)
+        update: Dict[str, Any] = {"$set": sets}
+        if self._push:
+            update["$push"] = {field: {"$each": items} for field, items in self._push.items()}
+
+        self._push, self._set = {}, {}
+        self._response_dirty = False
+        self._pending_bytes = 0
+        self._last_flush = time.monotonic()
+        return update
+
+    async def _flush(self):
+        update = self._take_update()
+        if update is None:
+            return
+        try:
+            await MessageLog.get_motor_collection().update_one(self._filter, update)
+        except Exception as e:
+            logger.warning(f"Checkpoint of message {self.message_id} failed: {e}")
+
+    async def close(self):
+        """
+        Wait for the write in flight and stop checkpointing; the final `append_data` (or the
+        partial-data path) takes over from here.
+        """
+        self._closed = True
+        if self._write is not None:
+            try:
+                await self._write
+            except Exception:
+                pass
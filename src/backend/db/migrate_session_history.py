@@ -0,0 +1,98 @@
+"""
+Moves the turns embedded in `SessionHistory.history` into one `SessionTurn` document per
+message. The migration is idempotent: turns are upserted on (session_id, message_id) and
+only sessions that still carry a non-empty `history` are visited.
+
+Run from the repository root:
+    python -m src.backend.db.migrate_session_history [--dry-run] [--keep-history] [--batch-size 100]
+"""
+import argparse
+import asyncio
+import os
+from datetime import timedelta
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from src.backend.models.model import SessionHistory, SessionTurn
+
+
+def build_turn_upserts(session: SessionHistory) -> list:
+    """
+    Legacy entries have no timestamp of their own; they are ordered by spacing them one
+    millisecond apart from the session's `created_at`, which keeps their list order and
+    places them before any turn written after the migration.
+    """
+    operations = []
+    for index, entry in enumerate(session.history):
+        for message_id, message_data in entry.items():
+            user_query, assistant_response, doc_ids = message_data
+            created_at = session.created_at + timedelta(milliseconds=index)
+            operations.append(UpdateOne(
+                {"session_id": session.session_id, "message_id": message_id},
+                {"$setOnInsert": {
+                    "user_id": session.user_id,
+                    "session_id": session.session_id,
+                    "message_id": message_id,
+                    "user_query": user_query,
+                    "assistant_response": assistant_response,
+                    "doc_ids": doc_ids if isinstance(doc_ids, list) else [doc_ids] if doc_ids else [],
+                    "created_at": created_at,
+                    "updated_at": session.updated_at or created_at,
+                }},
+                upsert=True
+            ))
+    return operations
+
+
+async def migrate_session(session: SessionHistory, keep_history: bool = False) -> int:
+    """Upserts the legacy turns of one session and empties its `history`; returns the number of turns inserted."""
+    operations = build_turn_upserts(session)
+    if not operations:
+        return 0
+    result = await SessionTurn.get_motor_collection().bulk_write(operations, ordered=False)
+    if not keep_history:
+        await session.set({SessionHistory.history: []})
+    return result.upserted_count
+
+
+async def migrate(dry_run: bool = False, keep_history: bool = False, batch_size: int = 100) -> dict:
+    legacy_sessions = {"history.0": {"$exists": True}}
+    stats = {"sessions": 0, "turns": 0, "upserted": 0}
+
+    async def migrate_one(session: SessionHistory):
+        stats["sessions"] += 1
+        stats["turns"] += len(build_turn_upserts(session))
+        if not dry_run:
+            stats["upserted"] += await migrate_session(session, keep_history)
+
+    if dry_run or keep_history:
+        async for session in SessionHistory.find(legacy_sessions):
+            await migrate_one(session)
+        return stats
+
+    # Migrated sessions no longer match the filter, so each batch is a fresh query
+    while True:
+        sessions = await SessionHistory.find(legacy_sessions).limit(batch_size).to_list()
+        if not sessions:
+            return stats
+        for session in sessions:
+            await migrate_one(session)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true", help="count the sessions and turns to migrate without writing")
+    parser.add_argument("--keep-history", action="store_true", help="leave the legacy history arrays in place")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.getenv("MONGO_URI"))
+    await init_beanie(database=client["insight_agent"], document_models=[SessionHistory, SessionTurn])
+
+    stats = await migrate(dry_run=args.dry_run, keep_history=args.keep_history, batch_size=args.batch_size)
+    print(f"sessions: {stats['sessions']}, turns: {stats['turns']}, upserted: {stats['upserted']}" + (" (dry run)" if args.dry_run else ""))
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,15 +1,16 @@
 import asyncio
+import base64
 import os
-import re
 import time
 import uuid
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 from beanie import init_beanie
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import DESCENDING, MongoClient, ReturnDocument
-from typing import Any, List, Optional, Dict, Union
+from pymongo import DESCENDING, MongoClient
+from typing import Any, List, Optional, Dict
 from beanie.odm.fields import PydanticObjectId
-from beanie.operators import  And
+from bson.errors import InvalidId
+from beanie.operators import  And, Set
 from src.backend.utils import JWT
 from fastapi import HTTPException, UploadFile, BackgroundTasks
 from zoneinfo import ZoneInfo
@@ -17,7 +18,11 @@ from typing import Optional
 from src.backend.models.model import *
 from src.backend.models.app_io_schemas import Onboarding
 from src.ai.agents.utils import generate_session_title
-import requests
+from src.backend.db.market_data import market_data_cache
+from src.backend.db.ohlcv import OHLCVSeries
+from src.backend.db.query_plans import VERIFY_QUERY_PLANS, verify_model_query_plans
+from src.backend.db.migrate_session_history import migrate_session
+from src.backend.core.principal_cache import principal_cache
 
 MONGO_URI = os.getenv("MONGO_URI")
 FMP_API_KEY= os.getenv("FM_API_KEY")
@@ -30,302 +35,45 @@ async def init_db():
     client = AsyncIOMotorClient(MONGO_URI)
     database = client["insight_agent"]
     jwt_handler = JWT.JWTHandler("f524fdd634e89fd7a3d886564d026666b3ea46db9c77a57d68309f02190020cb", "HS256", "30")
-    await init_beanie(database=database, document_models=[MessageLog, JSONBackup, SessionLog, Users, MessageFeedback, ExternalData, SessionHistory, MessageOutput, MapData, GraphLog, Personalization, Onboarding,UploadResponse, ChartBotLogs])
+    await init_beanie(database=database, document_models=[MessageLog, JSONBackup, SessionLog, Users, MessageFeedback, ExternalData, SessionHistory, SessionTurn, MessageOutput, MapData, GraphLog, Personalization, Onboarding,UploadResponse, ChartBotLogs])
+    # Indexes declared in the models' `Settings` are created by init_beanie
+    await market_data_cache.arun(market_data_cache.ensure_indexes())
 
-def _fetch_fmp_data(query: str) -> Union[List[Dict[str, Any]], str]:
-    try:
-        # url = f"https://financialmodelingprep.com/api/v3/search?query={query}&apikey={FMP_API_KEY}"
-        url = f"https://financialmodelingprep.com/stable/search-symbol?query={query}&apikey={FMP_API_KEY}"
-        fmp_response = requests.get(url)
-        fmp_response.raise_for_status()
-        return fmp_response.json()
-    except Exception as e:
-        return f"Error in getting company information from FMP for {query}: {str(e)}"
-    
-def search_company(query: str):
-    query_upper = query.upper()
-    client = MongoClient(MONGO_URI)
-    db = client["insight_agent_fmp"]
-    collection = db["fmp_query_results"]
-
-    one_month_ago = datetime.now() - timedelta(days=30)
-    cached = collection.find_one({"query": query_upper})
-
-    if cached:
-        if cached.get("timestamp") and cached["timestamp"] > one_month_ago:
-            return cached
-
-        result = _fetch_fmp_data(query)
-        if isinstance(result, str):
-            raise HTTPException(status_code=500, detail=result)
-
-        collection.update_one(
-            {"_id": cached["_id"]},
-            {"$set": {
-                "results": result,
-                "timestamp": datetime.now()
-            }}
-        )
-        cached = collection.find_one({"_id": cached["_id"]})
-        return cached
-
-    result = _fetch_fmp_data(query)
-    if isinstance(result, str):
-        raise HTTPException(status_code=500, detail=result)
+    if VERIFY_QUERY_PLANS:
+        collscans = await verify_model_query_plans() + await market_data_cache.arun(market_data_cache.find_collscans())
+        if collscans:
+            raise RuntimeError("Collection scan in the query plan of: " + "; ".join(collscans))
 
-    new_entry = {
-        "query": query_upper,
-        "results": result,
-        "timestamp": datetime.now()
-    }
-    collection.insert_one(new_entry)
-    return new_entry
+def search_company(query: str):
+    return market_data_cache.run(market_data_cache.search_company(query))
 
 
 def get_or_fetch_company_profile(symbol: str):
-    symbol = symbol.upper()
-    client = MongoClient(MONGO_URI)
-    db = client["insight_agent_fmp"]
-    collection = db["company_profiles"]
-
-    today = datetime.now().date()
-
-    # Check for cached data
-    existing = collection.find_one({"symbol": symbol})
-    if existing:
-        last_updated = existing.get("last_updated")
-        if last_updated and last_updated.date() == today:
-            return {
-                "data": existing["data"],
-                "source": "https://financialmodelingprep.com/"
-            }
-        else:
-            try:
-                # url = f"https://financialmodelingprep.com/api/v3/profile/{symbol}?apikey={FMP_API_KEY}"
-                url = f"https://financialmodelingprep.com/stable/profile?symbol={symbol}&apikey={FMP_API_KEY}"
-                response = requests.get(url)
-                response.raise_for_status()
-                data = response.json()
-
-                if not data or not isinstance(data, list):
-                    raise HTTPException(status_code=404, detail="Company not found")
-                data = data[0]
-
-                collection.update_one(
-                    {"_id": existing["_id"]},
-                    {"$set": {
-                        "data": data,
-                        "last_updated": datetime.now()
-                    }}
-                )
-                return {
-                    "data": data,
-                    "source": "https://financialmodelingprep.com/"
-                }
-
-            except Exception as e:
-                return {
-                    "data": existing["data"],
-                    "source": f"mongodb (fallback, update failed: {str(e)})"
-                }
-
-    # No existing record, fetch and store
-    try:
-        # url = f"https://financialmodelingprep.com/api/v3/profile/{symbol}?apikey={FMP_API_KEY}"
-        url = f"https://financialmodelingprep.com/stable/profile?symbol={symbol}&apikey={FMP_API_KEY}"
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-
-        if not data or not isinstance(data, list):
-            raise HTTPException(status_code=404, detail="Company not found")
-
-        data = data[0]
-
-        collection.insert_one({
-            "symbol": symbol,
-            "data": data,
-            "last_updated": datetime.now()
-        })
-
-        return {
-            "data": data,
-            "source": "https://financialmodelingprep.com/"
-        }
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching profile: {str(e)}")
+    return market_data_cache.run(market_data_cache.get_company_profile(symbol))
 
 
 def fetch_financial_data(symbol: str, statement_type: str, period: str = "annual", limit: int = 5) -> dict:
-    symbol = symbol.upper()
-    client = MongoClient(MONGO_URI)
-    db = client["insight_agent_fmp"]
-    financial_statements = db["financial_statements"]
-    record = financial_statements.find_one({
-        "symbol": symbol,
-        "statement_type": statement_type,
-        "period": period
-    })
+    return market_data_cache.run(market_data_cache.get_financial_statements(symbol, statement_type, period, limit))
 
-    is_outdated = True
-    if record and "last_updated" in record:
-        age = datetime.now() - record["last_updated"]
-        is_outdated = age > timedelta(days=30)
 
-    if not record or is_outdated:
-        fmp_endpoints = {
-            "balance_sheet": "balance-sheet-statement",
-            "cash_flow": "cash-flow-statement",
-            "income_statement": "income-statement"
-        }
+def fetch_stock_quote(symbol: str) -> Any:
+    return market_data_cache.run(market_data_cache.get_quote(symbol))
 
-        if statement_type not in fmp_endpoints:
-            raise ValueError("Invalid statement_type")
-
-        # url = f"https://financialmodelingprep.com/api/v3/{fmp_endpoints[statement_type]}/{symbol}?limit={limit}&apikey={FMP_API_KEY}"
-        url = f"https://financialmodelingprep.com/stable/{fmp_endpoints[statement_type]}?symbol={symbol}&limit={limit}&apikey={FMP_API_KEY}"
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-
-        if isinstance(data, list) and data:
-            now = datetime.now()
-            update_data = {
-                "symbol": symbol,
-                "statement_type": statement_type,
-                "period": period,
-                "data": data,
-                "last_updated": now
-            }
-            if record:
-                financial_statements.update_one(
-                    {"_id": record["_id"]},
-                    {"$set": update_data}
-                )
-            else:
-                financial_statements.insert_one(update_data)
-        else:
-            raise Exception("No data found in FMP")
-        
-        record = financial_statements.find_one({
-            "symbol": symbol,
-            "statement_type": statement_type,
-            "period": period
-        })
 
-    return record["data"]
+def get_or_update_historical(ticker: str, period: str) -> dict:
+    return market_data_cache.run(market_data_cache.get_historical(ticker, period))
 
-def get_historical_data_fmp(ticker: str, period: str):
-    today = datetime.now()
-    from_date = datetime(today.year, 1, 1)
-    ytd_days=today-from_date
-    days_map = {"1M": 30, "3M": 90, "6M": 180, "1Y": 365, "5Y": 1825,"MAX": 7300,"YTD":ytd_days.days}
-    days = days_map.get(period, 30)
-    to_date = datetime.now()
-    from_date = to_date - timedelta(days=days)
 
-    # url = f"https://financialmodelingprep.com/api/v3/historical-price-full/{ticker}?from={from_date.date()}&to={to_date.date()}&apikey={FMP_API_KEY}"
-    url = f"https://financialmodelingprep.com/stable/historical-price-eod/full?symbol={ticker}&from={from_date.date()}&to={to_date.date()}&apikey={FMP_API_KEY}"
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
+def get_ohlcv_series(ticker: str) -> OHLCVSeries:
+    return market_data_cache.run(market_data_cache.get_series(ticker))
 
-def get_or_update_historical(ticker: str, period: str) -> dict:
-    now = datetime.now()
-    ticker = ticker.upper()
-    client = MongoClient(MONGO_URI)
-    db = client["insight_agent_fmp"]
-    historical_collection = db["historical_data"]
-
-    record = historical_collection.find_one({"ticker": ticker, "period": period})
-    if record:
-        # if (now - record["last_updated"]) < timedelta(hours=24):
-        #     return record["data"]
-        if now.date() == record["last_updated"].date():
-            return record["data"]
-        else:
-            data = get_historical_data_fmp(ticker, period)
-            updated_record = historical_collection.find_one_and_update(
-                {"_id": record["_id"]},
-                {"$set": {"data": data, "last_updated": now}},
-                return_document=ReturnDocument.AFTER
-            )
-            return updated_record["data"]
-    else:
-        data = get_historical_data_fmp(ticker, period)
-        try:
-            new_doc = {
-                "ticker": ticker,
-                "period": period,
-                "data": data,
-                "last_updated": now
-            }
-            historical_collection.insert_one(new_doc)
-        except Exception as insert_error:
-            record = historical_collection.find_one({"ticker": ticker, "period": period})
-            if record:
-                return record["data"]
-            else:
-                raise insert_error
-        return data
 
 def fetch_stock_price_change(symbol: str) -> dict:
     """
     Get stock price change for the given symbol.
     Uses cached data if updated today; else updates from FMP.
     """
-    symbol = symbol.upper()
-
-    client = MongoClient(MONGO_URI)
-    db = client["insight_agent_fmp"]
-    collection = db["stock_price_changes"]
-    # 1. Check for cached data
-    record = collection.find_one({"symbol": symbol})
-    today = datetime.now().date()
-
-    if record and "last_updated" in record and record["last_updated"].date() == today:
-        return {
-            "symbol": symbol,
-            "changes": [record["data"]],
-            "source": "https://financialmodelingprep.com/"
-        }
-
-    # 2. Fetch fresh data from FMP
-    # url = f"https://financialmodelingprep.com/api/v3/stock-price-change/{symbol}?apikey={FMP_API_KEY}"
-    url = f"https://financialmodelingprep.com/stable/stock-price-change?symbol={symbol}&apikey={FMP_API_KEY}"
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        fmp_data = response.json()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"FMP request error: {str(e)}")
-
-    if not fmp_data:
-        raise HTTPException(status_code=404, detail="No stock price change data found.")
-
-    new_data = fmp_data[0]
-    # 3. Update or insert record in DB
-    if record:
-        collection.update_one(
-            {"_id": record["_id"]},
-            {"$set": {
-                "data": new_data,
-                "last_updated": datetime.now()
-            }}
-        )
-    else:
-        collection.insert_one({
-            "symbol": symbol,
-            "data": new_data,
-            "last_updated": datetime.now()
-        })
-
-    return {
-        "symbol": symbol,
-        "changes": [new_data],
-        "source": "https://financialmodelingprep.com/"
-    }
+    return market_data_cache.run(market_data_cache.get_stock_price_change(symbol))
 
 async def init_web_search_db():
     client = AsyncIOMotorClient(MONGO_URI)
@@ -360,7 +108,7 @@ async def get_user_by_token(token: str)->returnStatus:
     try:
         payload = jwt_handler.decode_jwt(token)
         user_id = payload.get("user_id")
-        user = await fetch_user_by_id(user_id)
+        user = await principal_cache.get(user_id, fetch_user_by_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         return user
@@ -385,6 +133,8 @@ async def append_data(user_id, session_id, message_id, messages, local_time, tim
         if time_taken:
             log_entry.time_taken = time_taken
 
+        log_entry.in_progress = False
+
         # canvas_response_data = {}
 
         for content in messages:
@@ -499,15 +249,6 @@ async def append_data(user_id, session_id, message_id, messages, local_time, tim
         print(f"Error in storing message log: {str(e)}")
 
 
-async def append_graph_log_to_mongo(session_id: str, message_id: str, log: str):
-    existing_log = await GraphLog.find_one({"session_id": session_id, "message_id": message_id})
-    if existing_log:
-        existing_log.logs += f"\n{'='*15}\n\n{log}"
-        await existing_log.save()
-    else:
-        new_log = GraphLog(session_id=session_id, message_id=message_id, logs=log)
-        await new_log.insert()
-        
 async def handle_partial_data_storage(
     user_id: str,
     session_id: str,
@@ -517,7 +258,6 @@ async def handle_partial_data_storage(
     partial_sources: list,
     partial_related_queries: list,
     partial_metadata: dict,
-    message_log: str,
     local_time: datetime,
     timezone: str,
     time_taken: float,
@@ -577,10 +317,6 @@ async def handle_partial_data_storage(
             time_taken
         )
         
-        # Store graph logs if available
-        if message_log:
-            bgt.add_task(append_graph_log_to_mongo, session_id, message_id, message_log)
-            
         print(f"Partial data stored as normal response for message_id: {message_id}, chunks: {len(partial_content_buffer)}")
         
     except Exception as e:
@@ -608,82 +344,95 @@ async def add_session(session_id, title, local_time, time_zone, user_id=None):
         print(f"Updated session {session_id} title to {title}")
 
 
-async def get_sessions_by_user2(user_id: str, page: int = 1, limit: int = 25) -> Dict[str, Any]:
-
-    skip_count = (page - 1) * limit
-    sessions = await SessionLog.find({"user_id": PydanticObjectId(user_id),"visible": True}).sort("-created_at").skip(skip_count).limit(limit).to_list()
-    serialized_sessions = []
-    
-    for session in sessions:
-        serialized_sessions.append({
-            "id": str(session.session_id),
-            "user_id": str(session.user_id),
-            "title": session.title.title(),
-            "created_at": session.created_at.isoformat()
-        })
-    if not serialized_sessions:
-        return {"data": [], "has_more": False}
-    
-    sorted_sessions = sorted(
-        serialized_sessions, key=lambda x: x["created_at"], reverse=True)
-
-    if bool(sorted_sessions) == False :
-        return None
-    
-    if sorted_sessions[0].get("timezone"):
-        tz = ZoneInfo(sorted_sessions[0].get("timezone"))
-    else:
-        tz = ZoneInfo("UTC")
-    
+def group_sessions_by_timeline(sessions: List[Dict]) -> List[Dict]:
+    """Bucket serialized sessions (newest first) into the sidebar's timeline groups."""
+    tz = ZoneInfo(sessions[0].get("timezone") or "UTC") if sessions else ZoneInfo("UTC")
     current_date = datetime.now(tz).date()
-    
-    categorized_data = {
+
+    buckets: Dict[str, List[Dict]] = {
         "Today": [],
         "Previous 7 days": [],
         "Previous 30 days": [],
     }
-    
-    # Process each session
-    for session in sorted_sessions:
-        # Convert ISO string to datetime object
-        created_date = datetime.fromisoformat(session["created_at"]).date()
-        
+
+    for s in sessions:
+        created_date = datetime.fromisoformat(s["created_at"]).date()
         days_diff = (current_date - created_date).days
-        
+
         if days_diff == 0:
-            categorized_data["Today"].append(session)
+            buckets["Today"].append(s)
         elif 1 <= days_diff <= 7:
-            categorized_data["Previous 7 days"].append(session)
+            buckets["Previous 7 days"].append(s)
         elif 8 <= days_diff <= 30:
-            categorized_data["Previous 30 days"].append(session)
+            buckets["Previous 30 days"].append(s)
         else:
-            if created_date.year == current_date.year:
-                month_name = created_date.strftime("%B")
-                if month_name not in categorized_data:
-                    categorized_data[month_name] = []
-                categorized_data[month_name].append(session)
-            else:
-                year_month = f"{created_date.strftime('%B')} {created_date.year}"
-                if year_month not in categorized_data:
-                    categorized_data[year_month] = []
-                categorized_data[year_month].append(session)
-    
-    result = []
-    for timeline, sessions in categorized_data.items():
-        if sessions:
-            result.append({
-                "timeline": timeline,
-                "data": sessions
-            })
-    total_fetched = skip_count + len(serialized_sessions)
-    total_count = await SessionLog.find(
-        {"user_id": PydanticObjectId(user_id), "visible": True}
-    ).count()
-    has_more = bool(total_count - total_fetched > 0)
+            key = (
+                created_date.strftime("%B")
+                if created_date.year == current_date.year
+                else f"{created_date.strftime('%B')} {created_date.year}"
+            )
+            buckets.setdefault(key, []).append(s)
+
+    return [
+        {"timeline": tl, "data": data}
+        for tl, data in buckets.items() if data
+    ]
+
+
+def encode_session_cursor(created_at: datetime, object_id: Any) -> str:
+    """Opaque cursor pointing just after the session with this (created_at, _id)."""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{object_id}".encode()).decode()
+
+
+def session_cursor_filter(cursor: Optional[str]) -> Dict[str, Any]:
+    """
+    Keyset condition selecting the sessions that come after `cursor` in (created_at, _id)
+    descending order, so every page is an index seek instead of a growing skip.
+    """
+    if not cursor:
+        return {}
+    try:
+        created_at, object_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        created_at, object_id = datetime.fromisoformat(created_at), PydanticObjectId(object_id)
+    except (ValueError, InvalidId, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": object_id}}
+    ]}
+
+
+async def get_sessions_by_user2(user_id: str, page: int = 1, limit: int = 25, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    One page of the user's visible sessions, newest first. Pass the previous page's
+    `next_cursor` to continue; `page` is still honoured when no cursor is given.
+    `has_more` is worked out from one extra row rather than a separate count.
+    """
+    query = {"user_id": PydanticObjectId(user_id), "visible": True, **session_cursor_filter(cursor)}
+    find = SessionLog.find(query).sort([("created_at", DESCENDING), ("_id", DESCENDING)])
+    if not cursor and page > 1:
+        find = find.skip((page - 1) * limit)
+    sessions = await find.limit(limit + 1).to_list()
+
+    has_more = len(sessions) > limit
+    sessions = sessions[:limit]
+    if not sessions:
+        return {"data": [], "has_more": False, "next_cursor": None}
+
+    serialized_sessions = [
+        {
+            "id": str(session.session_id),
+            "user_id": str(session.user_id),
+            "title": session.title.title(),
+            "created_at": session.created_at.isoformat()
+        }
+        for session in sessions
+    ]
 
     return {
-        "data":result,
+        "data": group_sessions_by_timeline(serialized_sessions),
         "has_more": has_more,
+        "next_cursor": encode_session_cursor(sessions[-1].created_at, sessions[-1].id) if has_more else None,
     }
 
 
@@ -706,13 +455,32 @@ async def get_messages_by_session(session_id: str) -> List[dict]:
     try:
         session_messages = {"session_id": session_id, 'message_list': [
         ]}
+
+        # Feedback and uploaded documents of the whole session are fetched with one `$in` query per
+        # collection; the first match per key is kept, as `find_one` would have returned it.
+        message_ids = [log.message_id for log in logs]
+        feedback_by_message = {}
+        if message_ids:
+            for feedback in await MessageFeedback.find({"message_id": {"$in": message_ids}}).to_list():
+                feedback_by_message.setdefault(feedback.message_id, feedback)
+
+        file_ids = list({
+            file_id
+            for log in logs if log.human_input and isinstance(log.human_input, dict)
+            for file_id in log.human_input.get("doc_ids") or []
+        })
+        upload_by_file = {}
+        if file_ids:
+            for doc in await UploadResponse.find({"file_id": {"$in": file_ids}}).project(UploadFileInfo).to_list():
+                upload_by_file.setdefault(doc.file_id, doc)
+
         for log in logs:
             research_data = log.research if log.research else None
             if (research_data and isinstance(research_data, list) and len(research_data) > 0 and 'created_at' in research_data[0]):
                 research_data = sorted(research_data, key=lambda x: x['created_at'])
 
             
-            feedback = await MessageFeedback.find_one({"message_id": log.message_id})
+            feedback = feedback_by_message.get(log.message_id)
             feedback_data = {
                 "liked": "yes" if feedback and feedback.liked is True else "no" if feedback and feedback.liked is False else None,
                 "feedback_tag": feedback.feedback_tag if feedback else [],
@@ -724,7 +492,7 @@ async def get_messages_by_session(session_id: str) -> List[dict]:
                 doc_ids = log.human_input.get("doc_ids", [])
                 if doc_ids:
                     for file_id in doc_ids:
-                        doc = await UploadResponse.find_one({"file_id": file_id})
+                        doc = upload_by_file.get(file_id)
                         if doc:
                             file_name = doc.original_filename
                             if file_name and "." in file_name:
@@ -841,6 +609,7 @@ async def update_user_password(email: str, new_hashed_password: str) -> bool:
         return False
 
     await user.set({Users.password: new_hashed_password})
+    await principal_cache.invalidate(user.id)
     return True
 
 
@@ -885,46 +654,98 @@ async def update_session_history_in_db(session_id: str, user_id: str, message_id
 
     message_entry = {message_id: (user_query, assistant_response, doc_ids)}
 
+    if session and session.history:
+        # Not migrated yet: move its turns over first, reads only look at `SessionTurn` once it has one
+        await migrate_session(session)
+
+    # One document per turn; a retried message keeps its original position (created_at)
+    await SessionTurn.find_one(SessionTurn.session_id == session_id, SessionTurn.message_id == message_id).upsert(
+        Set({
+            SessionTurn.user_query: user_query,
+            SessionTurn.assistant_response: assistant_response,
+            SessionTurn.doc_ids: doc_ids,
+            SessionTurn.updated_at: local_time,
+        }),
+        on_insert=SessionTurn(
+            user_id=user_object_id,
+            session_id=session_id,
+            message_id=message_id,
+            user_query=user_query,
+            assistant_response=assistant_response,
+            doc_ids=doc_ids,
+            created_at=local_time,
+            updated_at=local_time,
+        )
+    )
+
     if not session:
         session = SessionHistory(
             user_id=user_object_id,
             session_id=session_id,
             title="New Chat",
-            history=[message_entry],
             created_at=local_time,
             updated_at=local_time,
         )
 
-        title = await generate_title(session.history)
+        title = await generate_title([message_entry])
         session.title = title
         await session.insert()
         await add_session(session_id, title, local_time, time_zone, user_id)
 
     else:
-        message_found = False
-        for entry in reversed(session.history):
-            if message_id in entry:
-                entry[message_id] = (user_query, assistant_response, doc_ids)
-                message_found = True
-                break
-
-        if not message_found:
-            session.history.append(message_entry)
+        updates = {SessionHistory.updated_at: local_time}
 
         if not session.title or session.title == "New Chat":
-            title = await generate_title(session.history)
+            title = await generate_title([message_entry])
             if title and title != "New Chat":
-                session.title = title
+                updates[SessionHistory.title] = title
 
                 session_log = await SessionLog.find_one(SessionLog.session_id == session_id, SessionLog.user_id == user_object_id)
                 if session_log:
                     session_log.title = title
                     await session_log.save()
-        session.updated_at = local_time
-        await session.save()
+
+        await session.set(updates)
 
 
 async def get_session_history_from_db(session_id: str, prev_message_id: str, limit: int = None) -> dict:
+    all_messages = []
+    all_doc_ids = []
+
+    anchor = await SessionTurn.find_one(SessionTurn.session_id == session_id, SessionTurn.message_id == prev_message_id)
+    if not anchor:
+        return await get_legacy_session_history_from_db(session_id, prev_message_id, limit)
+
+    # The last `limit` turns up to and including `prev_message_id`, newest first
+    query = SessionTurn.find(
+        SessionTurn.session_id == session_id,
+        SessionTurn.created_at <= anchor.created_at
+    ).sort([("created_at", -1), ("_id", -1)])
+    if limit:
+        query = query.limit(limit)
+
+    for turn in await query.to_list():
+        all_messages.append([turn.user_query, turn.assistant_response])
+
+        if turn.doc_ids:
+            if isinstance(turn.doc_ids, list):
+                all_doc_ids.extend(turn.doc_ids)
+            else:
+                all_doc_ids.extend([turn.doc_ids])
+
+    # Reverse to get chronological order
+    all_messages.reverse()
+
+    all_doc_ids.reverse()
+
+    return {
+        'messages': all_messages,
+        'doc_ids': all_doc_ids
+    }
+
+
+async def get_legacy_session_history_from_db(session_id: str, prev_message_id: str, limit: int = None) -> dict:
+    """Reads sessions whose turns are still embedded in `SessionHistory.history` (not yet migrated)."""
     session = await SessionHistory.find_one(SessionHistory.session_id == session_id)
     all_messages = []
     all_doc_ids = []
@@ -1013,6 +834,7 @@ async def update_user_profile(user_id: str, full_name: Optional[str], email: Opt
 
     user.last_updated = datetime.now()
     await user.save()
+    await principal_cache.invalidate(user_id)
     return user
 
 
@@ -1049,97 +871,53 @@ async def get_sessions_by_user_and_keyword_pagination(
     user_id: str,
     keyword: str,
     page: int,
-    limit: int
+    limit: int,
+    cursor: Optional[str] = None
 ) -> Dict[str, Any]:
+    """
+    Sessions whose title has a word starting with each word of the keyword, newest first.
+    Matching, sorting and paging run in a single aggregation on the `title_prefixes` index;
+    one extra row is fetched to tell whether another page exists. Paging follows the same
+    cursor contract as `get_sessions_by_user2`.
+    """
+    terms = title_search_terms(keyword)
+    if not terms:
+        return {"data": [], "has_more": False, "next_cursor": None}
 
-    regex = re.compile(re.escape(keyword), re.IGNORECASE)
-
-    # Step 1: Find all matching sessions from history
-    sessions = await SessionHistory.find(
-        {
-            "user_id": PydanticObjectId(user_id),
-            "title": {"$regex": regex},
-        }
-    ).to_list()
-    
-    if not sessions:
-        return {"data": [], "has_more": False}
-
-    # Step 2: Get all session_ids from history
-    session_ids = [s.session_id for s in sessions]
-
-    # Step 3: Find all visible session logs for these IDs (only return session_id field)
-    logs = await SessionLog.find(
-        {
+    pipeline = [
+        {"$match": {
             "user_id": PydanticObjectId(user_id),
-            "session_id": {"$in": session_ids},
-            "visible": True
-        }
-    ).to_list()
-
-    # Step 4: Extract valid session_ids from logs
-    valid_session_ids = {log.session_id for log in logs}
-
-    # Step 5: Filter sessions in one pass
-    valid_sessions = [s for s in sessions if s.session_id in valid_session_ids]
-
-    if not valid_sessions:
-        return {"data": [], "has_more": False}
+            "title_prefixes": {"$all": terms},
+            "visible": True,
+            **session_cursor_filter(cursor)
+        }},
+        {"$sort": {"created_at": -1, "_id": -1}},
+    ]
+    if not cursor and page > 1:
+        pipeline.append({"$skip": (page - 1) * limit})
+    pipeline += [
+        {"$limit": limit + 1},
+        {"$project": {"session_id": 1, "user_id": 1, "title": 1, "created_at": 1, "timezone": 1}}
+    ]
+    sessions = await SessionLog.aggregate(pipeline).to_list()
+    has_more = len(sessions) > limit
+    sessions = sessions[:limit]
 
-    # Step 6: Serialize
     serialized = [
         {
-            "id": str(s.session_id),
-            "user_id": str(s.user_id),
-            "title": s.title.title(),
-            "created_at": s.created_at.isoformat(),
-            "timezone": getattr(s, "timezone", None)
+            "id": str(s["session_id"]),
+            "user_id": str(s["user_id"]),
+            "title": s["title"].title(),
+            "created_at": s["created_at"].isoformat(),
+            "timezone": s.get("timezone")
         }
-        for s in valid_sessions
-    ]
-
-    serialized.sort(key=lambda x: x["created_at"], reverse=True)
-
-    total = len(serialized)
-    start = (page - 1) * limit
-    end = start + limit
-    paginated_data = serialized[start:end]
-
-    tz = ZoneInfo(paginated_data[0].get("timezone") or "UTC") if paginated_data else ZoneInfo("UTC")
-    current_date = datetime.now(tz).date()
-
-    buckets: Dict[str, List[Dict]] = {
-        "Today": [],
-        "Previous 7 days": [],
-        "Previous 30 days": [],
-    }
-
-    for s in paginated_data:
-        created_date = datetime.fromisoformat(s["created_at"]).date()
-        days_diff = (current_date - created_date).days
-
-        if days_diff == 0:
-            buckets["Today"].append(s)
-        elif 1 <= days_diff <= 7:
-            buckets["Previous 7 days"].append(s)
-        elif 8 <= days_diff <= 30:
-            buckets["Previous 30 days"].append(s)
-        else:
-            key = (
-                created_date.strftime("%B")
-                if created_date.year == current_date.year
-                else f"{created_date.strftime('%B')} {created_date.year}"
-            )
-            buckets.setdefault(key, []).append(s)
-
-    grouped_data = [
-        {"timeline": tl, "data": data}
-        for tl, data in buckets.items() if data
+        for s in sessions
     ]
 
     return {
-        "data": grouped_data,
-        "has_more": end < total
+        "data": group_sessions_by_timeline(serialized),
+        "has_more": has_more,
+        "next_cursor": encode_session_cursor(sessions[-1]["created_at"], sessions[-1]["_id"]) if has_more else None,
     }
 
 async def rename_session_title(user_id:str, session_id: str, new_title:str):
@@ -1174,6 +952,7 @@ async def delete_session(session_id: str):
             MapData.find(MapData.session_id == session_id).delete(),
             SessionLog.find(SessionLog.session_id == session_id).delete(),
             SessionHistory.find(SessionHistory.session_id == session_id).delete(),
+            SessionTurn.find(SessionTurn.session_id == session_id).delete(),
             ##Get message_ids at the same time (parallel)
             MessageOutput.find(MessageOutput.session_id == session_id).to_list(),
         ]
@@ -1181,7 +960,7 @@ async def delete_session(session_id: str):
         results = await asyncio.gather(*deletion_and_fetch_tasks, return_exceptions=True)
         print("Operation stop")
         # Check if session existed (if all deletions returned 0, session didn't exist)
-        deletion_results = results[:6]  # First 7 are deletions
+        deletion_results = results[:6]  # First 6 are deletions
         message_outputs = results[6]    # Last one is message_outputs
         
         total_deleted = sum(
@@ -1227,7 +1006,7 @@ async def delete_session(session_id: str):
         
         ##Build response (streamlined)
         deleted_items = []
-        deletion_names = ['message_outputs', 'message_logs', 'map_data', 'session_log', 'session_history']
+        deletion_names = ['message_outputs', 'message_logs', 'map_data', 'session_log', 'session_history', 'session_turns']
         
         for i, result in enumerate(deletion_results):
             if not isinstance(result, Exception) and hasattr(result, 'deleted_count') and result.deleted_count > 0:
@@ -1367,6 +1146,7 @@ async def delete_user(user_id: str) -> Dict[str, Any]:
         
         # Step 4: Delete user record (final step)
         await user.delete()
+        await principal_cache.invalidate(user_id)
         deleted_summary.append("User record")
         
         print(f"User {user_id} deletion completed successfully!")
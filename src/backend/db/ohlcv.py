@@ -0,0 +1,121 @@
+"""
+Columnar daily price series.
+
+`OHLCVSeries` holds the end-of-day history of one ticker as NumPy columns (date, open, high,
+low, close, volume) in ascending date order. Every period served to the agents is a slice of
+it (`since`), the weekly and monthly views keep the last trading day of each week or month
+(`resample`), and a daily update only appends the rows after the last stored date (`merge`).
+
+Series are persisted as one compressed `.npz` block per ticker (`to_block` / `from_block`).
+Their arrays are read-only, so slices and cached copies share memory.
+"""
+import io
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+
+COLUMNS = ("date", "open", "high", "low", "close", "volume")
+PRICE_COLUMNS = ("open", "high", "low", "close")
+
+
+def last_per_period(dates: np.ndarray, frequency: str) -> np.ndarray:
+    """
+    Indices of the last trading day of each week (Monday to Sunday, as ISO weeks) or month of
+    ascending `datetime64[D]` dates; every index for "1d" and unknown frequencies.
+    """
+    if frequency == "1wk":
+        # 1970-01-01 was a Thursday: shifting by three days makes each week start on a Monday
+        keys = (dates.astype(np.int64) + 3) // 7
+    elif frequency == "1mo":
+        keys = dates.astype("datetime64[M]")
+    else:
+        return np.arange(len(dates))
+    if len(keys) == 0:
+        return np.arange(0)
+    return np.flatnonzero(np.append(keys[1:] != keys[:-1], True))
+
+
+def _frozen(values: np.ndarray) -> np.ndarray:
+    values.flags.writeable = False
+    return values
+
+
+class OHLCVSeries:
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self.columns = {name: _frozen(np.asarray(columns[name])) for name in COLUMNS}
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __deepcopy__(self, memo):
+        # Immutable, so the LRU can hand out the same instance
+        return self
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self.columns["date"]
+
+    @property
+    def last_date(self) -> Optional[date]:
+        return self.dates[-1].astype(date) if len(self) else None
+
+    @classmethod
+    def empty(cls) -> "OHLCVSeries":
+        return cls({
+            "date": np.array([], dtype="datetime64[D]"),
+            **{name: np.array([], dtype=np.float64) for name in PRICE_COLUMNS},
+            "volume": np.array([], dtype=np.int64),
+        })
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> "OHLCVSeries":
+        """Series of FMP `historical-price-eod` rows, in any order; later duplicates of a date win."""
+        rows = [row for row in records if row.get("date")]
+        if not rows:
+            return cls.empty()
+        dates = np.array([str(row["date"])[:10] for row in rows], dtype="datetime64[D]")
+        columns = {name: np.array([float(row.get(name) or 0) for row in rows]) for name in PRICE_COLUMNS}
+        columns["volume"] = np.array([float(row.get("volume") or 0) for row in rows]).astype(np.int64)
+        # Reverse first so that `np.unique` keeps the last occurrence of each date
+        dates, order = np.unique(dates[::-1], return_index=True)
+        order = len(rows) - 1 - order
+        return cls({"date": dates, **{name: values[order] for name, values in columns.items()}})
+
+    def to_records(self, symbol: str) -> List[Dict[str, Any]]:
+        """Rows in the format of FMP's `historical-price-eod/full`, newest first."""
+        values = {name: self.columns[name][::-1].tolist() for name in COLUMNS[1:]}
+        dates = np.datetime_as_string(self.dates[::-1], unit="D").tolist()
+        return [
+            {"symbol": symbol, "date": day, **{name: values[name][i] for name in COLUMNS[1:]}}
+            for i, day in enumerate(dates)
+        ]
+
+    def _take(self, index) -> "OHLCVSeries":
+        return OHLCVSeries({name: values[index] for name, values in self.columns.items()})
+
+    def since(self, start: date) -> "OHLCVSeries":
+        """Rows dated `start` or later; a view of this series."""
+        return self._take(slice(np.searchsorted(self.dates, np.datetime64(start, "D")), None))
+
+    def resample(self, frequency: str) -> "OHLCVSeries":
+        """The last trading day of each week ("1wk") or month ("1mo"); the series itself for "1d"."""
+        if frequency not in ("1wk", "1mo"):
+            return self
+        return self._take(last_per_period(self.dates, frequency))
+
+    def merge(self, update: "OHLCVSeries") -> "OHLCVSeries":
+        """This series followed by `update`, whose rows replace those from its first date on."""
+        if not len(update):
+            return self
+        keep = np.searchsorted(self.dates, update.dates[0])
+        return OHLCVSeries({name: np.concatenate([values[:keep], update.columns[name]]) for name, values in self.columns.items()})
+
+    def to_block(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **self.columns)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_block(cls, block: bytes) -> "OHLCVSeries":
+        with np.load(io.BytesIO(block), allow_pickle=False) as arrays:
+            return cls({name: arrays[name] for name in COLUMNS})
@@ -0,0 +1,59 @@
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from beanie import PydanticObjectId
+from src.backend.models.model import MessageLog, SessionLog, SessionHistory, MessageFeedback, UploadResponse, ChartBotLogs, MapData, GraphLog, MessageOutput, SessionTurn
+
+VERIFY_QUERY_PLANS = os.getenv("MONGO_VERIFY_QUERY_PLANS", "true").lower() == "true"
+
+# (model, filter, sort) of the hot queries served by `mongodb.py`; only the field names and
+# operators matter to the planner, the values are placeholders.
+QUERY_SHAPES = [
+    (MessageLog, {"session_id": "", "message_id": ""}, None),
+    (MessageLog, {"session_id": ""}, [("created_at", 1)]),
+    (MessageLog, {"message_id": ""}, None),
+    (SessionLog, {"user_id": PydanticObjectId(), "visible": True}, [("created_at", -1), ("_id", -1)]),
+    (SessionLog, {"session_id": ""}, None),
+    (SessionLog, {"user_id": PydanticObjectId(), "title_prefixes": {"$all": [""]}, "visible": True}, [("created_at", -1), ("_id", -1)]),
+    (SessionHistory, {"session_id": "", "user_id": PydanticObjectId()}, None),
+    (SessionHistory, {"user_id": PydanticObjectId()}, None),
+    (SessionTurn, {"session_id": "", "message_id": ""}, None),
+    (SessionTurn, {"session_id": "", "created_at": {"$lte": datetime.min}}, [("created_at", -1), ("_id", -1)]),
+    (MessageFeedback, {"message_id": {"$in": [""]}}, None),
+    (UploadResponse, {"file_id": {"$in": [""]}}, None),
+    (ChartBotLogs, {"chat_session_id": ""}, [("created_at", 1)]),
+    (MapData, {"message_id": ""}, None),
+    (GraphLog, {"session_id": "", "message_id": ""}, None),
+    (MessageOutput, {"session_id": ""}, None),
+]
+
+
+def has_collscan(plan: Any) -> bool:
+    """True if any stage of an explain() winning plan is a collection scan."""
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(has_collscan(value) for value in plan.values())
+    if isinstance(plan, list):
+        return any(has_collscan(item) for item in plan)
+    return False
+
+
+async def find_collscans(shapes: Sequence[Tuple[Any, Dict[str, Any], Optional[List[Tuple[str, int]]]]]) -> List[str]:
+    """
+    Explain each (motor collection, filter, sort) shape and return a description of the ones
+    whose winning plan scans the whole collection.
+    """
+    offending = []
+    for collection, query, sort in shapes:
+        cursor = collection.find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        if has_collscan(explain.get("queryPlanner", {}).get("winningPlan")):
+            offending.append(f"{collection.name}: filter={list(query)} sort={sort}")
+    return offending
+
+
+async def verify_model_query_plans() -> List[str]:
+    return await find_collscans([(model.get_motor_collection(), query, sort) for model, query, sort in QUERY_SHAPES])
@@ -1,6 +1,7 @@
 from datetime import datetime, timezone
 from enum import Enum
 from beanie import Document
+from pymongo import ASCENDING, IndexModel
 from beanie.odm.fields import PydanticObjectId
 from pydantic import BaseModel, EmailStr, Field, field_validator
 from typing import Optional, Dict, Any, List, Generator, Annotated, Literal
@@ -89,6 +90,14 @@ class StockPredictionRequest(BaseModel):
     exchange_symbol: str
     message_id: Optional[str] = None
 
+class StockPredictionBatchItem(BaseModel):
+    company_name: str
+    ticker: str
+    exchange_symbol: str
+
+class StockPredictionBatchRequest(BaseModel):
+    items: List[StockPredictionBatchItem] = Field(..., min_length=1, max_length=25)
+
 class StockPredictionResponse(BaseModel):
     success: bool
     company_name: str
@@ -143,6 +152,9 @@ class Onboarding(Document):
 
     class Settings:
         collection = "onboarding"
+        indexes = [
+            IndexModel([("user_id", ASCENDING)])
+        ]
 
     class Config:
         arbitrary_types_allowed = True
@@ -1,9 +1,11 @@
 from datetime import datetime, timezone
 from enum import Enum
 from typing import Any, Dict, List, Literal, Optional
+import re
 import uuid
 
-from beanie import Document, PydanticObjectId
+from beanie import Document, PydanticObjectId, Insert, Replace, Save, SaveChanges, before_event
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from pydantic import BaseModel, EmailStr, Field, field_validator
 from src.ai.ai_schemas.validation_utils import validate_password_strength
 
@@ -34,6 +36,7 @@ class QueryRequestModel(BaseModel):
     doc_ids : list = []
     is_elaborate: bool = False
     is_example: bool = False
+    trace: Optional[bool] = None  # record a graph trace for this answer; None follows the sample rate
 
     @field_validator('message_id')
     @classmethod
@@ -54,6 +57,9 @@ class Users(Document):
 
     class Settings:
         collection = "users"
+        indexes = [
+            IndexModel([("email", ASCENDING)])
+        ]
 
     class Config:
         arbitrary_types_allowed = True
@@ -108,6 +114,9 @@ class Personalization(Document):
 
     class Settings:
         collection = "personalization"
+        indexes = [
+            IndexModel([("user_id", ASCENDING)])
+        ]
 
     class Config:
         arbitrary_types_allowed = True
@@ -152,9 +161,17 @@ class MessageLog(Document):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     time_taken: Optional[int] = 0
     access_level: AccessLevel = AccessLevel.PRIVATE
+    # Set while the answer is streaming; the fields above hold its last checkpoint
+    in_progress: Optional[bool] = False
+    checkpointed_at: Optional[datetime] = None
 
     class Settings:
         collection = "log_entries"
+        indexes = [
+            IndexModel([("session_id", ASCENDING), ("message_id", ASCENDING)]),
+            IndexModel([("session_id", ASCENDING), ("created_at", ASCENDING)]),
+            IndexModel([("message_id", ASCENDING), ("access_level", ASCENDING)])
+        ]
 
 
 class MessageFeedback(Document):
@@ -166,11 +183,30 @@ class MessageFeedback(Document):
 
     class Settings:
         collection = "message_feedback"
+        indexes = [
+            IndexModel([("message_id", ASCENDING), ("response_id", ASCENDING)])
+        ]
+
+TITLE_PREFIX_MAX_LENGTH = 20
+
+
+def title_search_terms(text: str) -> List[str]:
+    """Lower-cased words of `text`, truncated to the longest prefix kept in `title_prefixes`."""
+    return list(dict.fromkeys(word[:TITLE_PREFIX_MAX_LENGTH] for word in re.findall(r"\w+", text.lower())))
+
+
+def title_prefixes(title: str) -> List[str]:
+    """Every leading prefix of every word in the title, e.g. "Apple Q3" -> a, ap, ..., apple, q, q3."""
+    prefixes = dict.fromkeys(word[:i] for word in title_search_terms(title) for i in range(1, len(word) + 1))
+    return list(prefixes)
+
 
 class SessionLog(Document):
     user_id: PydanticObjectId
     session_id: str = Field(...)
     title: str = Field(...)
+    # Word prefixes of `title`, kept in sync on every write; backs the sidebar title search
+    title_prefixes: List[str] = Field(default_factory=list)
     access_level: AccessLevel = AccessLevel.PRIVATE
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -179,6 +215,15 @@ class SessionLog(Document):
 
     class Settings:
         collection = "sessions"
+        indexes = [
+            IndexModel([("user_id", ASCENDING), ("visible", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("session_id", ASCENDING), ("user_id", ASCENDING)]),
+            IndexModel([("user_id", ASCENDING), ("title_prefixes", ASCENDING), ("visible", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)])
+        ]
+
+    @before_event(Insert, Replace, Save, SaveChanges)
+    def index_title(self):
+        self.title_prefixes = title_prefixes(self.title or "")
 
     def to_dict(self) -> dict:
         """Convert model instance to dictionary with proper serialization"""
@@ -192,12 +237,18 @@ class SessionHistory(Document):
     user_id: PydanticObjectId
     session_id: str = Field(...)
     title: Optional[str] = "New Chat"
+    # Legacy turn list, turns are stored one per document in `SessionTurn`
+    # (see `src/backend/db/migrate_session_history.py`)
     history: List[dict] = []
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
     class Settings:
         collection = "session_histories"
+        indexes = [
+            IndexModel([("session_id", ASCENDING), ("user_id", ASCENDING)]),
+            IndexModel([("user_id", ASCENDING), ("updated_at", DESCENDING)])
+        ]
 
     def to_dict(self) -> dict:
         data = self.model_dump()
@@ -206,6 +257,24 @@ class SessionHistory(Document):
         return data
 
 
+class SessionTurn(Document):
+    user_id: PydanticObjectId
+    session_id: str = Field(...)
+    message_id: str = Field(...)
+    user_query: Optional[str] = None
+    assistant_response: Optional[str] = None
+    doc_ids: Optional[List[str]] = []
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    class Settings:
+        name = "session_turns"
+        indexes = [
+            IndexModel([("session_id", ASCENDING), ("created_at", DESCENDING)]),
+            IndexModel([("session_id", ASCENDING), ("message_id", ASCENDING)], unique=True)
+        ]
+
+
 class MessageOutput(Document):
     user_id: PydanticObjectId
     session_id: str = Field(...)
@@ -217,6 +286,9 @@ class MessageOutput(Document):
 
     class Settings:
         collection = "message_outputs"
+        indexes = [
+            IndexModel([("session_id", ASCENDING), ("message_id", ASCENDING)])
+        ]
 
     def to_dict(self) -> dict:
         data = self.model_dump()
@@ -232,6 +304,9 @@ class JSONBackup(Document):
 
     class Settings:
         collection = "json_backup"
+        indexes = [
+            IndexModel([("filename", ASCENDING)])
+        ]
 
 
 class CurrencyRates(BaseModel):
@@ -259,6 +334,9 @@ class ChartBotLogs(Document):
 
     class Settings:
         collection = "chart_bot_logs"
+        indexes = [
+            IndexModel([("chat_session_id", ASCENDING), ("created_at", ASCENDING)])
+        ]
 
 
 class SemiStaticData(Document):
@@ -270,16 +348,24 @@ class ExternalData(Document):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     class Settings:
         collection = "external_data"
+        indexes = [
+            IndexModel([("filename", ASCENDING)])
+        ]
 
 
 class GraphLog(Document):
     session_id: str
     message_id: str
-    logs: str
+    logs: Optional[str] = None  # legacy traces, one concatenated string per message
+    events: List[Dict[str, Any]] = []
+    dropped_events: int = 0
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
     class Settings:
         name = "graph_logs"
+        indexes = [
+            IndexModel([("session_id", ASCENDING), ("message_id", ASCENDING)])
+        ]
 
 
 class MapData(Document):
@@ -290,6 +376,10 @@ class MapData(Document):
 
     class Settings:
         collection = "map_data"
+        indexes = [
+            IndexModel([("message_id", ASCENDING)]),
+            IndexModel([("session_id", ASCENDING), ("message_id", ASCENDING)])
+        ]
 
 
 class UploadResponse(Document):
@@ -301,6 +391,16 @@ class UploadResponse(Document):
 
     class Settings:
         collection = "user_uploads"
+        indexes = [
+            IndexModel([("file_id", ASCENDING)]),
+            IndexModel([("user_id", ASCENDING)])
+        ]
+
+
+class UploadFileInfo(BaseModel):
+    """Projection of `UploadResponse` without the file blob."""
+    file_id: str
+    original_filename: Optional[str] = None
 
 class CompanyProfile(Document):
     symbol: str = Field(...)
@@ -309,6 +409,9 @@ class CompanyProfile(Document):
 
     class Settings:
         name = "company_profiles"
+        indexes = [
+            IndexModel([("symbol", ASCENDING)], unique=True)
+        ]
 class FMPResult(BaseModel):
     symbol: str
     name: str
@@ -324,6 +427,9 @@ class FMPQueryResult(Document):
 
     class Settings:
         name = "fmp_query_results"
+        indexes = [
+            IndexModel([("query", ASCENDING)], unique=True)
+        ]
 class HistoricalData(Document):
     ticker: str
     period: str
@@ -332,6 +438,23 @@ class HistoricalData(Document):
 
     class Settings:
         name = "historical_data"
+        indexes = [
+            IndexModel([("ticker", ASCENDING), ("period", ASCENDING)])
+        ]
+
+class TickerPriceSeries(Document):
+    ticker: str
+    block: bytes  # compressed columnar OHLCV arrays, see src/backend/db/ohlcv.py
+    first_date: Optional[str] = None
+    last_date: Optional[str] = None
+    rows: int = 0
+    last_updated: datetime = Field(default_factory=datetime.now)
+
+    class Settings:
+        name = "ohlcv_series"
+        indexes = [
+            IndexModel([("ticker", ASCENDING)], unique=True)
+        ]
 
 class FinancialStatement(Document):
     symbol: str
@@ -342,6 +465,9 @@ class FinancialStatement(Document):
 
     class Settings:
         name = "financial_statements"
+        indexes = [
+            IndexModel([("symbol", ASCENDING), ("statement_type", ASCENDING), ("period", ASCENDING)], unique=True)
+        ]
 
 
 class StockDataRequest(BaseModel):
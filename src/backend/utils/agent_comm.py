@@ -8,7 +8,7 @@ import time
 import asyncio
 import src.backend.db.mongodb as mongodb
 from src.ai.llm.config import CountUsageMetricsPricingConfig
-from src.ai.llm.model import get_llm
+from src.ai.llm.usage_tracker import USAGE_SCOPE, usage_tracker
 
 agent_graph_instance = InsightAgentGraph()
 
@@ -18,7 +18,7 @@ cmp = CountUsageMetricsPricingConfig()
 async def process_agent_input_functional(user_id: str, session_id: str, user_query: str, message_id: str, prev_message_id: str, realtime_info: bool, pro_reasoning: bool, retry_response: bool, timezone: str, ip_address:str, doc_ids: Optional[List[str]] = []) -> AsyncGenerator[Dict[str, Any], None]:
     start_time = time.monotonic()
     sources_for_message = []
-    query_metadata = {'input_tokens': 0, 'output_tokens': 0, 'total_tokens': 0, 'token_cost': 0.0}
+    query_metadata = {'input_tokens': 0, 'cached_input_tokens': 0, 'output_tokens': 0, 'total_tokens': 0, 'token_cost': 0.0}
     final_response_content = "No response generated"
     collect_response = ""
 
@@ -51,14 +51,15 @@ async def process_agent_input_functional(user_id: str, session_id: str, user_que
         # model = token_usage.get('model', 'gemini/gemini-2.5-pro')
 
         # pricing = PRICING.get(model, PRICING["gemini/gemini-2.5-pro"])
-        model = token_usage.get(get_llm(cmp.MODEL))
-        pricing = PRICING.get(model, PRICING.get[cmp.MODEL])
+        pricing = PRICING.get(token_usage.get('model'), PRICING[cmp.MODEL])
+        cached_input_tokens = token_usage.get("cached_input_tokens", 0)
 
-        input_cost = pricing["input"] * token_usage.get("input_tokens", 0)
+        input_cost = pricing["input"] * (token_usage.get("input_tokens", 0) - cached_input_tokens) + pricing["cached_input"] * cached_input_tokens
         output_cost = pricing["output"] * token_usage.get("output_tokens", 0)
         total_cost = input_cost + output_cost
 
         query_metadata["input_tokens"] += token_usage.get("input_tokens", 0)
+        query_metadata["cached_input_tokens"] += cached_input_tokens
         query_metadata["output_tokens"] += token_usage.get("output_tokens", 0)
         query_metadata["total_tokens"] += token_usage.get("total_tokens", 0)
         query_metadata["token_cost"] += total_cost
@@ -69,8 +70,10 @@ async def process_agent_input_functional(user_id: str, session_id: str, user_que
     config = {
         "configurable": {
             "thread_id": message_id},
+        "metadata": {USAGE_SCOPE: str(message_id)},
         "recursion_limit": 50
     }
+    usage_tracker.start(message_id)
 
     retry_count = 0
     if retry_response:
@@ -95,8 +98,7 @@ async def process_agent_input_functional(user_id: str, session_id: str, user_que
         "prev_doc_ids": prev_session_data.get('doc_ids', []),
     }
     yield {"enriched_content": store_current_message("human_input", input_data)}
-    message_logs = f"HUMAN INPUT\n{str(input_data)}\n\n"
-    yield {"message_logs": message_logs}
+    yield {"trace": ("human_input", input_data)}
     insight_agent_runnable = agent_graph_instance.get_graph()
 
     TOOL_CALLING_AGENTS = {"DB Search Agent", "Web Search Agent", "Finance Data Agent", "Coding Agent", "Social Media Scrape Agent"}
@@ -105,8 +107,7 @@ async def process_agent_input_functional(user_id: str, session_id: str, user_que
 
         async for agent_id, stream_mode, update in insight_agent_runnable.astream(input_data, config, stream_mode=["updates", "messages", "custom"], subgraphs=True):
             if stream_mode == 'updates':
-                message_logs = f"AGENT UPDATE\n{str((agent_id, stream_mode, update))}\n\n"
-                yield {"message_logs": message_logs}
+                yield {"trace": ("agent_update", (agent_id, stream_mode, update))}
 
             if stream_mode == 'custom':
                 if 'source_update' in update:
@@ -115,6 +116,10 @@ async def process_agent_input_functional(user_id: str, session_id: str, user_que
 
             if stream_mode == "updates" and not agent_id:
                 update_key = list(update.keys())[0]
+                if update_key == "Query Intent Detector":
+                    intent_update = update[update_key] or {}
+                    # Read by the response cache to decide whether and how long to keep the answer
+                    yield {"cache_hints": {key: intent_update.get(key) for key in ("query_tag", "query_intent", "is_relevant_query")}}
                 if update_key in TOOL_CALLING_AGENTS:
                     continue
 
@@ -123,8 +128,7 @@ async def process_agent_input_functional(user_id: str, session_id: str, user_que
 
             msg_to_yield = await format_langgraph_message((agent_id, stream_mode, update))
             if msg_to_yield:
-                message_logs = f"FORMATTED MESSAGE\n{str(msg_to_yield)}\n\n"
-                yield {"message_logs": message_logs}
+                yield {"trace": ("formatted_message", msg_to_yield)}
 
             if isinstance(msg_to_yield, dict):
                 if 'token_usage' in msg_to_yield:
@@ -198,13 +202,14 @@ async def process_agent_input_functional(user_id: str, session_id: str, user_que
 
             yield final_data_event
 
-        yield {"store_data":{}, 'notification': True, 'suggestions': True, 'retry': True}
+        for token_usage in await usage_tracker.collect(message_id):
+            count_usage_metrics(token_usage)
+        yield {"store_data": {"metadata": query_metadata}, 'notification': True, 'suggestions': True, 'retry': True}
 
     except Exception as e:
         error_msg = f"Error in agent processing: {traceback.format_exc()}"
         print(error_msg)
-        message_logs = f"ERROR MESSAGE\n{str(error_msg)}\n\n"
-        yield {"message_logs": message_logs}
+        yield {"trace": ("error", error_msg)}
         error_event = {'error': error_msg}
         yield error_event
 
@@ -215,4 +220,5 @@ async def process_agent_input_functional(user_id: str, session_id: str, user_que
         yield {"store_data": {}, 'notification': False, 'suggestions': False, 'retry': True}
 
     finally:
-        pass
+        usage_tracker.pop(message_id)
+        agent_graph_instance.release_thread(message_id)
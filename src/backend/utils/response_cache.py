@@ -0,0 +1,365 @@
+"""
+Cache of streamed answers for repeated finance questions.
+
+The items an answer's processor yields are recorded and, once the answer completed without an
+error, stored in Redis under its normalized question. A later first question of a session with
+the same normalized text, or with an embedding close enough to a stored question with the same
+content words (tickers, names, figures, metrics), is answered by replaying those items through
+the normal SSE path instead of running the agents. Questions are only embedded when a stored
+question shares their content words; new answers are indexed in the background.
+
+Entries are scoped by search mode, realtime flag, timezone and the user's response preference,
+and live as long as the intents the Intent Detector assigned allow: realtime answers expire
+within minutes, factual and historical ones after a day. Fast mode has no Intent Detector, so its
+answers are only kept when the fast agent answered with finance data, and for minutes at most.
+Greetings and "continue"-style turns have no subject of their own and are never cached.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+import src.backend.db.mongodb as mongodb
+from src.ai.llm.config import ResponseCacheConfig
+from src.ai.llm.model import aget_embedding
+from src.backend.utils.api_utils import RedisManager, redis_manager
+from src.backend.utils.utils import get_date_time, get_unique_stock_data_id
+
+logger = logging.getLogger("uvicorn")
+
+rcc = ResponseCacheConfig()
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+CACHE_KEY_PREFIX = "respcache:"
+MAX_INDEX_ENTRIES = 256  # stored questions compared per scope and entity signature
+EMBEDDING_TIMEOUT = 2.0  # seconds; past this the lookup falls back to exact matches only
+
+# Freshness per query_intent; an answer lives as long as its most volatile intent allows and
+# intents missing here (casual, translation, duplicate-query, ...) are never cached
+INTENT_TTLS = {
+    "realtime": 2 * 60,
+    "calculation": 15 * 60,
+    "analytical": 15 * 60,
+    "general": 60 * 60,
+    "historical": 24 * 60 * 60,
+    "factual": 24 * 60 * 60,
+    "definitions": 7 * 24 * 60 * 60,
+}
+REALTIME_TAG = "Real-Time Data"
+FAST_MODE_TTL = INTENT_TTLS["realtime"]  # upper bound for fast mode, whose answers carry live prices
+INDEX_TTL = max(INTENT_TTLS.values())
+
+_WORD = re.compile(r"[\w$%.]+")
+
+# Words that do not tell one question's subject from another's; every other word is part of the
+# entity signature, whatever its case
+STOPWORDS = frozenset("""
+    a about all an and any are as at be been by can could current currently did do does for from
+    give has have how i in is it its latest like list me my now of on or please provide show so
+    some tell than that the their them then there these this those to today was we were what
+    when where which who why will with would you your
+""".split())
+
+# Words of turns that lean on the conversation rather than ask about something: a question made
+# of these and stopwords alone ("hi", "thanks", "continue", "tell me more") is never cached
+FOLLOW_UP_WORDS = frozenset("""
+    again bye continue cool elaborate else expand explain further go good great hello hey hi
+    more next no nope ok okay rest same sure thank thanks yeah yes
+""".split())
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def normalize_query(text: str) -> str:
+    """Lowercased words of the question without punctuation."""
+    words = (word.strip(".") for word in _WORD.findall(text.lower()))
+    return " ".join(word for word in words if word)
+
+
+def entity_signature(text: str) -> str:
+    """
+    Content words of the question, lowercased: every word but stopwords and single letters.
+    Semantic matches must agree on these, so "nvda earnings" never answers "amd earnings" and
+    "price of tesla" never answers "price of nvidia"; only the wording around them may differ.
+    """
+    words = normalize_query(text).split()
+    return " ".join(sorted({word for word in words if len(word) > 1 and word not in STOPWORDS}))
+
+
+def is_follow_up(text: str) -> bool:
+    """Whether the question has no content word beyond greetings and continuation words."""
+    return set(entity_signature(text).split()) <= FOLLOW_UP_WORDS
+
+
+def answer_ttl(search_mode: str, hints: Dict[str, Any]) -> Optional[int]:
+    """Seconds an answer stays fresh, or None if it must not be cached."""
+    if hints.get('is_relevant_query') is False:
+        return None
+    if search_mode == 'fast' and not hints.get('is_relevant_query'):
+        # The fast agent only vouches for queries it answered with finance data
+        return None
+    intents = hints.get('query_intent') or []
+    if not intents or any(intent not in INTENT_TTLS for intent in intents):
+        return None
+    ttl = min(INTENT_TTLS[intent] for intent in intents)
+    if REALTIME_TAG in (hints.get('query_tag') or []):
+        ttl = min(ttl, INTENT_TTLS["realtime"])
+    if search_mode == 'fast':
+        ttl = min(ttl, FAST_MODE_TTL)
+    return ttl
+
+
+def readdress_chart(item: Dict[str, Any], chart_ids: Dict[str, str]) -> Dict[str, Any]:
+    """
+    A `stock_data` item with its chart session swapped for one of this replay: chart-bot logs
+    are looked up by that id alone, so a replayed chart must never share the original's.
+    """
+    if item.get('type') != 'stock_data' or not isinstance(item.get('data'), dict):
+        return item
+    original = item.get('chat_session_id') or item['data'].get('chart_session_id')
+    if not original:
+        return item
+    chart_session_id = chart_ids.setdefault(original, get_unique_stock_data_id())
+    item = {**item, "data": {**item['data'], "chart_session_id": chart_session_id}}
+    if 'chat_session_id' in item:
+        item['chat_session_id'] = chart_session_id
+    return item
+
+
+class CacheKey(NamedTuple):
+    scope: str
+    query: str
+    signature: str
+
+    def entry(self, query_hash: Optional[str] = None) -> str:
+        return f"{CACHE_KEY_PREFIX}entry:{self.scope}:{query_hash or _digest(self.query)}"
+
+    @property
+    def index(self) -> str:
+        return f"{CACHE_KEY_PREFIX}index:{self.scope}:{_digest(self.signature)}"
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        manager: RedisManager,
+        enabled: bool = RESPONSE_CACHE_ENABLED,
+        embedding_model: str = rcc.EMBEDDING_MODEL,
+        threshold: float = rcc.SIMILARITY_THRESHOLD,
+        max_index_entries: int = MAX_INDEX_ENTRIES,
+    ):
+        self.manager = manager
+        self.enabled = enabled
+        self.embedding_model = embedding_model
+        self.threshold = threshold
+        self.max_index_entries = max_index_entries
+        self._indexing = set()
+
+    async def key_for(
+        self,
+        user_id: str,
+        session_id: str,
+        prev_message_id: str,
+        user_query: str,
+        search_mode: str,
+        realtime_info: bool,
+        timezone: str,
+        retry_response: bool,
+        doc_ids: Optional[List[str]],
+    ) -> Optional[CacheKey]:
+        """
+        Cache key of a request, or None when its answer depends on more than the question:
+        retries, uploaded documents, greetings and follow-ups within a conversation are never cached.
+        """
+        if not self.enabled or retry_response or doc_ids or not user_query or search_mode == 'summarizer':
+            return None
+        if is_follow_up(user_query):
+            return None
+        try:
+            if prev_message_id:
+                history = await mongodb.get_session_history_from_db(session_id, prev_message_id, limit=1)
+                if history.get('messages'):
+                    return None
+            personalization = await mongodb.get_personalization(user_id) or {}
+        except Exception as e:
+            logger.warning(f"Response cache skipped for session {session_id}: {e}")
+            return None
+
+        query = normalize_query(user_query)
+        if not query:
+            return None
+        scope = [search_mode, bool(realtime_info), timezone, personalization.get('response_preference')]
+        return CacheKey(_digest(json.dumps(scope))[:16], query, entity_signature(user_query))
+
+    async def _embed(self, text: str) -> Optional[np.ndarray]:
+        try:
+            vector = np.asarray(await asyncio.wait_for(aget_embedding(text, self.embedding_model), EMBEDDING_TIMEOUT), dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Response cache embedding failed: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    async def _nearest(self, key: CacheKey, embedding: np.ndarray) -> Optional[str]:
+        """Hash of the most similar live question above the threshold; prunes the index as it goes."""
+        records = await self.manager.safe_execute("hgetall", key.index)
+        if not records:
+            return None
+
+        now = time.time()
+        live: List[Tuple[float, str, np.ndarray]] = []
+        stale = []
+        for query_hash, raw in records.items():
+            record = json.loads(raw)
+            if record["expires_at"] <= now:
+                stale.append(query_hash)
+            else:
+                live.append((record["expires_at"], query_hash, np.frombuffer(base64.b64decode(record["embedding"]), dtype=np.float32)))
+        if len(live) > self.max_index_entries:
+            live.sort(key=lambda record: record[0])
+            stale.extend(query_hash for _, query_hash, _ in live[:len(live) - self.max_index_entries])
+            live = live[len(live) - self.max_index_entries:]
+        if stale:
+            await self.manager.safe_execute("hdel", key.index, *stale)
+        if not live:
+            return None
+
+        scores = np.stack([vector for _, _, vector in live]) @ embedding
+        best = int(np.argmax(scores))
+        return live[best][1] if scores[best] >= self.threshold else None
+
+    async def lookup(self, key: CacheKey) -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+        """
+        The cached answer for `key` if any, and the question's embedding if one was computed.
+        The question is only embedded when stored questions share its entity signature, so a
+        miss with nothing to compare against costs one Redis round-trip, not an embedding call.
+        """
+        embedding = None
+        try:
+            cached = await self.manager.safe_execute("get", key.entry())
+            if cached is None and key.signature and await self.manager.safe_execute("exists", key.index):
+                embedding = await self._embed(key.query)
+                match = await self._nearest(key, embedding) if embedding is not None else None
+                if match is not None:
+                    cached = await self.manager.safe_execute("get", key.entry(match))
+            return (json.loads(cached) if cached else None), embedding
+        except Exception as e:
+            logger.warning(f"Response cache lookup failed: {e}")
+            return None, embedding
+
+    async def store(self, key: CacheKey, embedding: Optional[np.ndarray], items: List[Dict[str, Any]], ttl: int):
+        """Stores the answer for exact matches, then indexes it for semantic ones in the background."""
+        try:
+            answer = json.dumps({"query": key.query, "items": items, "stored_at": time.time()}, default=str)
+            await self.manager.safe_execute("set", key.entry(), answer, ex=ttl)
+        except Exception as e:
+            logger.warning(f"Response cache store failed: {e}")
+            return
+        if key.signature:
+            task = asyncio.create_task(self._index(key, embedding, ttl))
+            self._indexing.add(task)
+            task.add_done_callback(self._indexing.discard)
+
+    async def _index(self, key: CacheKey, embedding: Optional[np.ndarray], ttl: int):
+        if embedding is None:
+            embedding = await self._embed(key.query)
+            if embedding is None:
+                return
+        try:
+            record = {"embedding": base64.b64encode(embedding.astype(np.float32).tobytes()).decode("ascii"), "expires_at": time.time() + ttl}
+            await self.manager.safe_execute("hset", key.index, _digest(key.query), json.dumps(record))
+            await self.manager.safe_execute("expire", key.index, INDEX_TTL)
+        except Exception as e:
+            logger.warning(f"Response cache index update failed: {e}")
+
+    async def _replay(self, cached: Dict[str, Any], user_id: str, session_id: str, message_id: str, user_query: str, timezone: str) -> AsyncIterator[Dict[str, Any]]:
+        """The recorded items re-addressed to this message and its own charts, persisted like a generated answer."""
+        started = time.monotonic()
+        local_time = get_date_time(timezone)
+        created_at = local_time.isoformat()
+        response = ""
+        chart_ids: Dict[str, str] = {}
+        await mongodb.store_user_query(user_id, session_id, message_id, user_query, timezone, [])
+
+        for item in cached["items"]:
+            if 'start_stream' in item:
+                yield {"start_stream": str(message_id)}
+                yield {"enriched_content": {"user_query": user_query, "doc_ids": [], "created_at": created_at}}
+                continue
+            if 'time' in item:
+                seconds = int(time.monotonic() - started)
+                yield {"time": f"{seconds} sec", "message_id": message_id, "in_seconds": seconds}
+                continue
+            if item.get('enriched_content'):
+                content = readdress_chart({**item['enriched_content'], "created_at": created_at}, chart_ids)
+                if 'response' in content:
+                    response = content['response']
+                item = {"enriched_content": content}
+            elif 'state' in item:
+                await mongodb.update_session_history_in_db(session_id, user_id, message_id, user_query, response, [], local_time, timezone)
+            elif 'store_data' in item:
+                item = {**item, "store_data": {}}  # a replay uses no tokens
+            elif item.get('type') == 'stock_data':
+                item = readdress_chart(item, chart_ids)
+            elif 'message_id' in item:
+                item = {**item, "message_id": message_id}
+            yield item
+
+    async def serve(
+        self,
+        processor: AsyncIterator[Dict[str, Any]],
+        key: Optional[CacheKey],
+        user_id: str,
+        session_id: str,
+        message_id: str,
+        user_query: str,
+        search_mode: str,
+        timezone: str,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        The items of `processor`, or of the cached answer for `key` without starting the
+        processor at all. A generated answer is stored before its `store_data` item is passed on,
+        since the consumer stops reading there.
+        """
+        if key is None:
+            async for item in processor:
+                if 'cache_hints' not in item:
+                    yield item
+            return
+
+        cached, embedding = await self.lookup(key)
+        if cached is not None:
+            await processor.aclose()
+            async for item in self._replay(cached, user_id, session_id, message_id, user_query, timezone):
+                yield item
+            return
+
+        recorded: List[Dict[str, Any]] = []
+        hints: Dict[str, Any] = {}
+        failed = completed = False
+        async for item in processor:
+            if 'cache_hints' in item:
+                hints.update(item['cache_hints'])
+                continue
+            if 'error' in item:
+                failed = True
+            elif 'state' in item:
+                completed = True
+            if 'trace' not in item and not ('enriched_content' in item and 'user_query' in (item['enriched_content'] or {})):
+                # The human input carries the asking user's metadata; replays write their own
+                recorded.append(item)
+            if 'store_data' in item and completed and not failed:
+                ttl = answer_ttl(search_mode, hints)
+                if ttl:
+                    await self.store(key, embedding, recorded, ttl)
+            yield item
+
+
+response_cache = ResponseCache(redis_manager)
@@ -0,0 +1,151 @@
+"""
+Coalescing of concurrent identical fetches.
+
+`SingleFlight.run(key, fetch)` starts `fetch` for the first caller of a key; every caller that
+arrives while it is in flight awaits the same task, and each caller gets its own copy of the
+result (or the same exception). The fetch runs as its own task, so a caller that is cancelled
+does not cancel it for the others.
+
+`RedisLock` extends this across workers: the worker holding the lock of a key does the fetch and
+stores the result, the others wait for the lock to be released and read what was stored. When
+Redis is unavailable every worker fetches on its own, as before.
+"""
+import asyncio
+import copy
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+from redis.asyncio import Redis
+
+logger = logging.getLogger("uvicorn")
+
+T = TypeVar("T")
+
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _consume_exception(task: asyncio.Task):
+    # Nobody may be left to await a failed fetch; reading the exception silences the warning
+    if not task.cancelled():
+        task.exception()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.started = 0  # fetches started
+        self.coalesced = 0  # callers served by a fetch another caller started
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    async def run(self, key: Hashable, fetch: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            task.add_done_callback(_consume_exception)
+            self.started += 1
+        else:
+            self.coalesced += 1
+        return copy.deepcopy(await asyncio.shield(task))
+
+
+class RedisLock:
+    def __init__(
+        self,
+        redis_config: Optional[Dict[str, Any]],
+        ttl: int = 30,
+        wait: float = 15.0,
+        poll_interval: float = 0.1,
+        failure_cooldown: float = 30.0,
+        prefix: str = "lock:",
+    ):
+        """`redis_config` holds the `Redis` arguments; None disables the lock."""
+        self.redis_config = redis_config
+        self.ttl = ttl
+        self.wait = wait
+        self.poll_interval = poll_interval
+        self.failure_cooldown = failure_cooldown
+        self.prefix = prefix
+        self._client: Optional[Redis] = None
+        self._failed_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self.redis_config is not None and time.monotonic() >= self._failed_until
+
+    @property
+    def client(self) -> Redis:
+        # Created on first use, on the event loop of the caller, which then owns its connections
+        if self._client is None:
+            self._client = Redis(**self.redis_config)
+        return self._client
+
+    def _fail(self, error: Exception):
+        logger.warning(f"Redis lock unavailable for {self.failure_cooldown}s: {error}")
+        self._failed_until = time.monotonic() + self.failure_cooldown
+
+    async def _acquire(self, key: str) -> Optional[str]:
+        """Token of the acquired lock, None if another worker holds it, "" without Redis."""
+        if not self.available:
+            return ""
+        token = uuid.uuid4().hex
+        try:
+            return token if await self.client.set(key, token, nx=True, ex=self.ttl) else None
+        except Exception as e:
+            self._fail(e)
+            return ""
+
+    async def _wait_released(self, key: str):
+        deadline = time.monotonic() + self.wait
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                if not await self.client.exists(key):
+                    return
+            except Exception as e:
+                self._fail(e)
+                return
+
+    async def _release(self, key: str, token: str):
+        try:
+            await self.client.eval(RELEASE_SCRIPT, 1, key, token)
+        except Exception as e:
+            self._fail(e)
+
+    @asynccontextmanager
+    async def hold(self, name: str) -> AsyncIterator[bool]:
+        """
+        Yields True while this worker holds the lock of `name` (or Redis is unavailable), and
+        False once another worker that held it released it or the wait timed out.
+        """
+        key = f"{self.prefix}{name}"
+        token = await self._acquire(key)
+        if token is None:
+            await self._wait_released(key)
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            if token:
+                await self._release(key, token)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
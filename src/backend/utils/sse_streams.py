@@ -0,0 +1,139 @@
+"""
+Durable delivery of streamed answers.
+
+Generation runs in its own task and appends every SSE frame to the Redis Stream
+`sse:{message_id}`, and the user it belongs to is kept beside it in `sse:{message_id}:owner`;
+the request that started it reads the frames from an in-process queue.
+If the client goes away the answer keeps being generated and stored, and the client can
+reconnect to any worker with `Last-Event-ID` to replay the stream from that entry on.
+"""
+import asyncio
+import logging
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable, Optional, Set, Union
+from src.backend.utils.api_utils import RedisManager, redis_manager
+
+logger = logging.getLogger("uvicorn")
+
+STREAM_KEY_PREFIX = "sse:"
+STREAM_TTL = 60 * 60  # seconds a stream stays replayable after its last frame
+STREAM_MAXLEN = 10000  # entries kept per answer
+REPLAY_BLOCK_MS = 5000
+REPLAY_MAX_IDLE = 60  # consecutive empty reads (about 5 minutes) before a replay gives up
+
+
+def with_event_id(frame: str, event_id: Optional[str]) -> bytes:
+    if event_id:
+        frame = f"id: {event_id}\n{frame}"
+    return frame.encode("utf-8")
+
+
+class SSEStreamStore:
+    def __init__(self, manager: RedisManager, ttl: int = STREAM_TTL, maxlen: int = STREAM_MAXLEN):
+        self.manager = manager
+        self.ttl = ttl
+        self.maxlen = maxlen
+        self._producers: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def key(message_id: str) -> str:
+        return f"{STREAM_KEY_PREFIX}{message_id}"
+
+    @staticmethod
+    def owner_key(message_id: str) -> str:
+        # Not an entry of the stream, which MAXLEN trims from the start
+        return f"{STREAM_KEY_PREFIX}{message_id}:owner"
+
+    async def _append(self, message_id: str, fields: dict) -> Optional[str]:
+        # Delivery to the connected client must not depend on Redis being up
+        try:
+            event_id = await self.manager.safe_execute("xadd", self.key(message_id), fields, maxlen=self.maxlen, approximate=True)
+            # Refreshed on every entry, so a stream whose worker died expires instead of staying forever
+            await self.manager.safe_execute("expire", self.key(message_id), self.ttl)
+            return event_id
+        except Exception as e:
+            logger.warning(f"Could not append to stream of message {message_id}: {e}")
+            return None
+
+    async def _start(self, user_id: str, message_id: str):
+        # A retry reuses the message id: its frames must not follow the previous run's end marker
+        try:
+            await self.manager.safe_execute("delete", self.key(message_id))
+            await self.manager.safe_execute("set", self.owner_key(message_id), user_id, ex=self.ttl)
+        except Exception as e:
+            logger.warning(f"Could not reset the stream of message {message_id}: {e}")
+
+    async def _finish(self, message_id: str):
+        await self._append(message_id, {"end": "1"})
+        try:
+            await self.manager.safe_execute("expire", self.owner_key(message_id), self.ttl)
+        except Exception as e:
+            logger.warning(f"Could not set expiry on stream of message {message_id}: {e}")
+
+    def run(
+        self,
+        user_id: str,
+        message_id: str,
+        frames: AsyncIterator[Union[str, bytes]],
+        on_complete: Optional[Callable[[], Awaitable[None]]] = None,
+    ) -> AsyncGenerator[bytes, None]:
+        """
+        Start draining `frames` into the stream in a background task and return the frames
+        (tagged with their stream ids) for the current response. `on_complete` runs once the
+        generation is over, whether or not the client is still connected.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def produce():
+            try:
+                await self._start(user_id, message_id)
+                async for frame in frames:
+                    if isinstance(frame, bytes):
+                        frame = frame.decode("utf-8")
+                    event_id = await self._append(message_id, {"frame": frame})
+                    queue.put_nowait(with_event_id(frame, event_id))
+            except Exception as e:
+                logger.error(f"Stream producer for message {message_id} failed: {e}")
+            finally:
+                await self._finish(message_id)
+                queue.put_nowait(None)
+                if on_complete is not None:
+                    await on_complete()
+
+        task = asyncio.create_task(produce())
+        self._producers.add(task)
+        task.add_done_callback(self._producers.discard)
+
+        async def deliver():
+            while True:
+                frame = await queue.get()
+                if frame is None:
+                    return
+                yield frame
+
+        return deliver()
+
+    async def owner(self, message_id: str) -> Optional[str]:
+        """User id the stream was started for, or None if there is no stream."""
+        return await self.manager.safe_execute("get", self.owner_key(message_id))
+
+    async def replay(self, message_id: str, last_event_id: Optional[str] = None) -> AsyncGenerator[bytes, None]:
+        """Frames after `last_event_id` (all of them if None), following the stream until it ends."""
+        key = self.key(message_id)
+        last_id = last_event_id or "0-0"
+        idle = 0
+        while idle < REPLAY_MAX_IDLE:
+            response = await self.manager.safe_execute("xread", {key: last_id}, count=100, block=REPLAY_BLOCK_MS)
+            if not response:
+                idle += 1
+                yield b": keep-alive\n\n"
+                continue
+            idle = 0
+            for entry_id, fields in response[0][1]:
+                last_id = entry_id
+                if "end" in fields:
+                    return
+                if "frame" in fields:
+                    yield with_event_id(fields["frame"], entry_id)
+
+
+sse_streams = SSEStreamStore(redis_manager)
@@ -0,0 +1,110 @@
+"""
+Push-based stop channel for streamed answers.
+
+`/stop-generation` publishes the message id on the Redis channel `stop:{session_id}`. Every
+worker keeps one pattern subscription open and fans those messages out to the
+`asyncio.Event`s of the streams it is serving, so a stream reacts as soon as the stop
+arrives instead of polling a Redis key on every event.
+"""
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+from src.backend.utils.api_utils import RedisManager, redis_manager
+
+logger = logging.getLogger("uvicorn")
+
+STOP_CHANNEL_PREFIX = "stop:"
+STOP_KEY_TTL = 30  # seconds; covers a stop that lands before the stream subscribed
+
+
+class StopSignalListener:
+    def __init__(self, manager: RedisManager):
+        self.manager = manager
+        self._events: Dict[Tuple[str, str], asyncio.Event] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self):
+        delay = 1
+        while True:
+            pubsub = None
+            try:
+                pubsub = self.manager.client.pubsub(ignore_subscribe_messages=True)
+                await pubsub.psubscribe(f"{STOP_CHANNEL_PREFIX}*")
+                delay = 1
+                async for message in pubsub.listen():
+                    self._dispatch(message.get("channel"), message.get("data"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Stop signal subscription failed, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
+    def _dispatch(self, channel, message_id):
+        if isinstance(channel, bytes):
+            channel = channel.decode("utf-8")
+        if isinstance(message_id, bytes):
+            message_id = message_id.decode("utf-8")
+        if not channel or not channel.startswith(STOP_CHANNEL_PREFIX):
+            return
+        event = self._events.get((channel[len(STOP_CHANNEL_PREFIX):], message_id))
+        if event is not None:
+            event.set()
+
+    async def subscribe(self, session_id: str, message_id: str) -> asyncio.Event:
+        """
+        Event set when a stop is requested for this message. The stop key is read once here,
+        so a stop published just before the stream started is not lost.
+        """
+        event = self._events.setdefault((session_id, message_id), asyncio.Event())
+        try:
+            if await self.manager.safe_execute("get", f"{STOP_CHANNEL_PREFIX}{session_id}") == message_id:
+                event.set()
+        except Exception as e:
+            logger.warning(f"Could not read stop key for session {session_id}: {e}")
+        return event
+
+    def unsubscribe(self, session_id: str, message_id: str):
+        self._events.pop((session_id, message_id), None)
+
+    async def request_stop(self, session_id: str, message_id: str):
+        key = f"{STOP_CHANNEL_PREFIX}{session_id}"
+        await self.manager.safe_execute("set", key, message_id, ex=STOP_KEY_TTL)
+        await self.manager.safe_execute("publish", key, message_id)
+
+    async def reset(self, session_id: str, message_id: str):
+        """
+        Drop a stop left for an earlier run of this message (e.g. before a retry), so that only
+        stops requested from now on end the new run.
+        """
+        key = f"{STOP_CHANNEL_PREFIX}{session_id}"
+        try:
+            if await self.manager.safe_execute("get", key) == message_id:
+                await self.manager.safe_execute("delete", key)
+        except Exception as e:
+            logger.warning(f"Could not reset stop key for session {session_id}: {e}")
+
+    async def clear(self, session_id: str):
+        await self.manager.safe_execute("delete", f"{STOP_CHANNEL_PREFIX}{session_id}")
+
+
+stop_signals = StopSignalListener(redis_manager)
@@ -0,0 +1,150 @@
+"""
+Coalescing of streamed token chunks into SSE frames.
+
+Consecutive chunk events of the same run (type, agent and response id) are merged into one
+frame, which is flushed when the run changes or when any of the limits is reached: the oldest
+buffered token has waited `max_latency` seconds, the buffered text reaches `max_bytes`, or
+`max_tokens` chunks are buffered. The latency limit keeps a slow token stream as responsive
+as sending every token, while fast streams go out in a few large frames.
+"""
+import asyncio
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+MAX_LATENCY = float(os.getenv("STREAM_COALESCE_MAX_LATENCY_MS", "30")) / 1000
+MAX_BYTES = int(os.getenv("STREAM_COALESCE_MAX_BYTES", "2048"))
+MAX_TOKENS = int(os.getenv("STREAM_COALESCE_MAX_TOKENS", "64"))
+
+
+def dumps(payload: Dict[str, Any]) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def sse_frame(payload: Dict[str, Any], event: Optional[str] = None) -> bytes:
+    frame = b"data: " + dumps(payload) + b"\n\n"
+    if event:
+        frame = f"event: {event}\n".encode("utf-8") + frame
+    return frame
+
+
+def _size(text: str) -> int:
+    return len(text) if text.isascii() else len(text.encode("utf-8"))
+
+
+class StreamCoalescer:
+    def __init__(
+        self,
+        message_id: str,
+        max_latency: float = MAX_LATENCY,
+        max_bytes: int = MAX_BYTES,
+        max_tokens: int = MAX_TOKENS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.message_id = message_id
+        self.max_latency = max_latency
+        self.max_bytes = max_bytes
+        self.max_tokens = max_tokens
+        self.clock = clock
+        self.token_count = 0  # chunks seen over the whole stream
+        self.frame_count = 0  # frames flushed over the whole stream
+        self._run: Optional[Tuple[str, str, str]] = None
+        self._content: List[str] = []
+        self._title: List[str] = []
+        self._tokens = 0
+        self._bytes = 0
+        self._started_at = 0.0
+
+    @property
+    def pending(self) -> bool:
+        return self._tokens > 0
+
+    def flush_in(self) -> Optional[float]:
+        """Seconds until the buffered chunks are due, or None when nothing is buffered."""
+        if not self.pending:
+            return None
+        return max(0.0, self._started_at + self.max_latency - self.clock())
+
+    def add(self, chunk: Dict[str, Any]) -> Sequence[bytes]:
+        """Buffer one chunk event and return the frames that are due because of it."""
+        now = self.clock()
+        run = (chunk.get("type", "unknown_chunk_type"), chunk.get("agent_name", ""), chunk.get("id", ""))
+        frames: Sequence[bytes] = ()
+        if self._tokens and run != self._run:
+            frames = [self.flush()]
+        if not self._tokens:
+            self._run = run
+            self._started_at = now
+
+        content = chunk.get("content")
+        if content is not None:
+            self._content.append(content)
+            self._bytes += _size(content)
+        title = chunk.get("title")
+        if title is not None:
+            self._title.append(title)
+            self._bytes += _size(title)
+        self._tokens += 1
+        self.token_count += 1
+
+        if (self._tokens >= self.max_tokens or self._bytes >= self.max_bytes
+                or now - self._started_at >= self.max_latency):
+            frames = [*frames, self.flush()]
+        return frames
+
+    def flush(self) -> Optional[bytes]:
+        """Frame for the buffered chunks (None if there are none)."""
+        if not self.pending:
+            return None
+        chunk_type, agent_name, response_id = self._run
+        payload = {"type": chunk_type, "agent_name": agent_name, "message_id": self.message_id, "id": response_id}
+        if self._content:
+            payload["content"] = "".join(self._content)
+        if self._title:
+            payload["title"] = "".join(self._title)
+
+        self._content, self._title = [], []
+        self._tokens = self._bytes = 0
+        self.frame_count += 1
+        return sse_frame(payload)
+
+
+async def coalesce(chunks: AsyncIterator[Dict[str, Any]], coalescer: StreamCoalescer) -> AsyncIterator[bytes]:
+    """
+    Frames for a stream of chunk events, flushing on the latency limit even while the source
+    is idle.
+    """
+    iterator = chunks.__aiter__()
+    next_chunk = None
+    try:
+        while True:
+            if next_chunk is None:
+                next_chunk = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait({next_chunk}, timeout=coalescer.flush_in())
+            if not done:
+                yield coalescer.flush()
+                continue
+
+            finished, next_chunk = next_chunk, None
+            try:
+                chunk = finished.result()
+            except StopAsyncIteration:
+                break
+            for frame in coalescer.add(chunk):
+                yield frame
+
+        frame = coalescer.flush()
+        if frame:
+            yield frame
+    finally:
+        if next_chunk is not None:
+            next_chunk.cancel()
@@ -0,0 +1,124 @@
+"""
+Graph traces of streamed answers.
+
+A `TraceRecorder` keeps the structured events of one answer (human input, graph updates,
+formatted messages, errors) in a ring buffer. Events are stored as references and only turned
+into text when the trace is written, each capped in size, so tracing costs almost nothing on the
+streaming path and memory stays bounded on long reasoning runs. Finished traces are handed to
+`trace_writer`, which inserts them into `graph_logs` in batches.
+
+Tracing is sampled with GRAPH_TRACE_SAMPLE_RATE and can be forced on or off per request.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, List, Optional, Set, Tuple
+from src.backend.models.model import GraphLog
+
+logger = logging.getLogger("uvicorn")
+
+TRACE_SAMPLE_RATE = float(os.getenv("GRAPH_TRACE_SAMPLE_RATE", "1.0"))
+TRACE_MAX_EVENTS = int(os.getenv("GRAPH_TRACE_MAX_EVENTS", "500"))
+TRACE_MAX_EVENT_CHARS = int(os.getenv("GRAPH_TRACE_MAX_EVENT_CHARS", "4000"))
+TRACE_FLUSH_BATCH = int(os.getenv("GRAPH_TRACE_FLUSH_BATCH", "50"))
+TRACE_FLUSH_INTERVAL = float(os.getenv("GRAPH_TRACE_FLUSH_INTERVAL", "5"))
+
+
+class TraceRecorder:
+    def __init__(
+        self,
+        session_id: str,
+        message_id: str,
+        enabled: Optional[bool] = None,
+        sample_rate: float = TRACE_SAMPLE_RATE,
+        max_events: int = TRACE_MAX_EVENTS,
+        max_event_chars: int = TRACE_MAX_EVENT_CHARS,
+    ):
+        self.session_id = session_id
+        self.message_id = message_id
+        self.enabled = enabled if enabled is not None else random.random() < sample_rate
+        self.max_event_chars = max_event_chars
+        self.dropped = 0
+        self._events: Deque[Tuple[str, float, Any]] = deque(maxlen=max_events)
+        self._finished = False
+
+    def record(self, kind: str, payload: Any):
+        if not self.enabled:
+            return
+        if len(self._events) == self._events.maxlen:
+            self.dropped += 1
+        self._events.append((kind, time.time(), payload))
+
+    def _serialize(self, payload: Any) -> str:
+        text = payload if isinstance(payload, str) else str(payload)
+        if len(text) > self.max_event_chars:
+            text = f"{text[:self.max_event_chars]}... [{len(text) - self.max_event_chars} chars truncated]"
+        return text
+
+    def to_document(self) -> dict:
+        events: List[dict] = [
+            {"kind": kind, "at": at, "data": self._serialize(payload)}
+            for kind, at, payload in self._events
+        ]
+        return {
+            "session_id": self.session_id,
+            "message_id": self.message_id,
+            "events": events,
+            "dropped_events": self.dropped,
+            "created_at": datetime.now(timezone.utc),
+        }
+
+    def finish(self):
+        """Hand the trace to the batched writer; later calls are no-ops."""
+        if self._finished or not self.enabled or not self._events:
+            return
+        self._finished = True
+        trace_writer.submit(self)
+
+
+class TraceWriter:
+    def __init__(self, batch_size: int = TRACE_FLUSH_BATCH, interval: float = TRACE_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.interval = interval
+        self._pending: List[TraceRecorder] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+    def submit(self, recorder: TraceRecorder):
+        self._pending.append(recorder)
+        loop = asyncio.get_running_loop()
+        if len(self._pending) >= self.batch_size:
+            task = loop.create_task(self.flush())
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+        elif self._timer is None or self._timer.done():
+            self._timer = loop.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        await self.flush()
+
+    async def flush(self):
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        try:
+            documents = [recorder.to_document() for recorder in batch]
+            await GraphLog.get_motor_collection().insert_many(documents, ordered=False)
+        except Exception as e:
+            logger.warning(f"Could not write {len(batch)} graph traces: {e}")
+
+    async def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+        await self.flush()
+
+
+trace_writer = TraceWriter()
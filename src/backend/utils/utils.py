@@ -52,14 +52,17 @@ cmp = CountUsageMetricsPricingConfig()
 PRICING = {
     cmp.MODEL: {
         "input": 0.40 / 1_000_000,
+        "cached_input": 0.10 / 1_000_000,
         "output": 1.60 / 1_000_000
     },
     cmp.MODEL: {
         "input": 0.100 / 1_000_000,
+        "cached_input": 0.025 / 1_000_000,
         "output": 0.400 / 1_000_000
     },
     cmp.MODEL: {
         "input": 0.15 / 1_000_000,
+        "cached_input": 0.0375 / 1_000_000,
         "output": 0.60 / 1_000_000
     }
 }
@@ -291,8 +294,9 @@ def get_tool_call_title(tool_call: Dict):
 
 
 def get_token_usage_data(msg: AIMessage):
-    if msg.get('usage_metadata'):
-        return {'model': msg.response_metadata.get('model_name', 'azure/gpt-4.1-mini'), **msg.usage_metadata}
+    if msg.usage_metadata:
+        cache_read = (msg.usage_metadata.get('input_token_details') or {}).get('cache_read', 0)
+        return {'model': msg.response_metadata.get('model_name', cmp.MODEL), **msg.usage_metadata, 'cached_input_tokens': cache_read}
 
 
 async def format_tool_calling_agent_update(agent_name, stream_mode, update):
@@ -1057,9 +1061,11 @@ async def format_task_router_update(agent_name, stream_mode, update):
                     return response_list
 
                 value = update.get(message_container_key, {})
-                current_task_dict = value.get('current_task')
+                # Independent tasks are dispatched together, one `task_change` is emitted per task
+                dispatched_tasks = value.get('dispatched_tasks') or [value.get('current_task')]
+                dispatched_tasks = [task for task in dispatched_tasks if task and isinstance(task, dict)]
 
-                if not current_task_dict or not isinstance(current_task_dict, dict):
+                if not dispatched_tasks:
                     return response_list
 
                 if value.get('progress_bar'):
@@ -1069,12 +1075,13 @@ async def format_task_router_update(agent_name, stream_mode, update):
                         'progress_bar': value['progress_bar']
                     })
 
-                markdown_output = f"**Task Router** is initiating ***{current_task_dict['agent_name']}*** to perform the task '*{current_task_dict['task_name']}*'."
-                if current_task_dict.get('task_feedback'):
-                    markdown_output = f"**Task Validator** is retrying the task '*{current_task_dict['task_name']}*' {current_task_dict['retry']}th time through ***{current_task_dict['agent_name']}*** with following feedback:\n{current_task_dict['task_feedback']}"
-                # markdown_output += f"with following instructions:\n{value['instructions']}"
-                response_list.append({'type': 'task_change', 'agent_name': current_task_dict['agent_name'],
-                        'task_name': current_task_dict['task_name'], 'id': get_unique_response_id()})
+                for current_task_dict in dispatched_tasks:
+                    markdown_output = f"**Task Router** is initiating ***{current_task_dict['agent_name']}*** to perform the task '*{current_task_dict['task_name']}*'."
+                    if current_task_dict.get('task_feedback'):
+                        markdown_output = f"**Task Validator** is retrying the task '*{current_task_dict['task_name']}*' {current_task_dict['retry']}th time through ***{current_task_dict['agent_name']}*** with following feedback:\n{current_task_dict['task_feedback']}"
+                    # markdown_output += f"with following instructions:\n{value['instructions']}"
+                    response_list.append({'type': 'task_change', 'agent_name': current_task_dict['agent_name'],
+                            'task_name': current_task_dict['task_name'], 'id': get_unique_response_id()})
                 return response_list
                     # else:
                     #     return {'type': 'message', 'agent_name': agent_name, 'content': "Solution generated by specialized agents."}
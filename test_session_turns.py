@@ -0,0 +1,72 @@
+"""
+Session history stored one document per turn: sessions written before the migration keep
+their earlier turns in the agent's context once new turns arrive.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+import pytest
+from types import SimpleNamespace
+from beanie import PydanticObjectId, init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+from src.backend.db.migrate_session_history import build_turn_upserts
+from src.backend.models.model import SessionHistory, SessionTurn
+
+
+TEST_MONGO_URI = os.getenv("TEST_MONGO_URI")
+
+
+def _legacy_session(history, model=SessionHistory):
+    return model(
+        user_id=PydanticObjectId(),
+        session_id="legacy-session",
+        title="Earnings",
+        history=history,
+        created_at=datetime(2025, 1, 1, tzinfo=timezone.utc),
+        updated_at=datetime(2025, 1, 1, tzinfo=timezone.utc),
+    )
+
+
+def test_legacy_turns_keep_their_order():
+    session = _legacy_session([{"m1": ("q1", "a1", [])}, {"m2": ("q2", "a2", "doc")}], model=SimpleNamespace)
+    operations = build_turn_upserts(session)
+
+    turns = [op._doc["$setOnInsert"] for op in operations]
+    assert [turn["message_id"] for turn in turns] == ["m1", "m2"]
+    assert turns[0]["created_at"] < turns[1]["created_at"] < datetime.now(timezone.utc)
+    assert turns[1]["doc_ids"] == ["doc"]
+
+
+@pytest.mark.skipif(not TEST_MONGO_URI, reason="needs a MongoDB server in TEST_MONGO_URI")
+def test_mixed_session_history():
+    import src.backend.db.mongodb as mongodb
+
+    async def run():
+        client = AsyncIOMotorClient(TEST_MONGO_URI)
+        database = client[f"test_session_turns_{os.getpid()}"]
+        await init_beanie(database=database, document_models=[SessionHistory, SessionTurn])
+
+        # Two turns from before the migration, one written after it without moving them
+        session = _legacy_session([{"m1": ("q1", "a1", [])}, {"m2": ("q2", "a2", [])}])
+        await session.insert()
+        now = datetime.now(timezone.utc)
+        await SessionTurn(
+            user_id=session.user_id, session_id=session.session_id, message_id="m3",
+            user_query="q3", assistant_response="a3", created_at=now, updated_at=now,
+        ).insert()
+
+        await mongodb.update_session_history_in_db(
+            session.session_id, str(session.user_id), "m4", "q4", "a4", [], now + timedelta(seconds=1), "UTC"
+        )
+
+        history = await mongodb.get_session_history_from_db(session.session_id, "m4")
+        assert history["messages"] == [["q1", "a1"], ["q2", "a2"], ["q3", "a3"], ["q4", "a4"]]
+        assert (await SessionHistory.find_one(SessionHistory.session_id == session.session_id)).history == []
+
+        recent = await mongodb.get_session_history_from_db(session.session_id, "m4", limit=2)
+        assert recent["messages"] == [["q3", "a3"], ["q4", "a4"]]
+
+        await client.drop_database(database.name)
+        client.close()
+
+    asyncio.run(run())
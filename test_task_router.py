@@ -0,0 +1,105 @@
+"""
+Task Router scheduling: every agent reports its task back through `completed_tasks`, so a
+plan runs each task once and finishes with the Response Generator Agent.
+"""
+from types import SimpleNamespace
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.constants import END
+from langgraph.types import Command
+from src.ai.agents.coding_agent import CodingAgent
+from src.ai.agents.data_comparison_agent import DataComparisonAgent
+from src.ai.agents.db_search_agent import DBSearchAgent
+from src.ai.agents.finance_data_agent import FinanceDataAgent
+from src.ai.agents.map_agent import MapAgent
+from src.ai.agents.sentiment_analysis_agent import SentimentAnalysisAgent
+from src.ai.agents.social_media_agent import SocialMediaAgent
+from src.ai.agents.utils import task_router_node
+from src.ai.agents.web_search_agent import WebSearchAgent
+
+
+HUMAN = HumanMessage(content="task")
+RESPONSE = AIMessage(content="result")
+LOG = {"messages": [HUMAN, RESPONSE]}
+MAP_LOG = {**LOG, "structured_response": SimpleNamespace(model_dump=lambda: {"locations": []})}
+
+AGENTS = {
+    "Web Search Agent": lambda state, task: WebSearchAgent().build_command(state, task, [], LOG),
+    "Social Media Scrape Agent": lambda state, task: SocialMediaAgent().build_command(state, task, [], LOG),
+    "Finance Data Agent": lambda state, task: FinanceDataAgent().build_command(state, task, [], LOG),
+    "Coding Agent": lambda state, task: CodingAgent().build_command(state, task, [], LOG),
+    "DB Search Agent": lambda state, task: DBSearchAgent().build_command(state, task, [], LOG),
+    "Map Agent": lambda state, task: MapAgent().build_command(state, task, MAP_LOG),
+    "Sentiment Analysis Agent": lambda state, task: SentimentAnalysisAgent().build_update(state, task, HUMAN, RESPONSE),
+    "Data Comparison Agent": lambda state, task: DataComparisonAgent().build_update(state, task, HUMAN, RESPONSE),
+}
+
+
+def _task(agent_name, required_context=None):
+    return {
+        "task_name": f"{agent_name} task",
+        "agent_name": agent_name,
+        "agent_task": "collect data",
+        "instructions": "",
+        "expected_output": "",
+        "required_context": required_context or [],
+    }
+
+
+def _run_plan(task_list, reasoning=False):
+    state = {"task_list": task_list, "completed_tasks": [], "progress_bar": 0.0, "reasoning": reasoning}
+    dispatched = []
+
+    for _ in range(2 * len(task_list) + 2):
+        command = task_router_node(state)
+        state.update({key: value for key, value in command.update.items()})
+        if command.goto == END:
+            return dispatched, state
+
+        sends = command.goto
+        dispatched.append([send.node for send in sends])
+        if sends[0].node == "Response Generator Agent":
+            return dispatched, state
+
+        for send in sends:
+            result = AGENTS[send.node](send.arg, send.arg["current_task"].copy())
+            update = result.update if isinstance(result, Command) else result
+            state["completed_tasks"] = state["completed_tasks"] + update["completed_tasks"]
+
+    raise AssertionError(f"router kept dispatching: {dispatched}")
+
+
+def test_every_agent_reports_its_task_as_completed():
+    for agent_name in AGENTS:
+        plan = [_task(agent_name), _task("Response Generator Agent")]
+        dispatched, _ = _run_plan(plan)
+
+        assert dispatched == [[agent_name], ["Response Generator Agent"]]
+
+
+def test_independent_tasks_run_once_in_parallel():
+    plan = [_task(agent_name) for agent_name in AGENTS] + [_task("Response Generator Agent")]
+    dispatched, state = _run_plan(plan)
+
+    assert sorted(dispatched[0]) == sorted(AGENTS)
+    assert dispatched[1:] == [["Response Generator Agent"]]
+    assert all(task["status"] == "done" for task in state["task_list"][:-1])
+
+
+def test_dependent_task_waits_for_its_context():
+    plan = [
+        _task("Finance Data Agent"),
+        _task("Map Agent"),
+        _task("Data Comparison Agent", ["Finance Data Agent task", "Map Agent task"]),
+        _task("Response Generator Agent"),
+    ]
+    dispatched, _ = _run_plan(plan)
+
+    assert sorted(dispatched[0]) == ["Finance Data Agent", "Map Agent"]
+    assert dispatched[1:] == [["Data Comparison Agent"], ["Response Generator Agent"]]
+
+
+def test_reasoning_mode_sends_one_task_at_a_time():
+    plan = [_task("Web Search Agent"), _task("Finance Data Agent"), _task("Response Generator Agent")]
+    dispatched, _ = _run_plan(plan, reasoning=True)
+
+    assert dispatched == [["Web Search Agent"], ["Finance Data Agent"], ["Response Generator Agent"]]